@@ -0,0 +1,219 @@
+import argparse
+import glob
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from transcription_pipeline.cache import TranscriptionCache
+from transcription_pipeline.job_store import JobStore, STAGES
+from transcription_pipeline.timestamps import load_timeline
+from transcription_pipeline.transcriber import get_audio_conversion_args
+from transcription_pipeline.utils import get_audio_duration
+from app_upload import ingest_file
+
+MEDIA_EXTENSIONS = {
+    '.mp4', '.mov', '.mkv', '.avi', '.webm', '.m4v',
+    '.mp3', '.wav', '.m4a', '.aac', '.flac', '.ogg', '.aiff',
+}
+
+
+def expand_inputs(inputs, recursive=False):
+    """
+    Expands directories and glob patterns into a sorted list of media files.
+    """
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            if recursive:
+                for root, _, names in os.walk(item):
+                    files.update(os.path.join(root, name) for name in names)
+            else:
+                files.update(os.path.join(item, name) for name in os.listdir(item))
+        elif os.path.isfile(item):
+            files.add(item)
+        else:
+            matches = glob.glob(item, recursive=True)
+            if not matches:
+                print(f"Warning: no files match '{item}'.", file=sys.stderr)
+            files.update(matches)
+    return sorted(
+        os.path.abspath(f) for f in files
+        if os.path.isfile(f) and os.path.splitext(f)[1].lower() in MEDIA_EXTENSIONS
+    )
+
+
+class BatchStats:
+    """Thread-safe counters for the batch summary."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stage_seconds = {stage: 0.0 for stage in STAGES}
+        self.completed = 0
+        self.skipped = 0
+        self.failed = []
+        self.audio_seconds = 0.0
+
+    def add_stage_time(self, stage, seconds):
+        with self.lock:
+            self.stage_seconds[stage] += seconds
+
+    def add_completed(self, audio_seconds):
+        with self.lock:
+            self.completed += 1
+            self.audio_seconds += audio_seconds or 0.0
+
+    def add_skipped(self):
+        with self.lock:
+            self.skipped += 1
+
+    def add_failed(self, file_path, stage):
+        with self.lock:
+            self.failed.append((file_path, stage))
+
+
+class StageRunner:
+    """
+    Runs a pipeline stage under its own concurrency limit and records its busy time.
+    Files flow through the stages independently, so FFmpeg conversions overlap
+    with API transcriptions, titling and embedding of other files.
+    """
+
+    def __init__(self, limits, stats):
+        self.semaphores = {stage: threading.Semaphore(limits[stage]) for stage in STAGES}
+        self.stats = stats
+
+    def run(self, stage, func, *args, **kwargs):
+        with self.semaphores[stage]:
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.stats.add_stage_time(stage, time.perf_counter() - start)
+
+
+def process_file(file_path, runner, stats, job_store, cache, force=False):
+    """Runs one file through the ingestion stages and records the outcome."""
+    status, stage = ingest_file(file_path, job_store, cache, run_stage=runner.run, force=force)
+    if status == "failed":
+        stats.add_failed(file_path, stage)
+    elif status == "skipped":
+        stats.add_skipped()
+    else:
+        stats.add_completed(recorded_duration(file_path, job_store, cache))
+
+
+def recorded_duration(file_path, job_store, cache):
+    """
+    Duration of a recording, from the timeline saved with the transcription of its
+    latest job. FFprobe is only run when the timeline has none (e.g. silences trimmed).
+    """
+    job = job_store.get_or_create_job(file_path, cache.hash_source(file_path))
+    outputs = job_store.get_stage_outputs(job["job_id"])
+    text_path = (outputs.get("index") or outputs.get("title") or {}).get("final_text_path")
+    timeline = load_timeline(text_path) if text_path else None
+    if timeline and timeline.get("duration_seconds") is not None:
+        return timeline["duration_seconds"]
+    return get_audio_duration(file_path)
+
+
+def print_summary(stats, cache, total_files, elapsed):
+    elapsed_minutes = elapsed / 60
+    elapsed_hours = elapsed / 3600
+    files_per_minute = stats.completed / elapsed_minutes if elapsed_minutes else 0.0
+    audio_hours_per_hour = (stats.audio_seconds / 3600) / elapsed_hours if elapsed_hours else 0.0
+
+    print("\n--- Batch Summary ---")
+    print(f"Files: {stats.completed}/{total_files} completed, {stats.skipped} already ingested, {len(stats.failed)} failed")
+    print(f"Elapsed: {elapsed:.1f}s")
+    print(f"Audio processed: {stats.audio_seconds / 3600:.2f} hours")
+    print(f"Transcription cache: {cache.hits} hits, {cache.misses} misses")
+    print(f"Throughput: {files_per_minute:.2f} files/min, {audio_hours_per_hour:.2f} audio-hours/hour")
+    print("Stage busy time (summed across workers):")
+    for stage in STAGES:
+        print(f"  - {stage}: {stats.stage_seconds[stage]:.1f}s")
+    for file_path, stage in stats.failed:
+        print(f"Failed at {stage}: {file_path}", file=sys.stderr)
+
+
+def run_batch(inputs, recursive=False, convert_workers=2, transcribe_workers=4, title_workers=2, index_workers=1, force=False):
+    """
+    Ingests every media file matched by 'inputs' (directories, files or glob patterns).
+    Files already ingested are skipped and interrupted jobs resume where they stopped,
+    unless 'force' is set. Returns the BatchStats of the run.
+    """
+    files = expand_inputs(inputs, recursive=recursive)
+    stats = BatchStats()
+    if not files:
+        print("No media files found.")
+        return stats
+
+    # Checked here so a bad configuration (e.g. an invalid AUDIO_TEMPO or a missing
+    # OPENAI_API_KEY) raises ValueError/ImportError before any paid work starts
+    get_audio_conversion_args()
+    from rag_system.embeddings import get_embeddings
+    get_embeddings()
+
+    limits = {
+        "convert": convert_workers,
+        "transcribe": transcribe_workers,
+        "title": title_workers,
+        "index": index_workers,
+    }
+    runner = StageRunner(limits, stats)
+    cache = TranscriptionCache()
+    job_store = JobStore()
+    # Enough in-flight files to keep every stage busy, without converting the whole batch upfront
+    max_in_flight = sum(limits.values())
+
+    print(f"Starting batch ingestion of {len(files)} files...")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        futures = [
+            executor.submit(process_file, f, runner, stats, job_store, cache, force)
+            for f in files
+        ]
+        for future, file_path in zip(futures, files):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Unexpected error processing {file_path}: {e}", file=sys.stderr)
+                stats.add_failed(file_path, "unknown")
+    print_summary(stats, cache, len(files), time.perf_counter() - start)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch transcription and indexing of audio/video files.")
+    parser.add_argument("inputs", nargs="+", help="Files, directories or glob patterns (quote globs to avoid shell expansion).")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Descend into subdirectories.")
+    parser.add_argument("--convert-workers", type=int, default=2, help="Concurrent FFmpeg conversions.")
+    parser.add_argument("--transcribe-workers", type=int, default=4, help="Concurrent transcription requests.")
+    parser.add_argument("--title-workers", type=int, default=2, help="Concurrent title generation requests.")
+    parser.add_argument("--index-workers", type=int, default=1, help="Concurrent indexing jobs.")
+    parser.add_argument("--force", action="store_true", help="Start new jobs even for files already ingested.")
+    args = parser.parse_args()
+    for option in ("convert_workers", "transcribe_workers", "title_workers", "index_workers"):
+        if getattr(args, option) < 1:
+            parser.error(f"--{option.replace('_', '-')} must be at least 1")
+
+    try:
+        stats = run_batch(
+            args.inputs,
+            recursive=args.recursive,
+            convert_workers=args.convert_workers,
+            transcribe_workers=args.transcribe_workers,
+            title_workers=args.title_workers,
+            index_workers=args.index_workers,
+            force=args.force,
+        )
+    except (ValueError, ImportError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if stats.failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
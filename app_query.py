@@ -1,69 +1,201 @@
+import argparse
+import json
 import os
 import sys
-import google.generativeai as genai
-from dotenv import load_dotenv
+import urllib.error
+import urllib.request
 
-from rag_system.retriever import query_chroma_db
+from rag_system.query_server import get_server_address
+from rag_system.collection_state import recording_timestamp
+from transcription_pipeline.utils import format_timestamp, extract_audio_span
 
-load_dotenv()
+def _server_request(payload):
+    host, port = get_server_address()
+    return urllib.request.Request(
+        f"http://{host}:{port}/query",
+        data=json.dumps(payload).encode('utf-8'),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
 
-def run_query_flow(query_string):
-    if not os.getenv("GOOGLE_API_KEY"):
-        print("Error: GOOGLE_API_KEY environment variable is not set.", file=sys.stderr)
-        print("Please set it with: export GOOGLE_API_KEY='YOUR_API_KEY_GOOGLE'", file=sys.stderr)
+def query_server(query_string, filters=None, timeout=300):
+    """
+    Sends the query to the resident query server.
+    Returns the result dict, or None if the server is not running.
+    """
+    try:
+        with urllib.request.urlopen(_server_request({"query": query_string, "filters": filters}), timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read() or b"{}") or {"error": str(e)}
+    except urllib.error.URLError:
+        return None
+
+def stream_query_server(query_string, filters=None, timeout=300):
+    """
+    Streams the answer from the resident query server.
+    Returns an iterator over the events of QueryEngine.answer_stream(), or None if the server is not running.
+    """
+    try:
+        response = urllib.request.urlopen(_server_request({"query": query_string, "filters": filters, "stream": True}), timeout=timeout)
+    except urllib.error.HTTPError as e:
+        return iter([{"type": "error", "error": (json.loads(e.read() or b"{}") or {}).get("error", str(e))}])
+    except urllib.error.URLError:
+        return None
+
+    def events():
+        with response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+    return events()
+
+def _load_local_engine():
+    try:
+        from rag_system.query_engine import QueryEngine
+        return QueryEngine()
+    except (ValueError, ImportError) as e:
+        print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
 
-    model_type = os.getenv("LLM_TYPE", "gemini")
-    if model_type == "gemini":
-        print("Sono dentro gemini")
+def run_local_query(query_string, filters=None):
+    """Runs the query in-process, paying the full startup cost."""
+    engine = _load_local_engine()
+    try:
+        return engine.answer(query_string, filters)
+    except Exception as e:
+        return {"error": str(e)}
 
-        if not os.getenv("GOOGLE_API_KEY"):
-            print("Error: GOOGLE_API_KEY environment variable is not set.", file=sys.stderr)
-            print("Please set it with: export GOOGLE_API_KEY='YOUR_API_KEY_GOOGLE'", file=sys.stderr)
-            sys.exit(1)
-        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-        model = genai.GenerativeModel(os.getenv("GEMINI_MODEL", "gemini-1.5-flash"))
-    elif model_type == "ollama":
-        print("Sono dentro ollama")
-        try:
-            from langchain_community.llms import Ollama
-            model = Ollama(model=os.getenv("OLLAMA_MODEL", "llama2"))
-        except ImportError:
-            print("Error: langchain_community is not installed. Please install it with 'pip install langchain-community'", file=sys.stderr)
+def run_local_query_stream(query_string, filters=None):
+    """Streaming version of run_local_query()."""
+    engine = _load_local_engine()
+    try:
+        yield from engine.answer_stream(query_string, filters)
+    except Exception as e:
+        yield {"type": "error", "error": str(e)}
+
+def format_source(metadata):
+    """Describes a retrieved chunk: its transcription and, when known, the time range in the media."""
+    label = metadata.get("source", "unknown")
+    if "start_seconds" in metadata and "end_seconds" in metadata:
+        label += f" [{format_timestamp(metadata['start_seconds'])} - {format_timestamp(metadata['end_seconds'])}]"
+    if metadata.get("media_path"):
+        label += f" {metadata['media_path']}"
+    return label
+
+def print_sources(sources):
+    print("\nSources:")
+    for label in dict.fromkeys(format_source(metadata) for metadata in sources):
+        print(f"- {label}")
+
+def extract_source_clips(sources, output_dir):
+    """Extracts the audio of every retrieved time range into output_dir."""
+    os.makedirs(output_dir, exist_ok=True)
+    for i, metadata in enumerate(sources, start=1):
+        media_path = metadata.get("media_path")
+        if "start_seconds" not in metadata or not media_path:
+            continue
+        if not os.path.exists(media_path):
+            print(f"Media file {media_path} not found, cannot extract its clip.", file=sys.stderr)
+            continue
+        start, end = metadata["start_seconds"], metadata["end_seconds"]
+        output_path = os.path.join(output_dir, f"clip_{i}_{int(start)}-{int(end)}.mp3")
+        if extract_audio_span(media_path, start, end, output_path):
+            print(f"Clip saved to: {output_path}")
+
+def print_streamed_answer(events):
+    """
+    Prints tokens as they arrive, followed by the generation metrics.
+    Returns the sources of the answer (empty if there is none).
+    """
+    sources = []
+    for event in events:
+        if event["type"] == "error":
+            print(f"\nError generating AI response: {event['error']}", file=sys.stderr)
             sys.exit(1)
-    else:
-        print(f"Error: Unknown LLM_TYPE: {model_type}. Please set LLM_TYPE to 'gemini' or 'ollama'.", file=sys.stderr)
-        sys.exit(1)
+        elif event["type"] == "sources" and event["sources"]:
+            sources = event["sources"]
+            print("\nAI Response:")
+        elif event["type"] == "token":
+            sys.stdout.write(event["text"])
+            sys.stdout.flush()
+        elif event["type"] == "done":
+            if event["answer"] is None:
+                print("No relevant documents found for your query. Cannot generate an AI response.")
+                return []
+            timings = event["timings"]
+            if event.get("cache"):
+                print(f"\n\n(cached answer, {event['cache']} match)")
+                return sources
+            print(f"\n\n[Metrics] Time to first token: {timings['time_to_first_token']:.2f}s, "
+                  f"{timings['tokens_per_second']:.1f} tokens/s ({timings['output_tokens']} tokens in {timings['generation']:.2f}s)")
+            if "rerank" in timings:
+                print(f"[Metrics] Retrieval: {timings['retrieval'] * 1000:.0f}ms, "
+                      f"reranking {timings['candidates']} candidates: {timings['rerank'] * 1000:.1f}ms")
+    return sources
 
+def run_query_flow(query_string, local=False, stream=False, clips_dir=None, filters=None):
     print(f"Querying knowledge base for: \"{query_string}\"")
-    relevant_docs = query_chroma_db(query_string)
-
-    if relevant_docs:
-        context = "\n\n".join([doc.page_content for doc in relevant_docs])
-        prompt = f"""Based on the following context, answer the question. If the answer is not in the context, say "Non ho informazioni sufficienti per rispondere a questa domanda basandomi sul contesto fornito.".\n\n        Context:\n        {context}\n\n        Question: {query_string}\n\n        Answer:"""
-        print("\nGenerating AI response...")
-        try:
-            if model_type == "gemini":
-                response = model.generate_content(prompt)
-            elif model_type == "ollama":
-                response = model.invoke(prompt)
-            print("\nAI Response:")
-            if model_type == "gemini":
-                print(response.text.strip())
-            elif model_type == "ollama":
-                print(response.strip())
-        except Exception as e:
-            print(f"Error generating AI response: {e}", file=sys.stderr)
-    else:
+    if filters:
+        print(f"Filters: {', '.join(f'{key}={value}' for key, value in filters.items())}")
+    if stream:
+        events = None if local else stream_query_server(query_string, filters)
+        if events is None:
+            if not local:
+                print("Query server not running, answering in-process (start it with: python -m rag_system.query_server).")
+            events = run_local_query_stream(query_string, filters)
+        sources = print_streamed_answer(events)
+        if sources:
+            print_sources(sources)
+            if clips_dir:
+                extract_source_clips(sources, clips_dir)
+        return
+
+    result = None if local else query_server(query_string, filters)
+    if result is None:
+        if not local:
+            print("Query server not running, answering in-process (start it with: python -m rag_system.query_server).")
+        result = run_local_query(query_string, filters)
+
+    if result.get("error"):
+        print(f"Error generating AI response: {result['error']}", file=sys.stderr)
+        sys.exit(1)
+    if result.get("answer") is None:
         print("No relevant documents found for your query. Cannot generate an AI response.")
+        return
+    print("\nAI Response:")
+    if result.get("cache"):
+        print(f"(cached answer, {result['cache']} match)")
+    print(result["answer"])
+    print_sources(result["sources"])
+    if clips_dir:
+        extract_source_clips(result["sources"], clips_dir)
+
+def _date_argument(value):
+    try:
+        recording_timestamp(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', expected YYYY-MM-DD")
+    return value
 
 def main():
-    if len(sys.argv) > 1:
-        query_string = " ".join(sys.argv[1:])
-        run_query_flow(query_string)
-    else:
-        print("Usage: python app_query.py <your_query_string>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Query the indexed transcriptions.")
+    parser.add_argument("query", nargs="+", help="The question to ask.")
+    parser.add_argument("--local", action="store_true", help="Answer in-process instead of using the query server.")
+    parser.add_argument("--stream", action="store_true", help="Print the answer as it is generated.")
+    parser.add_argument("--clips", metavar="DIR", help="Extract the audio of the retrieved time ranges into DIR.")
+    parser.add_argument("--source", action="append", dest="sources", metavar="NAME",
+                        help="Only search this transcription (glob patterns allowed, repeatable).")
+    parser.add_argument("--from", dest="date_from", type=_date_argument, metavar="YYYY-MM-DD", help="Only search recordings from this date.")
+    parser.add_argument("--to", dest="date_to", type=_date_argument, metavar="YYYY-MM-DD", help="Only search recordings up to this date.")
+    parser.add_argument("--language", help="Only search recordings in this language, as a code or a name (e.g. 'it' or 'italian').")
+    args = parser.parse_args()
+    filters = {
+        key: value for key, value in
+        (("sources", args.sources), ("date_from", args.date_from), ("date_to", args.date_to), ("language", args.language))
+        if value
+    }
+    run_query_flow(" ".join(args.query), local=args.local, stream=args.stream, clips_dir=args.clips, filters=filters or None)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,66 +1,207 @@
-from transcription_pipeline.transcriber import select_file, convert_to_audio, transcribe_audio_api, generate_title_with_gemini
+from transcription_pipeline.transcriber import select_file, convert_to_audio, transcribe_audio_api, generate_title_with_gemini, transcription_cache_key, load_cached_transcription, \
+    streaming_enabled, transcribe_media_stream
+from transcription_pipeline.cache import TranscriptionCache
+from transcription_pipeline.job_store import JobStore
+from transcription_pipeline.timestamps import move_timeline, load_timeline
 
 import os
 from datetime import datetime
 import sys
 
-def run_upload_flow():
-    print("Opening native macOS file selection dialog...")
-    selected_file = select_file()
-    if selected_file:
-        print(f"File selected successfully!")
-        print(f"Path: {selected_file}")
-        temp_directory = os.path.join(os.getcwd(), "temp")
-        os.makedirs(temp_directory, exist_ok=True)
-        audio_file_path = convert_to_audio(selected_file, temp_directory)
-        if audio_file_path:
-            transcriptions_directory = os.path.join(os.getcwd(), "transcriptions")
-            os.makedirs(transcriptions_directory, exist_ok=True)
-            
-            transcribed_data = transcribe_audio_api(audio_file_path, transcriptions_directory, os.path.basename(selected_file))
-            
+def claim_transcription_path(transcriptions_directory, title, selected_file):
+    """
+    Returns a free path for a transcription named 'title', adding a numeric
+    suffix (_2, _3...) when another recording already has that name, e.g.
+    recordings of the same day with similar titles ingested together.
+    The path is created empty, so concurrent runs cannot claim it twice.
+    A transcription of the same recording (per its timeline) is replaced instead.
+    """
+    media_path = os.path.abspath(selected_file)
+    suffix = 1
+    while True:
+        name = title if suffix == 1 else f"{title}_{suffix}"
+        path = os.path.join(transcriptions_directory, f"{name}.txt")
+        try:
+            with open(path, 'x'):
+                return path
+        except FileExistsError:
+            timeline = load_timeline(path)
+            if timeline and timeline.get("media_path") and os.path.abspath(timeline["media_path"]) == media_path:
+                return path
+        suffix += 1
+
+def finalize_transcription(selected_file, transcribed_text, temp_text_path, transcriptions_directory):
+    """
+    Generates a title for the transcription and moves the temporary text file
+    (and its timestamps) to its final name. Returns the final path, or None if the file could not be renamed.
+    """
+    generated_title = generate_title_with_gemini(transcribed_text, os.path.basename(selected_file))
+
+    final_text_path = None
+    claimed_path = None
+    try:
+        if generated_title:
+            # Get the creation date of the original file
+            creation_timestamp = os.path.getctime(selected_file)
+            creation_date = datetime.fromtimestamp(creation_timestamp).strftime('%Y-%m-%d')
+
+            # Add the date as a prefix to the title
+            final_title = f"{creation_date}_{generated_title}"
+
+            # Rename the transcription file with the generated title and date
+            final_text_path = claimed_path = claim_transcription_path(transcriptions_directory, final_title, selected_file)
+            os.replace(temp_text_path, final_text_path)
+            move_timeline(temp_text_path, final_text_path)
+            print(f"Transcription file renamed to: {final_text_path}")
+        else:
+            # If title generation fails, keep the original name
+            final_text_path = os.path.join(transcriptions_directory, os.path.basename(temp_text_path).replace("temp_", ""))
+            os.rename(temp_text_path, final_text_path)
+            move_timeline(temp_text_path, final_text_path)
+            print(f"Title generation failed. Transcription file saved as: {final_text_path}")
+    except OSError as e:
+        print(f"Error renaming file {temp_text_path} to {final_text_path or 'its final name'}: {e}", file=sys.stderr)
+        # The transcription was not moved: drop the empty placeholder claimed for it
+        if claimed_path and os.path.exists(temp_text_path) and os.path.exists(claimed_path) and os.path.getsize(claimed_path) == 0:
+            try:
+                os.remove(claimed_path)
+            except OSError:
+                pass
+        return None
+    return final_text_path
+
+def remove_temp_audio(audio_file_path):
+    print(f"\nCleanup: deleting temporary audio file: {audio_file_path}")
+    try:
+        os.remove(audio_file_path)
+        print("Temporary file deleted successfully.")
+    except OSError as e:
+        print(f"Error deleting file {audio_file_path}: {e}", file=sys.stderr)
+
+# Stage whose output is a file on disk, and the key holding its path
+STAGE_ARTIFACTS = (("convert", "audio_path"), ("transcribe", "text_path"), ("title", "final_text_path"))
+
+def _run_stage_directly(stage, func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+def _resume_point(job_store, job_id):
+    """
+    Returns the latest completed stage whose artifact still exists, with its output.
+    """
+    outputs = job_store.get_stage_outputs(job_id)
+    for stage, key in reversed(STAGE_ARTIFACTS):
+        if stage in outputs:
+            if os.path.exists(outputs[stage][key]):
+                return stage, outputs[stage]
+            job_store.invalidate_stage(job_id, stage)
+    return None, {}
+
+def _fail_job(job_store, job_id, selected_file, stage, error):
+    print(f"Stage '{stage}' failed for {selected_file}: {error}", file=sys.stderr)
+    job_store.fail(job_id, stage, error)
+    return "failed", stage
+
+def ingest_file(selected_file, job_store, cache, run_stage=None, force=False):
+    """
+    Runs one file through conversion, transcription, titling and indexing.
+    Every completed stage is recorded in the job store, so a restarted run
+    resumes at the first incomplete stage instead of redoing paid API work.
+    'run_stage(stage, func, *args, **kwargs)' can wrap each stage (e.g. to apply concurrency limits).
+    Returns a (status, stage) tuple, status being 'done', 'skipped' or 'failed'.
+    """
+    run_stage = run_stage or _run_stage_directly
+    file_name = os.path.basename(selected_file)
+    temp_directory = os.path.join(os.getcwd(), "temp")
+    os.makedirs(temp_directory, exist_ok=True)
+    transcriptions_directory = os.path.join(os.getcwd(), "transcriptions")
+    os.makedirs(transcriptions_directory, exist_ok=True)
+
+    source_hash = cache.hash_source(selected_file)
+    if force:
+        job = job_store.create_job(selected_file, source_hash)
+    else:
+        job = job_store.get_or_create_job(selected_file, source_hash)
+    job_id = job["job_id"]
+    if job["status"] == "done":
+        print(f"'{file_name}' was already ingested (job {job_id}), skipping.")
+        return "skipped", None
+
+    last_stage, output = _resume_point(job_store, job_id)
+    if last_stage:
+        print(f"Resuming job {job_id} for '{file_name}' after stage '{last_stage}'.")
+    audio_file_path = output.get("audio_path") if last_stage == "convert" else None
+    text_path = output.get("text_path") if last_stage == "transcribe" else None
+    final_text_path = output.get("final_text_path") if last_stage == "title" else None
+    stage = "convert"
+    try:
+        # Includes the FFmpeg settings, so an invalid AUDIO_TEMPO or AUDIO_PROFILE fails the job here
+        cache_key = transcription_cache_key(selected_file, cache)
+        if last_stage is None:
+            # A cache hit skips both the FFmpeg conversion and the paid transcription
+            transcribed_data = load_cached_transcription(cache, cache_key, transcriptions_directory, file_name, job_id=job_id, media_path=selected_file)
             if transcribed_data:
-                transcribed_text, temp_text_path = transcribed_data
-
-                generated_title = generate_title_with_gemini(transcribed_text, os.path.basename(selected_file))
-
-                if generated_title:
-                    # Get the creation date of the original file
-                    creation_timestamp = os.path.getctime(selected_file)
-                    creation_date = datetime.fromtimestamp(creation_timestamp).strftime('%Y-%m-%d')
-                    
-                    # Add the date as a prefix to the title
-                    final_title = f"{creation_date}_{generated_title}"
-
-                    # Rename the transcription file with the generated title and date
-                    final_text_path = os.path.join(transcriptions_directory, f"{final_title}.txt")
-                    try:
-                        os.rename(temp_text_path, final_text_path)
-                        print(f"Transcription file renamed to: {final_text_path}")
-                        # Index the transcription in the vector database
-                        from rag_system.indexer import index_transcription
-                        index_transcription(final_text_path)
-                    except OSError as e:
-                        print(f"Error renaming file {temp_text_path} to {final_text_path}: {e}", file=sys.stderr)
-                else:
-                    # If title generation fails, keep the original name
-                    final_text_path = os.path.join(transcriptions_directory, os.path.basename(temp_text_path).replace("temp_", ""))
-                    os.rename(temp_text_path, final_text_path)
-                    print(f"Title generation failed. Transcription file saved as: {final_text_path}")
-                    # Index the transcription in the vector database (even if the title is generic)
-                    from rag_system.indexer import index_transcription
-                    index_transcription(final_text_path)
-
-                print(f"\nCleanup: deleting temporary audio file: {audio_file_path}")
-                try:
-                    os.remove(audio_file_path)
-                    print("Temporary file deleted successfully.")
-                except OSError as e:
-                    print(f"Error deleting file {audio_file_path}: {e}", file=sys.stderr)
+                text_path = transcribed_data[1]
+                job_store.complete_stage(job_id, "transcribe", {"text_path": text_path})
+            elif streaming_enabled():
+                # FFmpeg's output is transcribed while it is decoded, without a temporary audio file
+                stage = "transcribe"
+                transcribed_data = run_stage(
+                    "transcribe", transcribe_media_stream, selected_file, transcriptions_directory, file_name,
+                    cache=cache, cache_key=cache_key, job_id=job_id
+                )
+                if not transcribed_data:
+                    return _fail_job(job_store, job_id, selected_file, stage, "Transcription failed")
+                text_path = transcribed_data[1]
+                job_store.complete_stage(job_id, "transcribe", {"text_path": text_path})
             else:
-                print("API transcription failed, cannot proceed with title generation.")
-    else:
+                audio_file_path = run_stage("convert", convert_to_audio, selected_file, temp_directory, job_id=job_id)
+                if not audio_file_path:
+                    return _fail_job(job_store, job_id, selected_file, stage, "FFmpeg conversion failed")
+                job_store.complete_stage(job_id, "convert", {"audio_path": audio_file_path})
+
+        if audio_file_path:
+            stage = "transcribe"
+            transcribed_data = run_stage(
+                "transcribe", transcribe_audio_api, audio_file_path, transcriptions_directory, file_name,
+                cache=cache, cache_key=cache_key, job_id=job_id, media_path=selected_file
+            )
+            if not transcribed_data:
+                return _fail_job(job_store, job_id, selected_file, stage, "Transcription failed")
+            text_path = transcribed_data[1]
+            job_store.complete_stage(job_id, "transcribe", {"text_path": text_path})
+            remove_temp_audio(audio_file_path)
+
+        if text_path:
+            stage = "title"
+            with open(text_path, 'r', encoding='utf-8') as f:
+                transcribed_text = f.read()
+            final_text_path = run_stage("title", finalize_transcription, selected_file, transcribed_text, text_path, transcriptions_directory)
+            if not final_text_path:
+                return _fail_job(job_store, job_id, selected_file, stage, f"could not rename {text_path}")
+            job_store.complete_stage(job_id, "title", {"final_text_path": final_text_path})
+
+        stage = "index"
+        # Index the transcription in the vector database (even if the title is generic)
+        from rag_system.indexer import index_transcription
+        run_stage("index", index_transcription, final_text_path, file_name=file_name)
+        job_store.complete_stage(job_id, "index", {"final_text_path": final_text_path})
+    except Exception as e:
+        return _fail_job(job_store, job_id, selected_file, stage, e)
+    return "done", None
+
+def run_upload_flow(selected_file=None):
+    if selected_file is None:
+        print("Opening native macOS file selection dialog...")
+        selected_file = select_file()
+    if not selected_file:
         print("\nNo file selected or operation cancelled.")
+        return
+
+    print(f"File selected successfully!")
+    print(f"Path: {selected_file}")
+    status, stage = ingest_file(selected_file, JobStore(), TranscriptionCache())
+    if status == "failed":
+        print(f"Ingestion stopped at stage '{stage}'. Run the upload again to resume from there.")
 
 if __name__ == "__main__":
-    run_upload_flow()
+    run_upload_flow(sys.argv[1] if len(sys.argv) > 1 else None)
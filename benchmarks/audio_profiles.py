@@ -0,0 +1,75 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from dotenv import load_dotenv
+
+from transcription_pipeline.transcriber import AUDIO_PROFILES, convert_to_audio, load_transcription_engine
+from transcription_pipeline.utils import get_audio_duration
+
+load_dotenv()
+
+def benchmark_profile(media_path, profile, temp_dir, engine=None):
+    """
+    Converts the media file with one audio profile and, if an engine is given,
+    transcribes the result. Returns a dict with the measurements, or None on failure.
+    """
+    start = time.perf_counter()
+    audio_path = convert_to_audio(media_path, temp_dir, job_id=f"bench_{profile}", profile=profile)
+    encode_seconds = time.perf_counter() - start
+    if not audio_path:
+        return None
+    result = {
+        "profile": profile,
+        "encode_seconds": encode_seconds,
+        "bytes": os.path.getsize(audio_path),
+        "audio_seconds": get_audio_duration(audio_path),
+        "transcription_seconds": None,
+    }
+    if engine is not None:
+        start = time.perf_counter()
+        engine.transcribe(audio_path)
+        result["transcription_seconds"] = time.perf_counter() - start
+    os.remove(audio_path)
+    return result
+
+def print_results(results):
+    print(f"\n{'profile':<10} {'encode (s)':>10} {'size (KB)':>10} {'KB/min':>8} {'transcribe (s)':>15}")
+    for r in results:
+        per_minute = r["bytes"] / 1024 / (r["audio_seconds"] / 60) if r["audio_seconds"] else 0.0
+        transcription = f"{r['transcription_seconds']:.2f}" if r["transcription_seconds"] is not None else "-"
+        print(f"{r['profile']:<10} {r['encode_seconds']:>10.2f} {r['bytes'] / 1024:>10.0f} {per_minute:>8.0f} {transcription:>15}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the audio extraction profiles: encode time, upload size and transcription latency.")
+    parser.add_argument("media", help="Video or audio file to convert.")
+    parser.add_argument("--profiles", nargs="+", default=list(AUDIO_PROFILES), choices=list(AUDIO_PROFILES), help="Profiles to compare.")
+    parser.add_argument("--transcribe", action="store_true",
+                        help="Also transcribe each output with the configured engine (TRANSCRIPTION_ENGINE); the OpenAI engine is billed.")
+    args = parser.parse_args()
+
+    engine = None
+    if args.transcribe:
+        try:
+            engine = load_transcription_engine()
+        except (ValueError, ImportError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    temp_dir = tempfile.mkdtemp(prefix="audio_profiles_")
+    results = []
+    try:
+        for profile in args.profiles:
+            result = benchmark_profile(args.media, profile, temp_dir, engine)
+            if result is None:
+                print(f"Profile '{profile}' failed, skipping.", file=sys.stderr)
+                continue
+            results.append(result)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    print_results(results)
+
+if __name__ == "__main__":
+    main()
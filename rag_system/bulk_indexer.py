@@ -0,0 +1,347 @@
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import chromadb
+from openai import OpenAI, APIConnectionError
+from dotenv import load_dotenv
+
+from rag_system.embeddings import get_embeddings, get_embedding_provider, check_embedding_model, text_hash
+from rag_system.collection_state import bump_collection_version, record_source
+from rag_system.indexer import split_transcription, changed_derived_metadata, recording_metadata
+from rag_system.lexical_index import LexicalIndex
+from rag_system.context_assembler import get_token_counter
+from transcription_pipeline.telemetry import span
+from transcription_pipeline.timestamps import load_timeline
+
+load_dotenv()
+
+# OpenAI accepts at most 2048 inputs and 300k tokens per embeddings request
+DEFAULT_MAX_BATCH_TOKENS = 100000
+MAX_BATCH_INPUTS = 2048
+DEFAULT_MAX_IN_FLIGHT = 4
+DEFAULT_WRITE_BATCH_SIZE = 5000
+
+
+def make_batches(items, count_tokens, max_batch_tokens, max_batch_inputs=MAX_BATCH_INPUTS):
+    """
+    Groups (key, text) items into batches under the token and input limits.
+    Yields (batch, token_count) tuples.
+    """
+    batch = []
+    batch_tokens = 0
+    for key, text in items:
+        tokens = count_tokens(text)
+        if batch and (batch_tokens + tokens > max_batch_tokens or len(batch) >= max_batch_inputs):
+            yield batch, batch_tokens
+            batch = []
+            batch_tokens = 0
+        batch.append((key, text))
+        batch_tokens += tokens
+    if batch:
+        yield batch, batch_tokens
+
+
+class AdaptiveConcurrency:
+    """
+    Limits the number of embedding requests in flight (AIMD).
+    The limit is halved on every 429 response and grows back by one after
+    a run of successful requests, up to max_in_flight.
+    """
+
+    def __init__(self, max_in_flight, successes_to_grow=5):
+        self.max_in_flight = max_in_flight
+        self.limit = max_in_flight
+        self.in_flight = 0
+        self.successes = 0
+        self.successes_to_grow = successes_to_grow
+        self.rate_limited = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, rate_limited=False):
+        with self._cond:
+            self.in_flight -= 1
+            if rate_limited:
+                self.rate_limited += 1
+                self.successes = 0
+                self.limit = max(1, self.limit // 2)
+            else:
+                self.successes += 1
+                if self.successes >= self.successes_to_grow and self.limit < self.max_in_flight:
+                    self.limit += 1
+                    self.successes = 0
+            self._cond.notify_all()
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def embed_batch(client, model, texts, limiter, max_retries=8, base_delay=1.0):
+    """
+    Embeds a batch of texts, backing off on rate limits and transient errors.
+    Returns (vectors, tokens_used).
+    """
+    with span("embedding", provider="openai", items=len(texts)) as embedding:
+        vectors, tokens = _request_embeddings(client, model, texts, limiter, max_retries, base_delay)
+        embedding["tokens"] = tokens
+    return vectors, tokens
+
+
+def _request_embeddings(client, model, texts, limiter, max_retries, base_delay):
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            response = client.embeddings.create(model=model, input=texts)
+        except Exception as e:
+            status = getattr(e, "status_code", None)
+            limiter.release(rate_limited=(status == 429))
+            # Connection failures, timeouts, rate limits and server errors; anything else is a bug or bad input
+            transient = isinstance(e, APIConnectionError) or status == 429 or (status is not None and status >= 500)
+            if not transient or attempt >= max_retries:
+                raise
+            delay = _retry_after(e) or base_delay * (2 ** attempt) + random.uniform(0, base_delay)
+            print(f"Embedding request failed ({status or e}), retrying in {delay:.1f}s (limit now {limiter.limit} in flight)...", file=sys.stderr)
+            time.sleep(delay)
+            attempt += 1
+            continue
+        limiter.release()
+        vectors = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        tokens = response.usage.total_tokens if response.usage else 0
+        return vectors, tokens
+
+
+def collect_transcription_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith('.txt') and not f.startswith('temp_'))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            print(f"Warning: '{path}' does not exist, skipping.", file=sys.stderr)
+    return files
+
+
+def bulk_index_transcriptions(paths, collection_name: str = "transcriptions_collection", max_batch_tokens: int = None,
+                              max_in_flight: int = None, write_batch_size: int = None, client=None):
+    """
+    Indexes many transcriptions at once.
+    Chunks from all files are collected first; chunks already stored or already
+    in the embedding cache are not embedded again. The rest is embedded in
+    token-budgeted batches with several requests in flight, and written to
+    Chroma in large batches. Returns a dict with the run statistics.
+    With a local embedding provider (EMBEDDING_PROVIDER), batches are embedded
+    on the CPU instead and no network request is made.
+    A transcription is only updated (stale chunks, keyword index, source table)
+    once all its new chunks are stored; if an embedding batch fails, it keeps
+    its previous chunks and is listed in stats['failed_sources'].
+    """
+    max_batch_tokens = max_batch_tokens or int(os.getenv("BULK_EMBEDDING_BATCH_TOKENS", DEFAULT_MAX_BATCH_TOKENS))
+    max_in_flight = max_in_flight or int(os.getenv("BULK_EMBEDDING_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT))
+    write_batch_size = write_batch_size or DEFAULT_WRITE_BATCH_SIZE
+    cached_embeddings = get_embeddings()
+    model = cached_embeddings.model
+    use_api = get_embedding_provider() == "openai"
+    if client is None and use_api:
+        # Retries are handled here, so that rate limits also reduce the concurrency
+        client = OpenAI(base_url=os.getenv("OPENAI_EMBEDDING_BASE_URL") or None, max_retries=0)
+
+    chroma_client = chromadb.PersistentClient(path="chroma_db")
+    collection = chroma_client.get_or_create_collection(name=collection_name, embedding_function=None, metadata={"embedding_model": model})
+    # Vectors of another model would corrupt the collection (check_embedding_model prints how to migrate it)
+    if not check_embedding_model(collection, model):
+        raise ValueError(f"Collection '{collection_name}' uses another embedding model than '{model}'; nothing was indexed.")
+    max_write_batch = min(write_batch_size, chroma_client.get_max_batch_size())
+    lexical_index = LexicalIndex(collection_name)
+
+    start = time.perf_counter()
+
+    # 1. Collect new chunks across all transcriptions. Nothing is changed until
+    # the new chunks of a transcription are embedded (see step 4)
+    pending = {}  # text hash -> list of (chunk_id, text, metadata)
+    sources = []  # per transcription: source, chunks, IDs, stored IDs and metadata, text hashes of the new chunks
+    total_chunks = 0
+    files = collect_transcription_files(paths)
+    for path in files:
+        source, chunks, chunk_ids = split_transcription(path)
+        total_chunks += len(chunks)
+        existing = collection.get(where={"source": source}, include=["metadatas"])
+        existing_metadatas = dict(zip(existing['ids'], existing['metadatas']))
+        new_hashes = set()
+        for cid, chunk in zip(chunk_ids, chunks):
+            if cid not in existing_metadatas:
+                h = text_hash(chunk.page_content)
+                pending.setdefault(h, []).append((cid, chunk.page_content, chunk.metadata))
+                new_hashes.add(h)
+        sources.append({
+            "source": source,
+            "path": path,
+            "chunks": chunks,
+            "chunk_ids": chunk_ids,
+            "existing_metadatas": existing_metadatas,
+            "new_hashes": new_hashes,
+        })
+    new_chunks = sum(len(entries) for entries in pending.values())
+    print(f"Collected {total_chunks} chunks from {len(files)} transcriptions: {new_chunks} to index.")
+
+    # 2. Serve what we can from the embedding cache
+    buffer = []
+    written = 0
+    removed = 0
+    moved = 0
+    requests = 0
+    tokens_embedded = 0
+    failed_hashes = set()
+    failed_batches = 0
+    failed_sources = []
+    limiter = AdaptiveConcurrency(max_in_flight)
+    cached = {}
+
+    def flush(force=False):
+        nonlocal buffer, written
+        while buffer and (force or len(buffer) >= max_write_batch):
+            batch, buffer = buffer[:max_write_batch], buffer[max_write_batch:]
+            with span("chroma_write", items=len(batch)):
+                collection.upsert(
+                    ids=[b[0] for b in batch],
+                    documents=[b[1] for b in batch],
+                    metadatas=[b[2] for b in batch],
+                    embeddings=[b[3] for b in batch],
+                )
+            written += len(batch)
+
+    def emit(h, vector):
+        for cid, text, metadata in pending[h]:
+            buffer.append((cid, text, metadata, vector))
+
+    def embed_locally(texts, batch_tokens):
+        with span("embedding", provider=get_embedding_provider(), items=len(texts), tokens=batch_tokens):
+            return cached_embeddings.underlying.embed_documents(texts), batch_tokens
+
+    try:
+        cached = cached_embeddings.store.get_many(model, list(pending.keys()))
+        for h, vector in cached.items():
+            emit(h, vector)
+        flush()
+
+        # 3. Embed the rest in token-budgeted batches, several requests in flight.
+        # A failed batch is reported and the others carry on
+        count_tokens = get_token_counter()
+        to_embed = [(h, entries[0][1]) for h, entries in pending.items() if h not in cached]
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            futures = {}
+            for batch, batch_tokens in make_batches(to_embed, count_tokens, max_batch_tokens):
+                texts = [text for _, text in batch]
+                if use_api:
+                    future = executor.submit(embed_batch, client, model, texts, limiter)
+                else:
+                    future = executor.submit(embed_locally, texts, batch_tokens)
+                futures[future] = [h for h, _ in batch]
+            for future in as_completed(futures):
+                hashes = futures[future]
+                try:
+                    vectors, tokens = future.result()
+                except Exception as e:
+                    print(f"Embedding batch of {len(hashes)} chunks failed: {e}", file=sys.stderr)
+                    failed_hashes.update(hashes)
+                    failed_batches += 1
+                    continue
+                requests += 1
+                tokens_embedded += tokens
+                cached_embeddings.store.put_many(model, list(zip(hashes, vectors)))
+                for h, vector in zip(hashes, vectors):
+                    emit(h, vector)
+                flush()
+        flush(force=True)
+
+        # 4. Transcriptions whose new chunks are all stored: drop their stale chunks and
+        # sync the derived metadata, keyword index and source table. The others keep their
+        # previous chunks and are completed by the next run (stored chunks are not embedded again)
+        for entry in sources:
+            source, chunks, chunk_ids = entry["source"], entry["chunks"], entry["chunk_ids"]
+            if entry["new_hashes"] & failed_hashes:
+                failed_sources.append(source)
+                continue
+            existing_metadatas = entry["existing_metadatas"]
+            stale_ids = set(existing_metadatas).difference(chunk_ids)
+            if stale_ids:
+                collection.delete(ids=list(stale_ids))
+                removed += len(stale_ids)
+            moved_ids, moved_metadatas = changed_derived_metadata(existing_metadatas, chunk_ids, chunks)
+            if moved_ids:
+                collection.update(ids=moved_ids, metadatas=moved_metadatas)
+                moved += len(moved_ids)
+            lexical_index.sync_source(source, [(cid, chunk.page_content) for cid, chunk in zip(chunk_ids, chunks)])
+            record_source(collection_name, source, recording_metadata(source, load_timeline(entry["path"])), len(chunks))
+    finally:
+        if written or removed or moved:
+            # Invalidates cached query results, even if the run stopped halfway
+            bump_collection_version(collection_name)
+
+    if failed_sources:
+        print(f"{len(failed_sources)} transcriptions were not fully indexed ({failed_batches} embedding batches failed); "
+              f"run the indexer again to complete them: {', '.join(failed_sources)}", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "files": len(files),
+        "chunks_written": written,
+        "chunks_from_cache": sum(len(pending[h]) for h in cached),
+        "chunks_removed": removed,
+        "failed_batches": failed_batches,
+        "failed_sources": failed_sources,
+        "embedding_requests": requests,
+        "tokens_embedded": tokens_embedded,
+        "rate_limited_responses": limiter.rate_limited,
+        "elapsed_seconds": elapsed,
+        "chunks_per_second": written / elapsed if elapsed else 0.0,
+        "tokens_per_second": tokens_embedded / elapsed if elapsed else 0.0,
+    }
+    print(f"Bulk indexing completed in {elapsed:.1f}s: {written} chunks written ({stats['chunks_from_cache']} from cache), {removed} stale removed, "
+          f"{requests} embedding requests, {limiter.rate_limited} rate-limited responses.")
+    print(f"Throughput: {stats['chunks_per_second']:.1f} chunks/sec, {stats['tokens_per_second']:.1f} tokens/sec")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-index many transcriptions into ChromaDB.")
+    parser.add_argument("paths", nargs="*", default=["transcriptions"], help="Transcription files or directories (defaults to 'transcriptions').")
+    parser.add_argument("--collection", default="transcriptions_collection", help="ChromaDB collection name.")
+    parser.add_argument("--batch-tokens", type=int, default=None, help="Maximum tokens per embedding request.")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="Maximum concurrent embedding requests.")
+    parser.add_argument("--write-batch-size", type=int, default=None, help="Chunks per ChromaDB write.")
+    args = parser.parse_args()
+
+    try:
+        bulk_index_transcriptions(
+            args.paths,
+            collection_name=args.collection,
+            max_batch_tokens=args.batch_tokens,
+            max_in_flight=args.max_in_flight,
+            write_batch_size=args.write_batch_size,
+        )
+    except (ValueError, ImportError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
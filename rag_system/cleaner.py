@@ -1,59 +1,155 @@
+import glob
 import os
+import shutil
+import sqlite3
 import sys
 import curses
-from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
+from rag_system.collection_state import STATE_DB_PATH, bump_collection_version, collection_summary, find_sources, forget_source_chunks, \
+    list_sources_after, recording_timestamp
+from rag_system.lexical_index import LexicalIndex
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Configure API keys
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Listing and deleting documents needs no embedding model (and no network)
 
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY is not set in environment variables.")
+DEFAULT_PAGE_SIZE = 200
+DELETE_BATCH_SIZE = 500
+# Sources matched per metadata filter when deleting many transcriptions
+SOURCES_PER_FILTER = 100
+# Pages kept loaded on each side of the visible one in the interactive mode
+PREFETCH_PAGES = 1
 
-# Initialize OpenAI embedding model (must be the same used for indexing)
-embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY, model=os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small"))
+def _open_db(collection_name: str):
+    return Chroma(persist_directory="chroma_db", collection_name=collection_name)
 
-def get_all_documents(collection_name: str = "transcriptions_collection"):
+def _to_documents(data):
+    return [
+        {'id': doc_id, 'content': content, 'metadata': metadata or {}}
+        for doc_id, content, metadata in zip(data['ids'], data['documents'], data['metadatas'])
+    ]
+
+def count_documents(collection_name: str = "transcriptions_collection"):
+    """Returns the number of documents in a ChromaDB collection, without loading them."""
+    return _open_db(collection_name)._collection.count()
+
+def get_documents_page(offset: int, limit: int = DEFAULT_PAGE_SIZE, collection_name: str = "transcriptions_collection", db=None):
     """
-    Retrieves all documents (ID, content, metadata) from a ChromaDB collection.
+    Retrieves one page of documents (ID, content, metadata), in storage order.
     """
-    try:
-        db = Chroma(persist_directory="chroma_db", embedding_function=embeddings, collection_name=collection_name)
-        all_ids = db.get(include=[])['ids']
-        
-        if not all_ids:
-            return []
-
-        all_docs_data = db.get(ids=all_ids, include=['documents', 'metadatas'])
-        documents = []
-        for i in range(len(all_docs_data['ids'])):
-            documents.append({
-                'id': all_docs_data['ids'][i],
-                'content': all_docs_data['documents'][i],
-                'metadata': all_docs_data['metadatas'][i]
-            })
-        return documents
+    db = db or _open_db(collection_name)
+    return _to_documents(db.get(limit=limit, offset=offset, include=['documents', 'metadatas']))
+
+def iter_pages(collection, collection_name: str = "transcriptions_collection", include=('documents', 'metadatas'),
+               page_size: int = DEFAULT_PAGE_SIZE):
+    """
+    Yields the chunks of a collection as pages of about 'page_size' chunks, in the
+    format of collection.get() ('collection' is a Chroma collection or langchain store).
+    Pages are cut along source names from the source index (a cursor), so each one is
+    a metadata lookup and chunks added or deleted during the scan do not make it skip
+    or repeat others. Collections with chunks missing from the source index (indexed
+    before it existed) are paged by offset instead.
+    """
+    count = collection._collection.count() if hasattr(collection, "_collection") else collection.count()
+    if collection_summary(collection_name)["chunks"] != count:
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=list(include))
+            if not page['ids']:
+                return
+            yield page
+            offset += len(page['ids'])
+    after = ""
+    while True:
+        sources = list_sources_after(collection_name, after, SOURCES_PER_FILTER)
+        if not sources:
+            return
+        batch = []
+        chunks = 0
+        for source, chunk_count in sources:
+            batch.append(source)
+            chunks += chunk_count
+            if chunks >= page_size or source == sources[-1][0]:
+                page = collection.get(where={"source": {"$in": batch}}, include=list(include))
+                if page['ids']:
+                    yield page
+                batch = []
+                chunks = 0
+        after = sources[-1][0]
 
+def iter_documents(collection_name: str = "transcriptions_collection", page_size: int = DEFAULT_PAGE_SIZE):
+    """
+    Yields all documents (ID, content, metadata) of a ChromaDB collection, in
+    source order, loading one page at a time so memory use does not grow with the collection.
+    """
+    try:
+        db = _open_db(collection_name)
+        for page in iter_pages(db, collection_name, page_size=page_size):
+            documents = _to_documents(page)
+            documents.sort(key=lambda doc: (doc['metadata'].get('source', ''), doc['metadata'].get('start_index', 0)))
+            yield from documents
     except Exception as e:
         # This error can occur if the DB is empty or not initialized correctly
         print(f"Error retrieving documents from ChromaDB: {e}", file=sys.stderr)
-        return []
 
-def display_documents_cli(documents):
+def get_all_documents(collection_name: str = "transcriptions_collection"):
+    """
+    Retrieves all documents (ID, content, metadata) from a ChromaDB collection.
+    Prefer iter_documents() for large collections.
+    """
+    return list(iter_documents(collection_name))
+
+class DocumentPager:
     """
-    Prints documents in a readable format for CLI mode.
+    Random access to the documents of a collection for the interactive mode.
+    Only the page containing the requested row and PREFETCH_PAGES pages around
+    it are kept in memory; other pages are loaded when the viewport reaches them.
+    Jumping to a row needs its offset, so pages are read by offset (see
+    get_documents_page); they are dropped by reload() after every deletion.
     """
-    if not documents:
-        print("No documents to display.")
-        return {}
 
-    print(f"Found {len(documents)} documents in the collection.")
+    def __init__(self, collection_name: str = "transcriptions_collection", page_size: int = DEFAULT_PAGE_SIZE):
+        self.collection_name = collection_name
+        self.page_size = page_size
+        self.db = _open_db(collection_name)
+        self.reload()
+
+    def reload(self):
+        """Drops the loaded pages and recounts the documents (e.g. after a deletion)."""
+        self.pages = {}
+        self.total = self.db._collection.count()
+
+    def _page(self, number):
+        if number not in self.pages:
+            self.pages[number] = get_documents_page(number * self.page_size, self.page_size, db=self.db)
+        return self.pages[number]
+
+    def get(self, row):
+        number = row // self.page_size
+        for neighbour in range(number - PREFETCH_PAGES, number + PREFETCH_PAGES + 1):
+            if 0 <= neighbour * self.page_size < self.total:
+                self._page(neighbour)
+        for loaded in list(self.pages):
+            if abs(loaded - number) > PREFETCH_PAGES:
+                del self.pages[loaded]
+        page = self._page(number)
+        index = row % self.page_size
+        return page[index] if index < len(page) else None
+
+def display_documents_cli(documents, total: int = None):
+    """
+    Prints documents in a readable format for CLI mode, as they are produced
+    by the 'documents' iterable. Returns the number of documents printed.
+    """
+    if total is not None:
+        if not total:
+            print("No documents to display.")
+            return 0
+        print(f"Found {total} documents in the collection.")
     print("\n--- Documents in the database ---")
 
-    indexed_docs = {}
+    count = 0
     for i, doc_data in enumerate(documents):
         doc_id = doc_data['id']
         content_snippet = doc_data['content'][:100].replace("\n", " ") + "..." if doc_data['content'] else ""
@@ -64,8 +160,10 @@ def display_documents_cli(documents):
         print(f'   Source: {source}')
         print(f'   Indexed At: {indexed_at}')
         print(f'   Content: "{content_snippet}"')
-        indexed_docs[str(i+1)] = doc_id
-    return indexed_docs
+        count += 1
+    if not count:
+        print("No documents to display.")
+    return count
 
 def delete_documents(ids_to_delete: list, collection_name: str = "transcriptions_collection"):
     """
@@ -76,57 +174,265 @@ def delete_documents(ids_to_delete: list, collection_name: str = "transcriptions
         return
 
     try:
-        db = Chroma(persist_directory="chroma_db", embedding_function=embeddings, collection_name=collection_name)
+        db = Chroma(persist_directory="chroma_db", collection_name=collection_name)
         print(f"\nDeleting {len(ids_to_delete)} documents...")
+        deleted_per_source = {}
+        for metadata in db.get(ids=ids_to_delete, include=["metadatas"])['metadatas']:
+            source = (metadata or {}).get("source")
+            deleted_per_source[source] = deleted_per_source.get(source, 0) + 1
         db.delete(ids=ids_to_delete)
+        LexicalIndex(collection_name).remove(ids_to_delete)
+        forget_source_chunks(collection_name, deleted_per_source)
+        bump_collection_version(collection_name)
         print("Documents deleted successfully.")
 
     except Exception as e:
         print(f"Error deleting documents from ChromaDB: {e}", file=sys.stderr)
 
+def delete_where(where: dict, collection_name: str = "transcriptions_collection", batch_size: int = DELETE_BATCH_SIZE, db=None):
+    """
+    Deletes all the chunks matching a Chroma metadata filter, in batches, keeping
+    the lexical index and the source index in sync. Returns the number of deleted chunks.
+    """
+    db = db or _open_db(collection_name)
+    lexical_index = LexicalIndex(collection_name)
+    deleted = 0
+    while True:
+        # Deleted chunks no longer match, so the next batch is always the first page
+        batch = db.get(where=where, limit=batch_size, include=["metadatas"])
+        if not batch['ids']:
+            break
+        deleted_per_source = {}
+        for metadata in batch['metadatas']:
+            source = (metadata or {}).get("source")
+            deleted_per_source[source] = deleted_per_source.get(source, 0) + 1
+        db.delete(ids=batch['ids'])
+        lexical_index.remove(batch['ids'])
+        forget_source_chunks(collection_name, deleted_per_source)
+        deleted += len(batch['ids'])
+        print(f"Deleted {deleted} chunks...")
+    if deleted:
+        bump_collection_version(collection_name)
+    return deleted
+
+def count_where(where: dict, db, page_size: int = DELETE_BATCH_SIZE):
+    """Counts the chunks matching a Chroma metadata filter, reading their IDs one page at a time."""
+    count = 0
+    while True:
+        ids = db.get(where=where, limit=page_size, offset=count, include=[])['ids']
+        count += len(ids)
+        if len(ids) < page_size:
+            return count
+
+def _confirm(message: str, assume_yes: bool):
+    return assume_yes or input(f"{message} (yes/no): ").lower() == "yes"
+
+def delete_sources(patterns: list, collection_name: str = "transcriptions_collection", assume_yes: bool = False):
+    """
+    Deletes every chunk of the transcriptions matching the given source names
+    or glob patterns (e.g. '2024-01-*'). Returns the number of deleted chunks.
+    """
+    sources = set(find_sources(collection_name, sources=patterns))
+    # Exact names also match transcriptions indexed before the source index existed
+    sources.update(p for p in patterns if not glob.has_magic(p))
+    sources = sorted(sources)
+    db = _open_db(collection_name)
+    filters = [{"source": {"$in": sources[i:i + SOURCES_PER_FILTER]}} for i in range(0, len(sources), SOURCES_PER_FILTER)]
+    matching = sum(count_where(where, db) for where in filters)
+    if not matching:
+        print("No chunks match the given sources.")
+        return 0
+    if not _confirm(f"Delete {matching} chunks from {len(sources)} sources?", assume_yes):
+        print("Deletion cancelled.")
+        return 0
+    deleted = sum(delete_where(where, collection_name, db=db) for where in filters)
+    print(f"{deleted} chunks deleted.")
+    return deleted
+
+def delete_before_date(date: str, collection_name: str = "transcriptions_collection", assume_yes: bool = False):
+    """
+    Deletes every chunk of the recordings made before a YYYY-MM-DD date (their
+    'recording_ts' metadata). Chunks without a recording date are kept.
+    Returns the number of deleted chunks.
+    """
+    where = {"recording_ts": {"$lt": recording_timestamp(date)}}
+    db = _open_db(collection_name)
+    matching = count_where(where, db)
+    if not matching:
+        print(f"No chunks recorded before {date}.")
+        return 0
+    if not _confirm(f"Delete {matching} chunks recorded before {date}?", assume_yes):
+        print("Deletion cancelled.")
+        return 0
+    deleted = delete_where(where, collection_name, db=db)
+    print(f"{deleted} chunks deleted.")
+    return deleted
+
+def _path_size(path: str):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def _vacuum_sqlite(path: str):
+    with sqlite3.connect(path, timeout=30) as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    try:
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+def _rebuild_name(collection_name: str):
+    return f"{collection_name}_rebuild"
+
+def recover_interrupted_rebuild(collection_name: str = "transcriptions_collection", client=None):
+    """
+    Cleans up after a vector index rebuild that stopped halfway (see rebuild_vector_index).
+    A copy made while the original collection still holds its chunks is incomplete
+    and is dropped. A copy left without its original (deleted, or recreated empty
+    since) is complete, so the swap is finished by giving it the original name.
+    Returns True if a leftover copy was found.
+    """
+    import chromadb
+    client = client or chromadb.PersistentClient(path="chroma_db")
+    names = {collection.name for collection in client.list_collections()}
+    temp_name = _rebuild_name(collection_name)
+    if temp_name not in names:
+        return False
+    temp = client.get_collection(name=temp_name, embedding_function=None)
+    original_count = client.get_collection(name=collection_name, embedding_function=None).count() if collection_name in names else 0
+    if original_count or not temp.count():
+        client.delete_collection(name=temp_name)
+        print(f"Removed the incomplete copy left by an interrupted rebuild of '{collection_name}'.")
+    else:
+        if collection_name in names:
+            client.delete_collection(name=collection_name)
+        temp.modify(name=collection_name)
+        print(f"Completed the interrupted rebuild of '{collection_name}': {temp.count()} chunks.")
+    return True
+
+def rebuild_vector_index(collection_name: str = "transcriptions_collection", page_size: int = DEFAULT_PAGE_SIZE):
+    """
+    Rebuilds the HNSW index of a collection from its stored vectors: deleted
+    chunks stay in the index as tombstones, a rebuilt index only holds live ones.
+    The chunks are copied (no re-embedding) into a new collection, which then
+    replaces the old one once it holds as many chunks. If the swap is interrupted,
+    recover_interrupted_rebuild() completes it. The old index directory is removed by compact_db().
+    """
+    import chromadb
+    client = chromadb.PersistentClient(path="chroma_db")
+    recover_interrupted_rebuild(collection_name, client)
+    old = client.get_collection(name=collection_name, embedding_function=None)
+    temp_name = _rebuild_name(collection_name)
+    new = client.create_collection(name=temp_name, embedding_function=None, metadata=old.metadata)
+    copied = 0
+    for page in iter_pages(old, collection_name, include=("embeddings", "documents", "metadatas"), page_size=page_size):
+        new.add(ids=page['ids'], embeddings=page['embeddings'], documents=page['documents'], metadatas=page['metadatas'])
+        copied += len(page['ids'])
+    if new.count() != old.count():
+        client.delete_collection(name=temp_name)
+        raise RuntimeError(f"the rebuilt index of '{collection_name}' holds {new.count()} chunks instead of {old.count()}; "
+                           f"the collection was left unchanged (stop the query server and the indexers, then retry).")
+    client.delete_collection(name=collection_name)
+    new.modify(name=collection_name)
+    print(f"Vector index of '{collection_name}' rebuilt: {copied} chunks.")
+
+def _orphaned_index_dirs(chroma_db_path: str):
+    """Index directories of deleted collections, which Chroma leaves on disk."""
+    with sqlite3.connect(os.path.join(chroma_db_path, "chroma.sqlite3"), timeout=30) as conn:
+        segments = {row[0] for row in conn.execute("SELECT id FROM segments")}
+    return [
+        os.path.join(chroma_db_path, name) for name in os.listdir(chroma_db_path)
+        if os.path.isdir(os.path.join(chroma_db_path, name)) and len(name) == 36 and name.count("-") == 4 and name not in segments
+    ]
+
+def compact_db(rebuild_index: bool = False, collection_name: str = "transcriptions_collection"):
+    """
+    Reclaims the disk space left by deleted chunks: removes the index directories
+    of deleted collections, optimizes the keyword indexes and vacuums every SQLite
+    file of the store. With 'rebuild_index', the HNSW vector index is rebuilt first.
+    Stop the query server before compacting. Returns the number of reclaimed bytes.
+    """
+    chroma_db_path = "chroma_db"
+    if not os.path.exists(os.path.join(chroma_db_path, "chroma.sqlite3")):
+        print(f"No ChromaDB database found in '{chroma_db_path}'. Nothing to compact.")
+        return 0
+    size_before = _path_size(chroma_db_path)
+
+    if rebuild_index:
+        rebuild_vector_index(collection_name)
+    else:
+        recover_interrupted_rebuild(collection_name)
+    for path in _orphaned_index_dirs(chroma_db_path):
+        size = _path_size(path)
+        shutil.rmtree(path)
+        print(f"Removed unused index directory {os.path.basename(path)}: {size / 1024 / 1024:.1f} MB")
+    for path in sorted(glob.glob(os.path.join(chroma_db_path, "lexical_*.sqlite3"))):
+        LexicalIndex(db_path=path).optimize()
+    sqlite_files = sorted(glob.glob(os.path.join(chroma_db_path, "*.sqlite3")))
+    if os.path.exists(STATE_DB_PATH) and STATE_DB_PATH not in sqlite_files:
+        sqlite_files.append(STATE_DB_PATH)
+    for path in sqlite_files:
+        size = _path_size(path)
+        _vacuum_sqlite(path)
+        print(f"Vacuumed {os.path.basename(path)}: {size / 1024 / 1024:.1f} MB -> {_path_size(path) / 1024 / 1024:.1f} MB")
+
+    reclaimed = size_before - _path_size(chroma_db_path)
+    print(f"Compaction completed: {reclaimed / 1024 / 1024:.1f} MB reclaimed ({size_before / 1024 / 1024:.1f} MB before).")
+    return reclaimed
+
+def _document_line(doc_data, number, selected, width):
+    content_snippet = doc_data['content'][:width-20].replace("\n", " ") + "..." if doc_data['content'] else ""
+    source = doc_data['metadata'].get('source', 'N/A')
+    indexed_at = doc_data['metadata'].get('indexed_at', 'N/A')
+    display_string = f"[{'X' if selected else ' '}] {number}. Source: {source}, Indexed At: {indexed_at}, Content: \"{content_snippet}\" ".encode('utf-8', 'ignore').decode('utf-8')
+    # Truncate the string if it's longer than the terminal width
+    return display_string[:width-1]
+
 def interactive_main(stdscr):
     curses.curs_set(0)  # Hide cursor
-    stdscr.nodelay(True) # Don't block waiting for input
     stdscr.clear()
     stdscr.refresh()
 
-    documents = get_all_documents()
-    if not documents:
+    pager = DocumentPager()
+    if not pager.total:
         stdscr.addstr(0, 0, "No documents found in the database.")
         stdscr.addstr(1, 0, "Press any key to exit.")
         stdscr.getch()
         return
 
     current_row = 0
+    first_row = 0 # First document shown in the viewport
     selected_docs = set() # Set of selected document IDs for deletion
+    start_row = 2
 
     while True:
-        stdscr.clear()
+        # Redraw only after input: getch() below blocks until a key is pressed
+        stdscr.erase()
         h, w = stdscr.getmaxyx()
+        visible_rows = max(1, h - start_row - 2)
+        if current_row < first_row:
+            first_row = current_row
+        elif current_row >= first_row + visible_rows:
+            first_row = current_row - visible_rows + 1
 
         title = "--- ChromaDB Document Management (Press 'q' to quit, Space to select/deselect, Enter to delete) ---"
-        stdscr.addstr(0, 0, title)
-
-        start_row = 2
-        for idx, doc_data in enumerate(documents):
-            doc_id = doc_data['id']
-            content_snippet = doc_data['content'][:w-20].replace("\n", " ") + "..." if doc_data['content'] else ""
-            source = doc_data['metadata'].get('source', 'N/A')
-            indexed_at = doc_data['metadata'].get('indexed_at', 'N/A')
-
-            display_string = f"[{'X' if doc_id in selected_docs else ' '}] {idx+1}. Source: {source}, Indexed At: {indexed_at}, Content: \"{content_snippet}\" ".encode('utf-8', 'ignore').decode('utf-8')
-            
-            # Truncate the string if it's longer than the terminal width
-            if len(display_string) >= w:
-                display_string = display_string[:w-1]
+        stdscr.addstr(0, 0, title[:w-1])
 
+        for idx in range(first_row, min(pager.total, first_row + visible_rows)):
+            doc_data = pager.get(idx)
+            if doc_data is None:
+                break
+            display_string = _document_line(doc_data, idx + 1, doc_data['id'] in selected_docs, w)
             if idx == current_row:
                 stdscr.attron(curses.A_REVERSE)
-                stdscr.addstr(start_row + idx, 0, display_string)
+                stdscr.addstr(start_row + idx - first_row, 0, display_string)
                 stdscr.attroff(curses.A_REVERSE)
             else:
-                stdscr.addstr(start_row + idx, 0, display_string)
-        
+                stdscr.addstr(start_row + idx - first_row, 0, display_string)
+        status = f"{current_row + 1}/{pager.total}, {len(selected_docs)} selected (PgUp/PgDn, Home/End to move faster)"
+        stdscr.addstr(h-1, 0, status[:w-1])
+
         stdscr.refresh()
 
         key = stdscr.getch()
@@ -135,39 +441,49 @@ def interactive_main(stdscr):
         elif key == curses.KEY_UP:
             current_row = max(0, current_row - 1)
         elif key == curses.KEY_DOWN:
-            current_row = min(len(documents) - 1, current_row + 1)
+            current_row = min(pager.total - 1, current_row + 1)
+        elif key == curses.KEY_PPAGE:
+            current_row = max(0, current_row - visible_rows)
+        elif key == curses.KEY_NPAGE:
+            current_row = min(pager.total - 1, current_row + visible_rows)
+        elif key == curses.KEY_HOME:
+            current_row = 0
+        elif key == curses.KEY_END:
+            current_row = pager.total - 1
         elif key == ord(' '): # Spacebar
-            doc_id_to_toggle = documents[current_row]['id']
-            if doc_id_to_toggle in selected_docs:
-                selected_docs.remove(doc_id_to_toggle)
-            else:
-                selected_docs.add(doc_id_to_toggle)
+            doc_data = pager.get(current_row)
+            if doc_data is not None:
+                if doc_data['id'] in selected_docs:
+                    selected_docs.remove(doc_data['id'])
+                else:
+                    selected_docs.add(doc_data['id'])
         elif key == curses.KEY_ENTER or key == 10: # Enter
             if selected_docs:
                 # Ask for confirmation before deleting
-                stdscr.addstr(h-2, 0, f"Confirm deletion of {len(selected_docs)} documents? (y/n)")
+                stdscr.move(h-2, 0)
+                stdscr.clrtobot()
+                stdscr.addstr(h-2, 0, f"Confirm deletion of {len(selected_docs)} documents? (y/n)"[:w-1])
                 stdscr.refresh()
                 confirm_key = stdscr.getch()
                 while confirm_key not in [ord('y'), ord('n')]:
                     confirm_key = stdscr.getch()
-                
+
                 if confirm_key == ord('y'):
                     delete_documents(list(selected_docs))
                     # Reload documents after deletion
-                    documents = get_all_documents()
+                    pager.reload()
                     selected_docs.clear()
                     current_row = 0 # Reset selection
-                    stdscr.addstr(h-1, 0, "Documents deleted. Press any key to continue.")
+                    first_row = 0
+                    stdscr.addstr(h-1, 0, "Documents deleted. Press any key to continue."[:w-1])
                     stdscr.getch()
+                    if not pager.total:
+                        break
                 else:
-                    stdscr.addstr(h-1, 0, "Deletion cancelled. Press any key to continue.")
+                    stdscr.addstr(h-1, 0, "Deletion cancelled. Press any key to continue."[:w-1])
                     stdscr.getch()
-                stdscr.clear() # Clear confirmation message
-                stdscr.refresh()
 
 
-import shutil
-
 def delete_full_db():
     """
     Deletes the entire ChromaDB directory.
@@ -187,18 +503,47 @@ def delete_full_db():
         print("Deletion cancelled.")
 
 def main():
+    # A rebuild interrupted by a crash leaves the chunks in another collection
+    if sys.argv[1:2] != ["delete-all"] and os.path.exists(os.path.join("chroma_db", "chroma.sqlite3")):
+        try:
+            recover_interrupted_rebuild()
+        except Exception as e:
+            print(f"Warning: could not check for an interrupted index rebuild: {e}", file=sys.stderr)
+
     # If command line arguments are provided, use CLI mode
     if len(sys.argv) >= 2:
         command = sys.argv[1]
         if command == "list":
-            documents = get_all_documents()
-            display_documents_cli(documents)
+            display_documents_cli(iter_documents(), total=count_documents())
         elif command == "delete":
             if len(sys.argv) < 3:
                 print("Error: Specify document IDs to delete.", file=sys.stderr)
                 sys.exit(1)
             ids_to_delete = sys.argv[2:]
             delete_documents(ids_to_delete)
+        elif command in ("delete-source", "delete-before-date"):
+            assume_yes = "--yes" in sys.argv[2:]
+            values = [arg for arg in sys.argv[2:] if arg != "--yes"]
+            if not values:
+                print(f"Error: Specify the {'sources' if command == 'delete-source' else 'date (YYYY-MM-DD)'} to delete.", file=sys.stderr)
+                sys.exit(1)
+            try:
+                if command == "delete-source":
+                    delete_sources(values, assume_yes=assume_yes)
+                else:
+                    delete_before_date(values[0], assume_yes=assume_yes)
+            except ValueError as e:
+                print(f"Error: {e}", file=sys.stderr)
+                sys.exit(1)
+            except Exception as e:
+                print(f"Error deleting documents from ChromaDB: {e}", file=sys.stderr)
+                sys.exit(1)
+        elif command == "compact":
+            try:
+                compact_db(rebuild_index="--rebuild-index" in sys.argv[2:])
+            except Exception as e:
+                print(f"Error compacting ChromaDB: {e}", file=sys.stderr)
+                sys.exit(1)
         elif command == "delete-all":
             delete_full_db()
         else:
@@ -206,13 +551,13 @@ def main():
             sys.exit(1)
     else: # No arguments, try interactive mode with curses
         if sys.platform == "win32":
-            print("Interactive mode is not supported on Windows. Use: python cleaner.py [list | delete <id1> ... | delete-all]", file=sys.stderr)
+            print("Interactive mode is not supported on Windows. Use: python -m rag_system.cleaner [list | delete <id1> ... | delete-source <name|pattern> ... | delete-before-date <YYYY-MM-DD> | compact | delete-all]", file=sys.stderr)
             sys.exit(1)
         try:
             curses.wrapper(interactive_main)
         except curses.error as e:
             print(f"Error initializing curses: {e}", file=sys.stderr)
-            print("Interactive mode requires a curses-compatible terminal. Use: python cleaner.py [list | delete <id1> ... | delete-all]", file=sys.stderr)
+            print("Interactive mode requires a curses-compatible terminal. Use: python -m rag_system.cleaner [list | delete <id1> ... | delete-source <name|pattern> ... | delete-before-date <YYYY-MM-DD> | compact | delete-all]", file=sys.stderr)
             sys.exit(1)
 
 if __name__ == "__main__":
@@ -0,0 +1,224 @@
+import fnmatch
+import os
+import sqlite3
+import uuid
+from datetime import datetime, timezone
+
+STATE_DB_PATH = os.path.join("chroma_db", "collection_state.sqlite3")
+
+# Languages known to Whisper, by the ISO-639-1 code faster-whisper reports; the
+# OpenAI API (verbose_json) reports their English names instead
+LANGUAGE_NAMES = {
+    "en": "english", "zh": "chinese", "de": "german", "es": "spanish", "ru": "russian", "ko": "korean",
+    "fr": "french", "ja": "japanese", "pt": "portuguese", "tr": "turkish", "pl": "polish", "ca": "catalan",
+    "nl": "dutch", "ar": "arabic", "sv": "swedish", "it": "italian", "id": "indonesian", "hi": "hindi",
+    "fi": "finnish", "vi": "vietnamese", "he": "hebrew", "uk": "ukrainian", "el": "greek", "ms": "malay",
+    "cs": "czech", "ro": "romanian", "da": "danish", "hu": "hungarian", "ta": "tamil", "no": "norwegian",
+    "th": "thai", "ur": "urdu", "hr": "croatian", "bg": "bulgarian", "lt": "lithuanian", "la": "latin",
+    "mi": "maori", "ml": "malayalam", "cy": "welsh", "sk": "slovak", "te": "telugu", "fa": "persian",
+    "lv": "latvian", "bn": "bengali", "sr": "serbian", "az": "azerbaijani", "sl": "slovenian", "kn": "kannada",
+    "et": "estonian", "mk": "macedonian", "br": "breton", "eu": "basque", "is": "icelandic", "hy": "armenian",
+    "ne": "nepali", "mn": "mongolian", "bs": "bosnian", "kk": "kazakh", "sq": "albanian", "sw": "swahili",
+    "gl": "galician", "mr": "marathi", "pa": "punjabi", "si": "sinhala", "km": "khmer", "sn": "shona",
+    "yo": "yoruba", "so": "somali", "af": "afrikaans", "oc": "occitan", "ka": "georgian", "be": "belarusian",
+    "tg": "tajik", "sd": "sindhi", "gu": "gujarati", "am": "amharic", "yi": "yiddish", "lo": "lao",
+    "uz": "uzbek", "fo": "faroese", "ht": "haitian creole", "ps": "pashto", "tk": "turkmen", "nn": "nynorsk",
+    "mt": "maltese", "sa": "sanskrit", "lb": "luxembourgish", "my": "myanmar", "bo": "tibetan", "tl": "tagalog",
+    "mg": "malagasy", "as": "assamese", "tt": "tatar", "haw": "hawaiian", "ln": "lingala", "ha": "hausa",
+    "ba": "bashkir", "jw": "javanese", "su": "sundanese", "yue": "cantonese",
+}
+LANGUAGE_CODES = {name: code for code, name in LANGUAGE_NAMES.items()}
+LANGUAGE_CODES.update({
+    "burmese": "my", "valencian": "ca", "flemish": "nl", "haitian": "ht", "letzeburgesch": "lb", "pushto": "ps",
+    "panjabi": "pa", "moldavian": "ro", "moldovan": "ro", "sinhalese": "si", "castilian": "es", "mandarin": "zh",
+})
+
+def _connect():
+    os.makedirs(os.path.dirname(STATE_DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(STATE_DB_PATH, timeout=30)
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS collection_versions (
+            collection_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sources (
+            collection_name TEXT NOT NULL,
+            source TEXT NOT NULL,
+            recording_date TEXT,
+            recording_ts INTEGER,
+            duration_seconds REAL,
+            language TEXT,
+            chunk_count INTEGER NOT NULL,
+            indexed_at TEXT NOT NULL,
+            first_indexed_at TEXT,
+            PRIMARY KEY (collection_name, source)
+        )
+    """)
+    # Databases created before first_indexed_at existed
+    if "first_indexed_at" not in {row[1] for row in conn.execute("PRAGMA table_info(sources)")}:
+        conn.execute("ALTER TABLE sources ADD COLUMN first_indexed_at TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS sources_recording_ts ON sources (collection_name, recording_ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS sources_chunk_count ON sources (collection_name, chunk_count)")
+    # The generation changes whenever the state file is recreated (e.g. after delete-all),
+    # so versions from a deleted database are never mistaken for current ones
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', ?)", (uuid.uuid4().hex[:12],))
+    return conn
+
+def get_collection_version(collection_name: str = "transcriptions_collection"):
+    """
+    Returns an opaque token that changes every time the collection content changes.
+    """
+    with _connect() as conn:
+        generation = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+        row = conn.execute("SELECT version FROM collection_versions WHERE collection_name = ?", (collection_name,)).fetchone()
+    return f"{generation}:{row[0] if row else 0}"
+
+def bump_collection_version(collection_name: str = "transcriptions_collection"):
+    """Records that the collection content changed. Call after every add or delete."""
+    with _connect() as conn:
+        conn.execute("""
+            INSERT INTO collection_versions (collection_name, version) VALUES (?, 1)
+            ON CONFLICT(collection_name) DO UPDATE SET version = version + 1
+        """, (collection_name,))
+
+def recording_timestamp(date_string: str):
+    """Converts a YYYY-MM-DD date to the UTC timestamp stored as 'recording_ts' (raises ValueError if invalid)."""
+    return int(datetime.strptime(date_string, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
+
+def normalize_language(language: str):
+    """
+    Returns the code under which a language is stored ('it' for 'italian', 'Italian'
+    or 'it-IT'), so transcriptions from every engine and filters given either
+    way match. Unknown values are returned lowercased.
+    """
+    language = language.strip().lower().replace("_", "-")
+    if language in LANGUAGE_NAMES:
+        return language
+    if language in LANGUAGE_CODES:
+        return LANGUAGE_CODES[language]
+    base = language.split("-")[0]
+    return base if base in LANGUAGE_NAMES else language
+
+def language_forms(language: str):
+    """
+    Values a language can be stored as: its code and, for transcriptions indexed
+    before languages were normalized, its English names.
+    """
+    code = normalize_language(language)
+    return [code] + sorted(name for name, name_code in LANGUAGE_CODES.items() if name_code == code)
+
+def record_source(collection_name: str, source: str, metadata: dict, chunk_count: int):
+    """
+    Records an indexed transcription in the source index, with the recording
+    metadata shared by all its chunks (see indexer.recording_metadata).
+    The time it was first indexed is kept when it is indexed again.
+    """
+    now = datetime.now().isoformat()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO sources (collection_name, source, recording_date, recording_ts, duration_seconds, language, chunk_count, indexed_at, first_indexed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(collection_name, source) DO UPDATE SET recording_date = excluded.recording_date, recording_ts = excluded.recording_ts, "
+            "duration_seconds = excluded.duration_seconds, language = excluded.language, chunk_count = excluded.chunk_count, "
+            "indexed_at = excluded.indexed_at, first_indexed_at = COALESCE(sources.first_indexed_at, sources.indexed_at)",
+            (collection_name, source, metadata.get("recording_date"), metadata.get("recording_ts"),
+             metadata.get("duration_seconds"), metadata.get("language"), chunk_count, now, now)
+        )
+
+def forget_source_chunks(collection_name: str, chunk_counts: dict):
+    """Updates the source index after deleting chunks; 'chunk_counts' maps sources to deleted chunks."""
+    with _connect() as conn:
+        for source, count in chunk_counts.items():
+            conn.execute(
+                "UPDATE sources SET chunk_count = chunk_count - ? WHERE collection_name = ? AND source = ?",
+                (count, collection_name, source)
+            )
+        conn.execute("DELETE FROM sources WHERE collection_name = ? AND chunk_count <= 0", (collection_name,))
+
+def find_sources(collection_name: str = "transcriptions_collection", sources: list = None, date_from: str = None,
+                 date_to: str = None, language: str = None):
+    """
+    Returns the indexed sources matching the filters: source names or glob
+    patterns, an inclusive YYYY-MM-DD recording date range and a language.
+    """
+    query = "SELECT source FROM sources WHERE collection_name = ?"
+    params = [collection_name]
+    if date_from:
+        query += " AND recording_ts >= ?"
+        params.append(recording_timestamp(date_from))
+    if date_to:
+        query += " AND recording_ts <= ?"
+        params.append(recording_timestamp(date_to))
+    if language:
+        forms = language_forms(language)
+        query += f" AND language IN ({','.join('?' * len(forms))})"
+        params.extend(forms)
+    with _connect() as conn:
+        names = [row[0] for row in conn.execute(query + " ORDER BY source", params)]
+    if sources:
+        names = [name for name in names if any(fnmatch.fnmatchcase(name, pattern) for pattern in sources)]
+    return names
+
+def list_sources_after(collection_name: str = "transcriptions_collection", after: str = "", limit: int = 100):
+    """
+    Returns up to 'limit' (source, chunk_count) tuples of the source index, in
+    name order, starting after the source 'after' (keyset pagination: each page
+    is an index lookup, and sources added or removed meanwhile do not shift it).
+    """
+    with _connect() as conn:
+        return conn.execute(
+            "SELECT source, chunk_count FROM sources WHERE collection_name = ? AND source > ? ORDER BY source LIMIT ?",
+            (collection_name, after, limit)
+        ).fetchall()
+
+def copy_sources(from_collection: str, to_collection: str):
+    """Copies the source index entries of a collection to another one (e.g. when re-embedding it)."""
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO sources (collection_name, source, recording_date, recording_ts, duration_seconds, language, chunk_count, indexed_at, first_indexed_at) "
+            "SELECT ?, source, recording_date, recording_ts, duration_seconds, language, chunk_count, indexed_at, first_indexed_at FROM sources WHERE collection_name = ?",
+            (to_collection, from_collection)
+        )
+
+def forget_collection_sources(collection_name: str):
+    """Removes all the source index entries of a collection."""
+    with _connect() as conn:
+        conn.execute("DELETE FROM sources WHERE collection_name = ?", (collection_name,))
+
+def collection_summary(collection_name: str = "transcriptions_collection"):
+    """
+    Aggregates the source index of a collection: number of sources and chunks,
+    distribution of chunks per source, recorded duration and the oldest and
+    newest indexing times. Reads one row per source, never the chunks themselves.
+    """
+    with _connect() as conn:
+        sources, chunks, mean, duration, oldest, newest = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(chunk_count), 0), AVG(chunk_count), SUM(duration_seconds), "
+            "MIN(COALESCE(first_indexed_at, indexed_at)), MAX(indexed_at) FROM sources WHERE collection_name = ?",
+            (collection_name,)
+        ).fetchone()
+
+        def percentile(fraction):
+            if not sources:
+                return None
+            row = conn.execute(
+                "SELECT chunk_count FROM sources WHERE collection_name = ? ORDER BY chunk_count LIMIT 1 OFFSET ?",
+                (collection_name, min(sources - 1, int(sources * fraction)))
+            ).fetchone()
+            return row[0]
+
+        chunks_per_source = {
+            "min": percentile(0), "median": percentile(0.5), "p90": percentile(0.9), "max": percentile(1),
+            "mean": mean,
+        }
+    return {
+        "sources": sources,
+        "chunks": chunks,
+        "chunks_per_source": chunks_per_source,
+        "duration_seconds": duration,
+        "oldest_indexed_at": oldest,
+        "newest_indexed_at": newest,
+    }
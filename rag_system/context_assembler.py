@@ -0,0 +1,119 @@
+import os
+import re
+
+# Context token budget per LLM backend (Ollama models often run with a 2048-token window)
+DEFAULT_CONTEXT_BUDGETS = {"gemini": 6000, "ollama": 1500}
+DUPLICATE_THRESHOLD = 0.8
+SHINGLE_SIZE = 5
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def get_token_counter():
+    """
+    Returns a function counting the tokens of a text.
+    Falls back to a 4-characters-per-token estimate if tiktoken is unavailable.
+    """
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode_ordinary(text))
+    except Exception:
+        return lambda text: max(1, len(text) // 4)
+
+def get_context_budget(model_type: str):
+    """Returns the context token budget for a backend, from CONTEXT_TOKEN_BUDGET_<BACKEND>."""
+    default = DEFAULT_CONTEXT_BUDGETS.get(model_type, min(DEFAULT_CONTEXT_BUDGETS.values()))
+    return int(os.getenv(f"CONTEXT_TOKEN_BUDGET_{model_type.upper()}", default))
+
+def _span(doc):
+    """Character span of a chunk in its transcription, or None if unknown (indexed without start_index)."""
+    start = doc.metadata.get("start_index")
+    if start is None:
+        return None
+    return start, start + len(doc.page_content)
+
+def _overlaps(a, b):
+    if a.metadata.get("source") != b.metadata.get("source"):
+        return False
+    span_a, span_b = _span(a), _span(b)
+    return span_a is not None and span_b is not None and span_a[0] <= span_b[1] and span_b[0] <= span_a[1]
+
+def _shingles(text):
+    words = TOKEN_RE.findall(text.lower())
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+
+def merge_chunks(docs: list):
+    """
+    Merges overlapping or adjacent chunks of the same transcription into blocks,
+    so the text they share appears only once. Blocks are ordered by source (most
+    relevant source first, 'docs' being in relevance order) and by position.
+    Returns a list of {"source", "start", "text", "docs"} dicts.
+    """
+    source_rank = {}
+    for rank, doc in enumerate(docs):
+        source_rank.setdefault(doc.metadata.get("source"), rank)
+
+    blocks = []
+    open_blocks = {}  # source -> block that the next positioned chunk may extend
+    positioned = sorted(
+        (doc for doc in docs if _span(doc) is not None),
+        key=lambda doc: (source_rank[doc.metadata.get("source")], _span(doc)[0])
+    )
+    for doc in positioned:
+        source = doc.metadata.get("source")
+        start, end = _span(doc)
+        block = open_blocks.get(source)
+        if block is not None and start <= block["end"]:
+            if end > block["end"]:
+                block["text"] += doc.page_content[block["end"] - start:]
+                block["end"] = end
+            block["docs"].append(doc)
+            continue
+        block = {"source": source, "start": start, "end": end, "text": doc.page_content, "docs": [doc]}
+        open_blocks[source] = block
+        blocks.append(block)
+    for doc in docs:
+        if _span(doc) is None:
+            blocks.append({"source": doc.metadata.get("source"), "start": 0, "end": None, "text": doc.page_content, "docs": [doc]})
+
+    blocks.sort(key=lambda block: (source_rank[block["source"]], block["start"]))
+    return blocks
+
+def render_context(blocks: list):
+    return "\n\n".join(f"[{block['source']}]\n{block['text']}" for block in blocks)
+
+def assemble_context(docs: list, token_budget: int, count_tokens=None):
+    """
+    Builds the prompt context from the retrieved chunks (in relevance order):
+    near-duplicates are dropped, overlapping chunks are merged, and chunks are
+    added by relevance as long as the context fits in 'token_budget'.
+    Returns (context, used_docs, context_tokens).
+    """
+    count_tokens = count_tokens or get_token_counter()
+    selected = []
+    selected_shingles = []
+    tokens = 0
+    for doc in docs:
+        shingles = _shingles(doc.page_content)
+        duplicate = any(
+            not _overlaps(doc, other) and len(shingles & other_shingles) / (len(shingles | other_shingles) or 1) >= DUPLICATE_THRESHOLD
+            for other, other_shingles in zip(selected, selected_shingles)
+        )
+        if duplicate:
+            continue
+        candidate_tokens = count_tokens(render_context(merge_chunks(selected + [doc])))
+        if candidate_tokens > token_budget:
+            continue
+        selected.append(doc)
+        selected_shingles.append(shingles)
+        tokens = candidate_tokens
+
+    if not selected and docs:
+        # Even the best chunk alone is over budget: keep a truncated copy of it
+        doc = docs[0]
+        text = doc.page_content
+        while text and count_tokens(render_context([{"source": doc.metadata.get("source"), "text": text}])) > token_budget:
+            text = text[:int(len(text) * 0.9)]
+        context = render_context([{"source": doc.metadata.get("source"), "text": text}])
+        return context, [doc], count_tokens(context)
+
+    return render_context(merge_chunks(selected)), selected, tokens
@@ -0,0 +1,300 @@
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+
+DEFAULT_CACHE_PATH = os.path.join(os.getcwd(), "cache", "embeddings.sqlite3")
+DEFAULT_MAX_ENTRIES = 200000
+DEFAULT_LOCAL_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_HASHING_DIM = 1024
+DEFAULT_BATCH_SIZE = 64
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def text_hash(text: str):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    On-disk embedding cache keyed by (model, text hash).
+    Vectors are stored as raw float32 arrays in SQLite; the least recently
+    used entries are evicted once the store holds more than max_entries.
+    """
+
+    def __init__(self, db_path: str = None, max_entries: int = None):
+        self.db_path = db_path or os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.max_entries = max_entries or int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get_many(self, model: str, hashes: list):
+        """Returns a dict mapping the cached hashes to their vectors (numpy float32 arrays)."""
+        found = {}
+        if not hashes:
+            return found
+        now = time.time()
+        with self._connect() as conn:
+            # Stay below SQLite's limit on the number of query parameters
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for h, vector in rows:
+                    found[h] = np.frombuffer(vector, dtype=np.float32)
+                if rows:
+                    conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                        [(now, model, h) for h, _ in rows]
+                    )
+        return found
+
+    def put_many(self, model: str, items: list):
+        """Stores (text_hash, vector) pairs and evicts old entries if the store is full."""
+        if not items:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_access) VALUES (?, ?, ?, ?)",
+                [(model, h, np.asarray(vector, dtype=np.float32).tobytes(), now) for h, vector in items]
+            )
+            count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                # Evict down to 90% of the limit so eviction doesn't run on every insert
+                to_evict = count - int(self.max_entries * 0.9)
+                conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                    (to_evict,)
+                )
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves repeated texts from the on-disk EmbeddingStore
+    and only sends cache misses to the underlying model.
+    """
+
+    def __init__(self, underlying: Embeddings, model: str, store: EmbeddingStore = None):
+        self.underlying = underlying
+        self.model = model
+        self.store = store or EmbeddingStore()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: list):
+        hashes = [text_hash(t) for t in texts]
+        cached = self.store.get_many(self.model, list(set(hashes)))
+
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in cached and h not in missing:
+                missing[h] = t
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            new_items = list(zip(missing.keys(), vectors))
+            self.store.put_many(self.model, new_items)
+            for h, vector in new_items:
+                cached[h] = np.asarray(vector, dtype=np.float32)
+
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        return [cached[h].tolist() for h in hashes]
+
+    def embed_query(self, text: str):
+        h = text_hash(text)
+        cached = self.store.get_many(self.model, [h])
+        if h in cached:
+            with self._lock:
+                self.hits += 1
+            return cached[h].tolist()
+        vector = self.underlying.embed_query(text)
+        self.store.put_many(self.model, [(h, vector)])
+        with self._lock:
+            self.misses += 1
+        return list(vector)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Base class for local (CPU) embedding backends.
+    Texts are embedded in batches of 'batch_size' with one vectorized call per
+    batch, and batches run concurrently on a pool of 'threads' workers.
+    Subclasses implement _embed_batch(texts) -> 2D numpy array.
+    """
+
+    def __init__(self, batch_size: int = None, threads: int = None):
+        self.batch_size = batch_size or int(os.getenv("EMBEDDING_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+        threads = threads or int(os.getenv("EMBEDDING_THREADS", min(4, os.cpu_count() or 1)))
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="embed")
+
+    def _embed_batch(self, texts: list):
+        raise NotImplementedError
+
+    def embed_documents(self, texts: list):
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            return self._embed_batch(batches[0]).tolist()
+        return np.vstack(list(self._executor.map(self._embed_batch, batches))).tolist()
+
+    def embed_query(self, text: str):
+        return self._embed_batch([text])[0].tolist()
+
+
+class HashingEmbeddings(BatchedEmbeddings):
+    """
+    Deterministic hashing vectorizer: words and word bigrams are hashed into
+    'dim' buckets (signed, log-scaled counts, L2-normalized).
+    Needs no model and no network; meant for tests and offline setups, as it
+    only captures shared vocabulary, not meaning.
+    """
+
+    def __init__(self, dim: int = None, **kwargs):
+        super().__init__(**kwargs)
+        self.dim = dim or int(os.getenv("EMBEDDING_HASHING_DIM", DEFAULT_HASHING_DIM))
+
+    def _embed_batch(self, texts: list):
+        rows, buckets, signs = [], [], []
+        for row, text in enumerate(texts):
+            words = TOKEN_RE.findall(text.lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                h = zlib.crc32(feature.encode('utf-8'))
+                rows.append(row)
+                buckets.append(h % self.dim)
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(matrix, (np.array(rows, dtype=np.int64), np.array(buckets, dtype=np.int64)), np.array(signs, dtype=np.float32))
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+
+class LocalEmbeddings(BatchedEmbeddings):
+    """Sentence-transformers model running locally on the CPU."""
+
+    def __init__(self, model_name: str = None, **kwargs):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError("sentence-transformers is not installed. Please install it with 'pip install sentence-transformers'")
+        super().__init__(**kwargs)
+        self.model = SentenceTransformer(model_name or os.getenv("EMBEDDING_LOCAL_MODEL", DEFAULT_LOCAL_MODEL), device="cpu")
+
+    def _embed_batch(self, texts: list):
+        return self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True, normalize_embeddings=True)
+
+
+def get_embedding_provider():
+    """Returns the provider selected by EMBEDDING_PROVIDER: 'openai' (default), 'local' or 'hashing'."""
+    return os.getenv("EMBEDDING_PROVIDER", "openai").lower()
+
+
+def create_embeddings(provider: str = None):
+    """
+    Creates the embedding backend for a provider.
+    Returns (embeddings, model_name); the model name identifies the vector space,
+    both in the embedding cache and in the collection metadata.
+    Raises ValueError if the configuration is invalid and ImportError if the
+    local backend is not installed.
+    """
+    provider = provider or get_embedding_provider()
+    if provider == "openai":
+        if not os.getenv("OPENAI_API_KEY"):
+            raise ValueError("OPENAI_API_KEY is not set in environment variables (or set EMBEDDING_PROVIDER to 'local' or 'hashing').")
+        from langchain_openai import OpenAIEmbeddings
+        model = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+        underlying = OpenAIEmbeddings(
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            openai_api_base=os.getenv("OPENAI_EMBEDDING_BASE_URL") or None,
+            model=model
+        )
+        return underlying, model
+    if provider == "local":
+        underlying = LocalEmbeddings()
+        return underlying, f"local:{os.getenv('EMBEDDING_LOCAL_MODEL', DEFAULT_LOCAL_MODEL)}"
+    if provider == "hashing":
+        underlying = HashingEmbeddings()
+        return underlying, f"hashing:{underlying.dim}"
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {provider}. Please set EMBEDDING_PROVIDER to 'openai', 'local' or 'hashing'.")
+
+
+def check_embedding_model(collection, model: str):
+    """
+    Warns if a Chroma collection was embedded with another model than 'model':
+    its vectors would not be comparable with the new ones.
+    Collections created before the model was recorded are stamped with 'model'
+    when they are empty or when the provider is 'openai' (the only one they could
+    have been embedded with); with another provider they get a warning.
+    """
+    metadata = collection.metadata or {}
+    stored = metadata.get("embedding_model")
+    if not stored:
+        if collection.count() and get_embedding_provider() != "openai":
+            print(f"Warning: collection '{collection.name}' has no recorded embedding model, so it was embedded with OpenAI, "
+                  f"but the current embedding model is '{model}'. "
+                  f"Re-embed it with: python -m rag_system.migrate_embeddings {collection.name} <new_collection>", file=sys.stderr)
+            return False
+        collection.modify(metadata={**metadata, "embedding_model": model})
+        return True
+    if stored != model:
+        print(f"Warning: collection '{collection.name}' was embedded with '{stored}' but the current embedding model is '{model}'. "
+              f"Re-embed it with: python -m rag_system.migrate_embeddings {collection.name} <new_collection>", file=sys.stderr)
+        return False
+    return True
+
+
+_shared_embeddings = None
+_shared_lock = threading.Lock()
+
+
+def get_embeddings():
+    """
+    Returns the process-wide cached embedding model of the configured provider.
+    All modules must use it so that indexing and querying share the same model and cache.
+    """
+    global _shared_embeddings
+    with _shared_lock:
+        if _shared_embeddings is None:
+            underlying, model = create_embeddings()
+            _shared_embeddings = CachedEmbeddings(underlying, model)
+        return _shared_embeddings
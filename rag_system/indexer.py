@@ -1,55 +1,192 @@
 import os
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
+import re
+import hashlib
+from datetime import datetime
+import chromadb
+from rag_system.embeddings import get_embeddings, check_embedding_model
+from rag_system.collection_state import bump_collection_version, normalize_language, record_source, recording_timestamp
+from rag_system.lexical_index import LexicalIndex
+from transcription_pipeline.telemetry import span
+from transcription_pipeline.timestamps import load_timeline, time_range
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Configure API keys
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+# Metadata derived from the transcription file rather than from the chunk text
+# (position, time range, recording info); it can change while the chunk content does not
+DERIVED_KEYS = (
+    "start_index", "start_seconds", "end_seconds", "media_path",
+    "recording_date", "recording_ts", "duration_seconds", "language",
+)
 
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY is not set in environment variables.")
+# Transcriptions are named YYYY-MM-DD_title.txt after the recording date
+RECORDING_DATE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})_")
 
-# Initialize OpenAI embedding model
-embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY, model=os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small"))
+def chunk_id(source: str, content: str, occurrence: int = 0):
+    """
+    Returns a deterministic chunk ID built from the source name and a hash of the content.
+    'occurrence' disambiguates identical chunks repeated within the same source.
+    """
+    digest = hashlib.sha256(content.encode('utf-8')).hexdigest()[:32]
+    if occurrence:
+        return f"{source}:{digest}:{occurrence}"
+    return f"{source}:{digest}"
 
-def index_transcription(transcription_path: str, collection_name: str = "transcriptions_collection"):
+def recording_metadata(source: str, timeline: dict = None):
     """
-    Indexes a single transcription into the ChromaDB vector database.
-    The collection name is 'transcriptions_collection' by default.
+    Returns the metadata shared by all chunks of a transcription: the recording
+    date (parsed from the filename prefix, also as a UTC timestamp for range
+    filters), and the duration and language when the timeline has them.
     """
-    print(f"\nStarting transcription indexing: {transcription_path}")
+    metadata = {}
+    match = RECORDING_DATE_RE.match(source)
+    if match:
+        try:
+            metadata["recording_ts"] = recording_timestamp(match.group(1))
+            metadata["recording_date"] = match.group(1)
+        except ValueError:
+            pass
+    if timeline:
+        if timeline.get("duration_seconds") is not None:
+            metadata["duration_seconds"] = timeline["duration_seconds"]
+        if timeline.get("language"):
+            # Stored as a code whichever engine transcribed it ('italian' and 'it' are both 'it')
+            metadata["language"] = normalize_language(timeline["language"])
+    return metadata
 
-    # Load transcription content
-    with open(transcription_path, 'r', encoding='utf-8') as f:
-        text = f.read()
+def telemetry_file_name(transcription_path: str, timeline: dict = None):
+    """
+    Name the telemetry spans of a transcription are keyed by: the recorded
+    media file when the timeline knows it, as for the conversion and
+    transcription spans, otherwise the transcription file.
+    """
+    if timeline and timeline.get("media_path"):
+        return os.path.basename(timeline["media_path"])
+    return os.path.basename(transcription_path)
 
-    # Split text into chunks
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,  # Chunk size
-        chunk_overlap=200 # Overlap between chunks to maintain context
-    )
-    chunks = text_splitter.create_documents([text])
+def split_transcription(transcription_path: str, file_name: str = None):
+    """
+    Loads a transcription and splits it into chunks with metadata and stable IDs.
+    Every chunk carries the recording metadata (see recording_metadata()) and,
+    if the transcription has timestamps (see transcription_pipeline/timestamps.py),
+    the time range it covers and the path of the media file.
+    'file_name' keys the telemetry span (see telemetry_file_name()).
+    Returns (source, chunks, chunk_ids).
+    """
+    source = os.path.basename(transcription_path)
+    timeline = load_timeline(transcription_path)
+    with span("chunking", file_name or telemetry_file_name(transcription_path, timeline)) as chunking:
+        # Load transcription content
+        with open(transcription_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+
+        # Split text into chunks
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1000,  # Chunk size
+            chunk_overlap=200, # Overlap between chunks to maintain context
+            add_start_index=True # Character offset of each chunk, to locate it in the transcription
+        )
+        chunks = text_splitter.create_documents([text])
+        chunking["bytes"] = len(text.encode('utf-8'))
+        chunking["items"] = len(chunks)
 
     # Add metadata to chunks (e.g., original file name and indexed timestamp)
-    from datetime import datetime
+    # and derive a stable ID from the source and the chunk content
     indexed_at = datetime.now().isoformat()
+    recording = recording_metadata(source, timeline)
+    occurrences = {}
+    chunk_ids = []
     for chunk in chunks:
-        chunk.metadata = {"source": os.path.basename(transcription_path), "indexed_at": indexed_at}
+        start_index = chunk.metadata["start_index"]
+        chunk.metadata = {"source": source, "indexed_at": indexed_at, "start_index": start_index, **recording}
+        if timeline:
+            time_span = time_range(timeline, start_index, start_index + len(chunk.page_content))
+            if time_span:
+                chunk.metadata["start_seconds"], chunk.metadata["end_seconds"] = time_span
+            if timeline.get("media_path"):
+                chunk.metadata["media_path"] = timeline["media_path"]
+        base_id = chunk_id(source, chunk.page_content)
+        occurrence = occurrences.get(base_id, 0)
+        occurrences[base_id] = occurrence + 1
+        chunk_ids.append(chunk_id(source, chunk.page_content, occurrence))
+    return source, chunks, chunk_ids
+
+def changed_derived_metadata(existing_metadatas: dict, chunk_ids: list, chunks: list):
+    """
+    Finds the stored chunks whose content is unchanged but whose derived
+    metadata differs (e.g. text was inserted before them, or timestamps were added).
+    'existing_metadatas' maps the stored chunk IDs to their metadata.
+    Returns (ids, metadatas) to update without embedding the chunks again.
+    """
+    ids, metadatas = [], []
+    for cid, chunk in zip(chunk_ids, chunks):
+        old = existing_metadatas.get(cid)
+        if old is None:
+            continue
+        derived = {key: chunk.metadata[key] for key in DERIVED_KEYS if key in chunk.metadata}
+        if any(old.get(key) != value for key, value in derived.items()):
+            ids.append(cid)
+            metadatas.append({**old, **derived})
+    return ids, metadatas
+
+def index_transcription(transcription_path: str, collection_name: str = "transcriptions_collection", file_name: str = None):
+    """
+    Indexes a single transcription into the ChromaDB vector database.
+    The collection name is 'transcriptions_collection' by default.
+    Indexing is incremental: only new or changed chunks are embedded, and chunks
+    that no longer exist in the transcription are removed.
+    'file_name' keys the telemetry spans; the ingestion passes the original media
+    name so that all the stages of a recording are reported together.
+    """
+    print(f"\nStarting transcription indexing: {transcription_path}")
+    file_name = file_name or telemetry_file_name(transcription_path, load_timeline(transcription_path))
+    source, chunks, chunk_ids = split_transcription(transcription_path, file_name)
 
     # Initialize ChromaDB (creates or connects to the local DB)
     # The DB will be saved in the 'chroma_db' folder in the project root
-    db = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        persist_directory="chroma_db",
-        collection_name=collection_name
+    # Shared embedding model with on-disk cache (must be the same used for querying)
+    embeddings = get_embeddings()
+    collection = chromadb.PersistentClient(path="chroma_db").get_or_create_collection(
+        name=collection_name, embedding_function=None, metadata={"embedding_model": embeddings.model}
     )
+    # Vectors of another model would corrupt the collection (check_embedding_model prints how to migrate it)
+    if not check_embedding_model(collection, embeddings.model):
+        raise ValueError(f"Collection '{collection_name}' uses another embedding model than '{embeddings.model}'; nothing was indexed.")
+
+    existing = collection.get(where={"source": source}, include=["metadatas"])
+    existing_metadatas = dict(zip(existing['ids'], existing['metadatas']))
+    stale_ids = set(existing_metadatas).difference(chunk_ids)
+    new_chunks = [(cid, chunk) for cid, chunk in zip(chunk_ids, chunks) if cid not in existing_metadatas]
+    moved_ids, moved_metadatas = changed_derived_metadata(existing_metadatas, chunk_ids, chunks)
+
+    # Only new or changed chunks are embedded; the vectors are computed
+    # before writing so that embedding and storage are timed separately
+    vectors = []
+    if new_chunks:
+        with span("embedding", file_name, items=len(new_chunks)):
+            vectors = embeddings.embed_documents([chunk.page_content for _, chunk in new_chunks])
+    with span("chroma_write", file_name, items=len(stale_ids) + len(new_chunks) + len(moved_ids)):
+        if stale_ids:
+            collection.delete(ids=list(stale_ids))
+        if new_chunks:
+            collection.upsert(
+                ids=[cid for cid, _ in new_chunks],
+                documents=[chunk.page_content for _, chunk in new_chunks],
+                metadatas=[chunk.metadata for _, chunk in new_chunks],
+                embeddings=vectors,
+            )
+        if moved_ids:
+            collection.update(ids=moved_ids, metadatas=moved_metadatas)
+    # Keep the keyword index in sync with the stored chunks (cheap, no API calls)
+    LexicalIndex(collection_name).sync_source(source, [(cid, chunk.page_content) for cid, chunk in zip(chunk_ids, chunks)])
+    record_source(collection_name, source, recording_metadata(source, load_timeline(transcription_path)), len(chunks))
+    if stale_ids or new_chunks or moved_ids:
+        # Invalidates cached query results
+        bump_collection_version(collection_name)
 
-    print(f"Indexing completed for {transcription_path}. {len(chunks)} chunks added.")
+    unchanged = len(chunks) - len(new_chunks)
+    print(f"Indexing completed for {transcription_path}. {len(new_chunks)} chunks added, {unchanged} unchanged, {len(stale_ids)} removed.")
 
 if __name__ == "__main__":
     # Example usage (to test the indexer directly)
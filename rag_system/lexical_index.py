@@ -0,0 +1,137 @@
+import os
+import re
+import sqlite3
+import sys
+
+LEXICAL_INDEX_DIR = "chroma_db"
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+class LexicalIndex:
+    """
+    On-disk inverted index over the indexed chunks, used for BM25 keyword search.
+    It is an SQLite FTS5 table (one database per collection, stored next to the
+    Chroma files), so lookups only read the posting lists of the query terms.
+    """
+
+    def __init__(self, collection_name: str = "transcriptions_collection", db_path: str = None):
+        self.db_path = db_path or os.path.join(LEXICAL_INDEX_DIR, f"lexical_{collection_name}.sqlite3")
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS docs (
+                    rowid INTEGER PRIMARY KEY,
+                    chunk_id TEXT NOT NULL UNIQUE,
+                    source TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS docs_source ON docs (source)")
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS postings USING fts5(content, tokenize='unicode61 remove_diacritics 2')")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def add(self, chunks: list):
+        """Adds (chunk_id, source, text) tuples; chunks already present are skipped."""
+        with self._connect() as conn:
+            for chunk_id, source, text in chunks:
+                cursor = conn.execute("INSERT OR IGNORE INTO docs (chunk_id, source) VALUES (?, ?)", (chunk_id, source))
+                if cursor.rowcount:
+                    conn.execute("INSERT INTO postings (rowid, content) VALUES (?, ?)", (cursor.lastrowid, text))
+
+    def remove(self, chunk_ids: list):
+        with self._connect() as conn:
+            for chunk_id in chunk_ids:
+                row = conn.execute("SELECT rowid FROM docs WHERE chunk_id = ?", (chunk_id,)).fetchone()
+                if row:
+                    conn.execute("DELETE FROM postings WHERE rowid = ?", row)
+                    conn.execute("DELETE FROM docs WHERE rowid = ?", row)
+
+    def sync_source(self, source: str, chunks: list):
+        """
+        Makes the index content for 'source' match the given (chunk_id, text) pairs,
+        adding missing chunks and removing the ones that no longer exist.
+        """
+        with self._connect() as conn:
+            existing = {row[0] for row in conn.execute("SELECT chunk_id FROM docs WHERE source = ?", (source,))}
+        wanted = {chunk_id for chunk_id, _ in chunks}
+        stale = existing - wanted
+        if stale:
+            self.remove(list(stale))
+        missing = [(chunk_id, source, text) for chunk_id, text in chunks if chunk_id not in existing]
+        if missing:
+            self.add(missing)
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM postings")
+            conn.execute("DELETE FROM docs")
+
+    def optimize(self):
+        """Merges the FTS5 b-trees, dropping the entries of deleted chunks (run before VACUUM)."""
+        with self._connect() as conn:
+            conn.execute("INSERT INTO postings (postings) VALUES ('optimize')")
+
+    def search(self, query: str, k: int = 20, sources: list = None):
+        """
+        Returns up to k (chunk_id, score) pairs ranked by BM25, best first.
+        Any query term can match; higher scores are better.
+        If 'sources' is given, only chunks of those transcriptions are returned.
+        """
+        terms = TOKEN_RE.findall(query)
+        if not terms:
+            return []
+        # Quote every term so that FTS5 operators in the query are taken literally
+        match = " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        with self._connect() as conn:
+            if sources is None:
+                rows = conn.execute(
+                    "SELECT docs.chunk_id, ranked.rank FROM "
+                    "(SELECT rowid, rank FROM postings WHERE postings MATCH ? ORDER BY rank LIMIT ?) AS ranked "
+                    "JOIN docs ON docs.rowid = ranked.rowid ORDER BY ranked.rank",
+                    (match, k)
+                ).fetchall()
+            else:
+                # A temporary table rather than one SQL variable per source, which
+                # would fail past SQLite's variable limit for large source filters
+                conn.execute("CREATE TEMP TABLE wanted_sources (source TEXT PRIMARY KEY)")
+                conn.executemany("INSERT OR IGNORE INTO wanted_sources (source) VALUES (?)", ((source,) for source in sources))
+                rows = conn.execute(
+                    "SELECT docs.chunk_id, postings.rank FROM postings JOIN docs ON docs.rowid = postings.rowid "
+                    "JOIN wanted_sources ON wanted_sources.source = docs.source "
+                    "WHERE postings MATCH ? ORDER BY postings.rank LIMIT ?",
+                    (match, k)
+                ).fetchall()
+        # FTS5 ranks are negated BM25 scores (lower is better)
+        return [(chunk_id, -rank) for chunk_id, rank in rows]
+
+def rebuild_lexical_index(collection_name: str = "transcriptions_collection", page_size: int = 1000):
+    """Rebuilds the lexical index from the documents stored in Chroma."""
+    import chromadb
+    collection = chromadb.PersistentClient(path="chroma_db").get_or_create_collection(name=collection_name, embedding_function=None)
+    index = LexicalIndex(collection_name)
+    index.clear()
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+        if not page["ids"]:
+            break
+        index.add([
+            (chunk_id, (metadata or {}).get("source", ""), document or "")
+            for chunk_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"])
+        ])
+        offset += len(page["ids"])
+    print(f"Lexical index rebuilt for '{collection_name}': {offset} chunks.")
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == "rebuild":
+        rebuild_lexical_index()
+    elif len(sys.argv) >= 3 and sys.argv[1] == "search":
+        for chunk_id, score in LexicalIndex().search(" ".join(sys.argv[2:])):
+            print(f"{score:8.3f}  {chunk_id}")
+    else:
+        print("Usage: python -m rag_system.lexical_index [rebuild | search <terms>]", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+NO_ANSWER_MESSAGE = "Non ho informazioni sufficienti per rispondere a questa domanda basandomi sul contesto fornito."
+
+def load_llm(model_type: str = None):
+    """
+    Configures the language model selected by LLM_TYPE ('gemini' or 'ollama').
+    Returns a (model_type, model) tuple. Raises ValueError if the configuration is invalid
+    and ImportError if the Ollama backend is not installed.
+    The Ollama model is served through a pooled async client (see ollama_client.py).
+    """
+    model_type = model_type or os.getenv("LLM_TYPE", "gemini")
+    if model_type == "gemini":
+        if not os.getenv("GOOGLE_API_KEY"):
+            raise ValueError("GOOGLE_API_KEY environment variable is not set. Please set it with: export GOOGLE_API_KEY='YOUR_API_KEY_GOOGLE'")
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        model = genai.GenerativeModel(os.getenv("GEMINI_MODEL", "gemini-1.5-flash"))
+    elif model_type == "ollama":
+        try:
+            import httpx  # noqa: F401
+        except ImportError:
+            raise ImportError("httpx is not installed. Please install it with 'pip install httpx'")
+        from rag_system.ollama_client import OllamaLLM
+        model = OllamaLLM()
+    else:
+        raise ValueError(f"Unknown LLM_TYPE: {model_type}. Please set LLM_TYPE to 'gemini' or 'ollama'.")
+    return model_type, model
+
+def build_prompt(query_string: str, context: str):
+    return f"""Based on the following context, answer the question. If the answer is not in the context, say "{NO_ANSWER_MESSAGE}".\n\n        Context:\n        {context}\n\n        Question: {query_string}\n\n        Answer:"""
+
+def generate_answer(model_type: str, model, prompt: str):
+    """Runs the prompt through the configured model and returns the answer text."""
+    if model_type == "gemini":
+        response = model.generate_content(prompt)
+        return response.text.strip()
+    response = model.invoke(prompt)
+    return response.strip()
+
+class AnswerStream:
+    """
+    Iterates over the answer text as the model generates it.
+    Once exhausted, metrics() returns the time to first token and the generation speed.
+    """
+
+    def __init__(self, model_type: str, model, prompt: str):
+        self.model_type = model_type
+        self.model = model
+        self.prompt = prompt
+        self.parts = []
+        self.output_tokens = 0
+        self.first_token_seconds = None
+        self.total_seconds = None
+
+    def _pieces(self):
+        if self.model_type == "gemini":
+            response = self.model.generate_content(self.prompt, stream=True)
+            for chunk in response:
+                # Chunks without text parts (e.g. safety metadata) raise on .text
+                try:
+                    yield chunk.text
+                except ValueError:
+                    continue
+            usage = getattr(response, "usage_metadata", None)
+            if usage is not None and usage.candidates_token_count:
+                self.output_tokens = usage.candidates_token_count
+        else:
+            # Ollama streams one token per chunk, and reports the exact count at the end
+            stats = {}
+            for piece in self.model.stream(self.prompt, stats):
+                self.output_tokens += 1
+                yield piece
+            if stats.get("eval_count"):
+                self.output_tokens = stats["eval_count"]
+
+    def __iter__(self):
+        start = time.perf_counter()
+        for piece in self._pieces():
+            if not piece:
+                continue
+            if self.first_token_seconds is None:
+                self.first_token_seconds = time.perf_counter() - start
+            self.parts.append(piece)
+            yield piece
+        self.total_seconds = time.perf_counter() - start
+        if not self.output_tokens and self.parts:
+            # No usage metadata returned: estimate ~4 characters per token
+            self.output_tokens = max(1, len(self.text) // 4)
+
+    @property
+    def text(self):
+        return "".join(self.parts).strip()
+
+    def metrics(self):
+        first_token = self.first_token_seconds or 0.0
+        total = self.total_seconds or 0.0
+        decode_seconds = total - first_token
+        return {
+            "time_to_first_token": first_token,
+            "generation": total,
+            "output_tokens": self.output_tokens,
+            "tokens_per_second": self.output_tokens / decode_seconds if decode_seconds > 0 else 0.0,
+        }
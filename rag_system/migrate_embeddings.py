@@ -0,0 +1,82 @@
+import argparse
+import sys
+import chromadb
+from dotenv import load_dotenv
+from rag_system.collection_state import bump_collection_version, copy_sources, forget_collection_sources
+from rag_system.embeddings import get_embeddings
+from rag_system.lexical_index import LexicalIndex
+
+load_dotenv()
+
+DEFAULT_PAGE_SIZE = 500
+
+def migrate_embeddings(source_collection: str, target_collection: str, replace: bool = False, page_size: int = DEFAULT_PAGE_SIZE):
+    """
+    Re-embeds every chunk of 'source_collection' with the configured embedding
+    provider (EMBEDDING_PROVIDER) into 'target_collection'. Texts, ids and
+    metadata are copied as they are, so nothing is re-transcribed or re-chunked.
+    With 'replace', the source collection is then deleted and the target takes its name.
+    Returns the number of migrated chunks.
+    """
+    embeddings = get_embeddings()
+    chroma_client = chromadb.PersistentClient(path="chroma_db")
+    source = chroma_client.get_collection(name=source_collection, embedding_function=None)
+    target = chroma_client.get_or_create_collection(name=target_collection, embedding_function=None, metadata={"embedding_model": embeddings.model})
+    stored_model = (target.metadata or {}).get("embedding_model")
+    if stored_model and stored_model != embeddings.model:
+        raise ValueError(f"Collection '{target_collection}' already exists with embedding model '{stored_model}'.")
+
+    # The lexical index of the source is reused as it is when replacing it
+    lexical_index = None if replace else LexicalIndex(target_collection)
+    total = source.count()
+    migrated = 0
+    while True:
+        page = source.get(limit=page_size, offset=migrated, include=["documents", "metadatas"])
+        if not page["ids"]:
+            break
+        documents = [document or "" for document in page["documents"]]
+        target.upsert(
+            ids=page["ids"],
+            embeddings=embeddings.embed_documents(documents),
+            documents=documents,
+            metadatas=page["metadatas"]
+        )
+        if lexical_index is not None:
+            lexical_index.add([
+                (chunk_id, (metadata or {}).get("source", ""), document)
+                for chunk_id, document, metadata in zip(page["ids"], documents, page["metadatas"])
+            ])
+        migrated += len(page["ids"])
+        print(f"Re-embedded {migrated}/{total} chunks...")
+
+    if replace:
+        chroma_client.delete_collection(name=source_collection)
+        target.modify(name=source_collection)
+        forget_collection_sources(target_collection)
+        bump_collection_version(source_collection)
+        print(f"Collection '{source_collection}' now uses embedding model '{embeddings.model}'.")
+    else:
+        copy_sources(source_collection, target_collection)
+        bump_collection_version(target_collection)
+        print(f"Collection '{target_collection}' created with embedding model '{embeddings.model}'.")
+    return migrated
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed an indexed collection with the configured embedding provider, without re-transcribing.")
+    parser.add_argument("source", help="Existing collection to re-embed.")
+    parser.add_argument("target", help="New collection to write the re-embedded chunks to.")
+    parser.add_argument("--replace", action="store_true", help="Delete the source collection afterwards and give its name to the new one.")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="Chunks read and embedded per batch.")
+    args = parser.parse_args()
+
+    try:
+        migrate_embeddings(args.source, args.target, replace=args.replace, page_size=args.page_size)
+    except (ValueError, ImportError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error migrating embeddings: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import os
+import queue
+import sys
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_BASE_URL = "http://localhost:11434"
+DEFAULT_MAX_CONCURRENCY = 2
+DEFAULT_KEEP_ALIVE = "30m"
+DEFAULT_TIMEOUT = 300
+
+class AsyncOllamaClient:
+    """
+    asyncio client for the Ollama HTTP API.
+    Requests share one pooled keep-alive HTTP session, at most 'max_concurrency'
+    generations run at the same time, and every request asks Ollama to keep
+    the model loaded for 'keep_alive' so it does not reload between queries.
+    """
+
+    def __init__(self, base_url: str = None, model: str = None, max_concurrency: int = None, keep_alive: str = None, timeout: float = None):
+        import httpx
+        self.base_url = (base_url or os.getenv("OLLAMA_BASE_URL", DEFAULT_BASE_URL)).rstrip("/")
+        self.model = model or os.getenv("OLLAMA_MODEL", "llama2")
+        self.max_concurrency = max_concurrency or int(os.getenv("OLLAMA_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+        self.keep_alive = keep_alive or os.getenv("OLLAMA_KEEP_ALIVE", DEFAULT_KEEP_ALIVE)
+        timeout = timeout or float(os.getenv("OLLAMA_TIMEOUT", DEFAULT_TIMEOUT))
+        self._http = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def _payload(self, prompt: str, stream: bool):
+        return {"model": self.model, "prompt": prompt, "stream": stream, "keep_alive": self.keep_alive}
+
+    async def warm_up(self):
+        """Loads the model into memory (an empty prompt only loads it) and keeps it there."""
+        response = await self._http.post("/api/generate", json={"model": self.model, "keep_alive": self.keep_alive})
+        response.raise_for_status()
+
+    async def generate(self, prompt: str):
+        """Returns the final response object of /api/generate ('response' holds the text)."""
+        async with self._semaphore:
+            response = await self._http.post("/api/generate", json=self._payload(prompt, False))
+            response.raise_for_status()
+            return response.json()
+
+    async def stream(self, prompt: str, stats: dict = None):
+        """
+        Yields the answer text piece by piece as Ollama generates it.
+        If 'stats' is given, it is filled with the final statistics (eval_count, eval_duration, ...).
+        """
+        async with self._semaphore:
+            async with self._http.stream("POST", "/api/generate", json=self._payload(prompt, True)) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    message = json.loads(line)
+                    if message.get("error"):
+                        raise RuntimeError(f"Ollama error: {message['error']}")
+                    if message.get("response"):
+                        yield message["response"]
+                    if message.get("done") and stats is not None:
+                        stats.update({key: value for key, value in message.items() if key not in ("response", "context")})
+
+    async def aclose(self):
+        await self._http.aclose()
+
+class OllamaLLM:
+    """
+    Synchronous front end to AsyncOllamaClient, usable from any thread.
+    The client lives on a dedicated event loop thread, so all callers (e.g. the
+    query server workers) share its connection pool and concurrency limit.
+    """
+
+    def __init__(self, warm_up: bool = True, **client_options):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="ollama-client", daemon=True)
+        self._thread.start()
+        self.client = self._run(self._create_client(client_options))
+        if warm_up:
+            try:
+                self._run(self.client.warm_up())
+            except Exception as e:
+                print(f"Warning: could not preload Ollama model '{self.client.model}' from {self.client.base_url}: {e}", file=sys.stderr)
+
+    async def _create_client(self, client_options):
+        # Created on the loop thread so its semaphore and pool belong to that loop
+        return AsyncOllamaClient(**client_options)
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def invoke(self, prompt: str):
+        return self._run(self.client.generate(prompt))["response"]
+
+    def stream(self, prompt: str, stats: dict = None):
+        """
+        Yields the answer pieces as they arrive from the event loop thread.
+        Closing the generator early (e.g. the client disconnected) cancels the
+        generation, which closes the HTTP stream and frees its concurrency slot.
+        """
+        pieces = queue.Queue()
+        done = object()
+
+        async def produce():
+            try:
+                async for piece in self.client.stream(prompt, stats):
+                    pieces.put(piece)
+            except Exception as e:
+                pieces.put(e)
+            finally:
+                pieces.put(done)
+
+        future = asyncio.run_coroutine_threadsafe(produce(), self._loop)
+        try:
+            while True:
+                item = pieces.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    def close(self):
+        self._run(self.client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
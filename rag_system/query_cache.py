@@ -0,0 +1,160 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.path.join(os.getcwd(), "cache", "query_cache.sqlite3")
+DEFAULT_TTL_SECONDS = 24 * 3600
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+
+def normalize_query(query: str):
+    return " ".join(query.lower().split())
+
+class QueryCache:
+    """
+    Two-level cache of query results.
+    Level 1 maps the exact (normalized) query to its embedding, retrieved chunk IDs and answer.
+    Level 2 returns the answer of a cached query whose embedding has a cosine
+    similarity above 'threshold' with the new query embedding.
+    Entries are tied to a collection version (see collection_state.py) and are
+    ignored as soon as the collection changes. Old entries expire after
+    'ttl_seconds' and the least recently used ones are evicted above 'max_entries'.
+    """
+
+    def __init__(self, db_path: str = None, ttl_seconds: float = None, max_entries: int = None, threshold: float = None):
+        self.db_path = db_path or os.getenv("QUERY_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.ttl_seconds = ttl_seconds or float(os.getenv("QUERY_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        self.max_entries = max_entries or int(os.getenv("QUERY_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        self.threshold = threshold or float(os.getenv("QUERY_CACHE_SIMILARITY", DEFAULT_SIMILARITY_THRESHOLD))
+        self._lock = threading.Lock()
+        # In-memory copy of the embeddings of one (collection, version), for level 2 lookups
+        self._matrix_key = None
+        self._matrix_ids = []
+        self._matrix = None
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    collection_name TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    chunk_ids TEXT NOT NULL,
+                    answer TEXT,
+                    sources TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    UNIQUE (collection_name, version, query)
+                )
+            """)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _row_to_entry(self, row):
+        entry_id, embedding, chunk_ids, answer, sources = row
+        return {
+            "id": entry_id,
+            "embedding": np.frombuffer(embedding, dtype=np.float32).tolist(),
+            "chunk_ids": json.loads(chunk_ids),
+            "answer": answer,
+            "sources": json.loads(sources),
+        }
+
+    def _touch(self, conn, entry_id):
+        conn.execute("UPDATE entries SET last_access = ? WHERE id = ?", (time.time(), entry_id))
+
+    def get_exact(self, collection_name: str, version: str, query: str):
+        """Level 1: returns the entry cached for this exact query, or None."""
+        min_created = time.time() - self.ttl_seconds
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, embedding, chunk_ids, answer, sources FROM entries "
+                "WHERE collection_name = ? AND version = ? AND query = ? AND created_at >= ?",
+                (collection_name, version, normalize_query(query), min_created)
+            ).fetchone()
+            if row is None:
+                return None
+            self._touch(conn, row[0])
+        return self._row_to_entry(row)
+
+    def _load_matrix(self, conn, collection_name: str, version: str):
+        """Refreshes the in-memory embedding matrix when the cached entries changed."""
+        key = (collection_name, version) + conn.execute(
+            "SELECT COUNT(*), MAX(id) FROM entries WHERE collection_name = ? AND version = ?",
+            (collection_name, version)
+        ).fetchone()
+        if key == self._matrix_key:
+            return
+        rows = conn.execute(
+            "SELECT id, embedding FROM entries WHERE collection_name = ? AND version = ?",
+            (collection_name, version)
+        ).fetchall()
+        self._matrix_ids = [row[0] for row in rows]
+        if rows:
+            matrix = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            self._matrix = matrix / np.where(norms == 0, 1, norms)
+        else:
+            self._matrix = None
+        self._matrix_key = key
+
+    def get_similar(self, collection_name: str, version: str, embedding: list):
+        """
+        Level 2: returns the most similar cached entry if its cosine similarity
+        with 'embedding' is at least the threshold, or None. The entry includes its 'similarity'.
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        min_created = time.time() - self.ttl_seconds
+        with self._lock, self._connect() as conn:
+            self._load_matrix(conn, collection_name, version)
+            if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+                return None
+            similarities = self._matrix @ (vector / norm)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            row = conn.execute(
+                "SELECT id, embedding, chunk_ids, answer, sources FROM entries WHERE id = ? AND created_at >= ?",
+                (self._matrix_ids[best], min_created)
+            ).fetchone()
+            if row is None:
+                return None
+            self._touch(conn, row[0])
+        entry = self._row_to_entry(row)
+        entry["similarity"] = float(similarities[best])
+        return entry
+
+    def put(self, collection_name: str, version: str, query: str, embedding: list, chunk_ids: list, answer: str, sources: list):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (collection_name, version, query, embedding, chunk_ids, answer, sources, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (collection_name, version, normalize_query(query), np.asarray(embedding, dtype=np.float32).tobytes(),
+                 json.dumps(chunk_ids), answer, json.dumps(sources), now, now)
+            )
+            self._evict(conn, collection_name, version, now)
+
+    def _evict(self, conn, collection_name: str, version: str, now: float):
+        # Entries of older collection versions can never be hit again
+        conn.execute("DELETE FROM entries WHERE collection_name = ? AND version != ?", (collection_name, version))
+        conn.execute("DELETE FROM entries WHERE created_at < ?", (now - self.ttl_seconds,))
+        count = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM entries WHERE id IN (SELECT id FROM entries ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries")
@@ -0,0 +1,181 @@
+import json
+import os
+import time
+
+from rag_system.embeddings import get_embeddings
+from rag_system.retriever import get_db, get_retrieval_mode, query_chroma_db
+from rag_system.llm import load_llm, build_prompt, generate_answer, AnswerStream
+from rag_system.query_cache import QueryCache
+from rag_system.collection_state import get_collection_version
+from rag_system.reranker import load_reranker, rerank, DEFAULT_RERANK_CANDIDATES, DEFAULT_RERANK_TOP_K
+from rag_system.context_assembler import assemble_context, get_context_budget, get_token_counter
+from transcription_pipeline.telemetry import get_telemetry
+
+class QueryEngine:
+    """
+    Answers questions over the indexed transcriptions.
+    The Chroma handle, the embedding client and the LLM are created once,
+    so a long-lived process (see query_server.py) pays the startup cost only once.
+    Answers are cached (see query_cache.py) unless QUERY_CACHE_ENABLED is 'false'.
+    'retrieval_mode' is 'vector' or 'hybrid'; defaults to RETRIEVAL_MODE.
+    Unless RERANKER is 'none', retrieval fetches 'rerank_candidates' chunks
+    (RERANK_CANDIDATES) and only the best 'rerank_top_k' (RERANK_TOP_K) after
+    reranking go into the prompt; otherwise the top 'k' chunks are used.
+    The prompt context is packed within the token budget of the LLM backend
+    (see context_assembler.py).
+    """
+
+    def __init__(self, collection_name: str = "transcriptions_collection", k: int = 5, model_type: str = None, use_cache: bool = None,
+                 retrieval_mode: str = None, reranker: str = None, rerank_candidates: int = None, rerank_top_k: int = None):
+        self.collection_name = collection_name
+        self.k = k
+        self.retrieval_mode = retrieval_mode or get_retrieval_mode()
+        self.reranker = load_reranker(reranker)
+        self.rerank_candidates = rerank_candidates or int(os.getenv("RERANK_CANDIDATES", DEFAULT_RERANK_CANDIDATES))
+        self.rerank_top_k = rerank_top_k or int(os.getenv("RERANK_TOP_K", DEFAULT_RERANK_TOP_K))
+        # Answers retrieved in different modes are cached separately
+        reranker_name = type(self.reranker).__name__ if self.reranker else "none"
+        self.cache_namespace = f"{collection_name}:{self.retrieval_mode}:{reranker_name}:{self.rerank_candidates}:{self.rerank_top_k}"
+        self.model_type, self.model = load_llm(model_type)
+        self.context_budget = get_context_budget(self.model_type)
+        self.count_tokens = get_token_counter()
+        # Stage timings are also recorded as telemetry spans (see transcription_pipeline/telemetry.py)
+        self.telemetry = get_telemetry()
+        if use_cache is None:
+            use_cache = os.getenv("QUERY_CACHE_ENABLED", "true").lower() != "false"
+        self.cache = QueryCache() if use_cache else None
+        # Open the persist directory upfront instead of on the first query
+        get_db(collection_name)
+
+    def _cache_namespace(self, filters: dict = None):
+        """Answers to filtered queries are cached separately for each set of filters."""
+        if not filters:
+            return self.cache_namespace
+        return f"{self.cache_namespace}:{json.dumps(filters, sort_keys=True)}"
+
+    def _lookup_cache(self, query_string: str, filters: dict = None):
+        """
+        Looks the query up in both cache levels.
+        Returns (entry, level, query_embedding, collection_version); entry and level are None on a miss.
+        """
+        version = get_collection_version(self.collection_name)
+        namespace = self._cache_namespace(filters)
+        entry = self.cache.get_exact(namespace, version, query_string)
+        if entry:
+            return entry, "exact", entry["embedding"], version
+        embedding = get_embeddings().embed_query(query_string)
+        entry = self.cache.get_similar(namespace, version, embedding)
+        if entry:
+            return entry, "semantic", embedding, version
+        return None, None, embedding, version
+
+    def _retrieve(self, query_string: str, embedding: list = None, filters: dict = None):
+        """
+        Returns the relevant chunks, the prompt built from them and the timings
+        of retrieval (and reranking, if enabled).
+        """
+        start = time.perf_counter()
+        candidates = self.rerank_candidates if self.reranker else self.k
+        relevant_docs = query_chroma_db(
+            query_string, self.collection_name, candidates, embedding=embedding, mode=self.retrieval_mode, filters=filters
+        )
+        timings = {"retrieval": time.perf_counter() - start}
+        if not relevant_docs:
+            self.telemetry.record("retrieval", timings["retrieval"], mode=self.retrieval_mode, items=0)
+            return [], None, timings
+        if self.reranker:
+            timings["candidates"] = len(relevant_docs)
+            relevant_docs, timings["rerank"] = rerank(self.reranker, query_string, relevant_docs, self.rerank_top_k)
+        context, relevant_docs, timings["context_tokens"] = assemble_context(relevant_docs, self.context_budget, self.count_tokens)
+        self.telemetry.record("retrieval", timings["retrieval"], mode=self.retrieval_mode, items=len(relevant_docs),
+                              tokens=timings["context_tokens"])
+        if "rerank" in timings:
+            self.telemetry.record("rerank", timings["rerank"], items=timings["candidates"])
+        return relevant_docs, build_prompt(query_string, context), timings
+
+    def _store(self, version, query_string, embedding, relevant_docs, answer, filters=None):
+        if self.cache is not None and answer:
+            self.cache.put(
+                self._cache_namespace(filters), version, query_string, embedding,
+                [doc.id for doc in relevant_docs], answer, [doc.metadata for doc in relevant_docs]
+            )
+
+    def answer(self, query_string: str, filters: dict = None):
+        """
+        Retrieves the relevant chunks and generates an answer.
+        'filters' restricts retrieval to some sources, recording dates or a
+        language (see retriever.build_where()).
+        Returns a dict with 'answer' (None if nothing relevant was found),
+        'sources' (metadata of the retrieved chunks), 'timings' in seconds and
+        'cache' ('exact', 'semantic' or None).
+        """
+        embedding = version = None
+        if self.cache is not None:
+            start = time.perf_counter()
+            entry, level, embedding, version = self._lookup_cache(query_string, filters)
+            if entry:
+                return {
+                    "answer": entry["answer"],
+                    "sources": entry["sources"],
+                    "timings": {"cache_lookup": time.perf_counter() - start},
+                    "cache": level,
+                }
+
+        relevant_docs, prompt, timings = self._retrieve(query_string, embedding, filters)
+        if not relevant_docs:
+            return {"answer": None, "sources": [], "timings": timings, "cache": None}
+
+        start = time.perf_counter()
+        answer = generate_answer(self.model_type, self.model, prompt)
+        timings["generation"] = time.perf_counter() - start
+        self.telemetry.record("generation", timings["generation"], model=self.model_type,
+                              tokens=self.count_tokens(answer or ""))
+        self._store(version, query_string, embedding, relevant_docs, answer, filters)
+        return {
+            "answer": answer,
+            "sources": [doc.metadata for doc in relevant_docs],
+            "timings": timings,
+            "cache": None,
+        }
+
+    def answer_stream(self, query_string: str, filters: dict = None):
+        """
+        Streaming version of answer(). Yields events as dicts:
+          {"type": "sources", "sources": [...]}  once retrieval is done
+          {"type": "token", "text": "..."}       for each piece of the answer
+          {"type": "done", "answer": ..., "timings": {...}, "cache": ...}  at the end;
+          'timings' includes time_to_first_token and tokens_per_second.
+        A cached answer is sent as a single token.
+        """
+        embedding = version = None
+        if self.cache is not None:
+            start = time.perf_counter()
+            entry, level, embedding, version = self._lookup_cache(query_string, filters)
+            if entry:
+                lookup_seconds = time.perf_counter() - start
+                yield {"type": "sources", "sources": entry["sources"]}
+                yield {"type": "token", "text": entry["answer"]}
+                timings = {
+                    "cache_lookup": lookup_seconds,
+                    "time_to_first_token": lookup_seconds,
+                    "generation": 0.0,
+                    "output_tokens": 0,
+                    "tokens_per_second": 0.0,
+                }
+                yield {"type": "done", "answer": entry["answer"], "timings": timings, "cache": level}
+                return
+
+        relevant_docs, prompt, timings = self._retrieve(query_string, embedding, filters)
+        yield {"type": "sources", "sources": [doc.metadata for doc in relevant_docs]}
+        if not relevant_docs:
+            yield {"type": "done", "answer": None, "timings": timings, "cache": None}
+            return
+
+        stream = AnswerStream(self.model_type, self.model, prompt)
+        for piece in stream:
+            yield {"type": "token", "text": piece}
+        self._store(version, query_string, embedding, relevant_docs, stream.text, filters)
+        timings.update(stream.metrics())
+        self.telemetry.record("generation", timings["generation"], model=self.model_type, streaming=True,
+                              tokens=timings["output_tokens"], time_to_first_token=timings["time_to_first_token"])
+        yield {"type": "done", "answer": stream.text, "timings": timings, "cache": None}
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from transcription_pipeline.telemetry import get_telemetry
+
+load_dotenv()
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8700
+
+def get_server_address():
+    return os.getenv("QUERY_SERVER_HOST", DEFAULT_HOST), int(os.getenv("QUERY_SERVER_PORT", DEFAULT_PORT))
+
+class QueryServer:
+    """
+    Minimal local HTTP server keeping a QueryEngine warm between queries.
+    Endpoints:
+      GET  /health  -> {"status": "ok"}
+      GET  /metrics -> stage telemetry in the Prometheus text format (see transcription_pipeline/telemetry.py)
+      POST /query   {"query": "..."} -> QueryEngine.answer() result
+      POST /query   {"query": "...", "stream": true} -> QueryEngine.answer_stream() events,
+                    one JSON object per line, sent as they are produced (chunked encoding)
+    Both accept optional "filters" (see retriever.build_where()); invalid filters get a 400 response.
+    Each query runs in a worker thread, so concurrent requests don't block the event loop.
+    """
+
+    def __init__(self, engine, max_workers: int = None):
+        self.engine = engine
+        max_workers = max_workers or int(os.getenv("QUERY_SERVER_WORKERS", "4"))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="query")
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, path, _ = request_line.decode('latin-1').split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode('latin-1').partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+            if method == "GET" and path == "/health":
+                await self.send_json(writer, 200, {"status": "ok"})
+            elif method == "GET" and path == "/metrics":
+                body = get_telemetry().prometheus_text().encode('utf-8')
+                await self.send_body(writer, 200, body, "text/plain; version=0.0.4")
+            elif method == "POST" and path == "/query":
+                payload = json.loads(body or b"{}")
+                query_string = payload.get("query")
+                if not query_string:
+                    await self.send_json(writer, 400, {"error": "Missing 'query'."})
+                    return
+                filters = payload.get("filters") or None
+                if filters is not None:
+                    from rag_system.retriever import validate_filters # Already loaded by the engine
+                    try:
+                        validate_filters(filters)
+                    except ValueError as e:
+                        await self.send_json(writer, 400, {"error": str(e)})
+                        return
+                if payload.get("stream"):
+                    await self.stream_events(writer, self.engine.answer_stream, query_string, filters)
+                    return
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self.executor, self.engine.answer, query_string, filters)
+                await self.send_json(writer, 200, result)
+            else:
+                await self.send_json(writer, 404, {"error": f"Unknown endpoint: {method} {path}"})
+        except Exception as e:
+            print(f"Error handling request: {e}", file=sys.stderr)
+            try:
+                await self.send_json(writer, 500, {"error": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def send_json(self, writer, status: int, payload: dict):
+        await self.send_body(writer, status, json.dumps(payload).encode('utf-8'), "application/json")
+
+    async def send_body(self, writer, status: int, body: bytes, content_type: str):
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+        head = (
+            f"HTTP/1.1 {status} {reasons.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def stream_events(self, writer, generate, *args):
+        """
+        Runs the event generator in a worker thread and forwards each event
+        to the client as soon as it is produced. If the client disconnects,
+        the generator is closed at its next event, which stops the LLM
+        generation whatever the backend (and cancels the Ollama request).
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stopped = threading.Event()
+
+        def produce():
+            events = generate(*args)
+            try:
+                for event in events:
+                    if stopped.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, event)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, {"type": "error", "error": str(e)})
+            finally:
+                events.close()
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+
+        loop.run_in_executor(self.executor, produce)
+        head = (
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: application/x-ndjson\r\n"
+            "Transfer-Encoding: chunked\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        try:
+            writer.write(head.encode('latin-1'))
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                line = (json.dumps(event) + "\n").encode('utf-8')
+                writer.write(f"{len(line):X}\r\n".encode('latin-1') + line + b"\r\n")
+                await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except ConnectionError:
+            # Client gone: nobody reads the rest of the answer
+            pass
+        finally:
+            stopped.set()
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Query server listening on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+def main():
+    # Heavy imports (langchain, Chroma, genai) happen once, here
+    from rag_system.query_engine import QueryEngine
+
+    print("Loading query engine...")
+    try:
+        engine = QueryEngine()
+    except (ValueError, ImportError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    host, port = get_server_address()
+    try:
+        asyncio.run(QueryServer(engine).serve(host, port))
+    except KeyboardInterrupt:
+        print("\nQuery server stopped.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import math
+import os
+import re
+import time
+from collections import Counter
+from dotenv import load_dotenv
+from rag_system.retriever import reciprocal_rank_fusion
+
+load_dotenv()
+
+DEFAULT_RERANK_CANDIDATES = 20
+DEFAULT_RERANK_TOP_K = 3
+DEFAULT_CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+class LexicalReranker:
+    """
+    Reranks candidates by BM25 term overlap with the query, computed over the
+    candidates themselves, fused with the original (vector) ranking so that
+    paraphrases without shared terms are not pushed out. Pure Python, no model.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+    def scores(self, query: str, texts: list):
+        query_terms = set(TOKEN_RE.findall(query.lower()))
+        documents = [Counter(TOKEN_RE.findall(text.lower())) for text in texts]
+        lengths = [sum(d.values()) for d in documents]
+        average_length = sum(lengths) / len(documents) or 1
+        document_frequency = {term: sum(1 for d in documents if term in d) for term in query_terms}
+        scores = []
+        for terms, length in zip(documents, lengths):
+            score = 0.0
+            for term in query_terms:
+                frequency = terms[term]
+                if not frequency:
+                    continue
+                idf = math.log(1 + (len(documents) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+                score += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * (1 - self.b + self.b * length / average_length))
+            scores.append(score)
+        return scores
+
+    def order(self, query: str, texts: list):
+        scores = self.scores(query, texts)
+        # Candidates sharing no term with the query are left out of the lexical ranking
+        by_score = sorted((i for i in range(len(texts)) if scores[i] > 0), key=lambda i: scores[i], reverse=True)
+        return reciprocal_rank_fusion([list(range(len(texts))), by_score])
+
+class CrossEncoderReranker:
+    """
+    Reranks candidates with a small cross-encoder model running locally on the CPU
+    (sentence-transformers), which reads the query and each candidate together.
+    """
+
+    def __init__(self, model_name: str = None):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError:
+            raise ImportError("sentence-transformers is not installed. Please install it with 'pip install sentence-transformers'")
+        self.model = CrossEncoder(model_name or os.getenv("RERANKER_MODEL", DEFAULT_CROSS_ENCODER_MODEL), device="cpu")
+
+    def order(self, query: str, texts: list):
+        scores = self.model.predict([(query, text) for text in texts])
+        return sorted(range(len(texts)), key=lambda i: scores[i], reverse=True)
+
+def load_reranker(name: str = None):
+    """
+    Returns the reranker selected by RERANKER ('lexical', 'cross-encoder' or 'none'),
+    or None if reranking is disabled. Raises ValueError for unknown names and
+    ImportError if the cross-encoder backend is not installed.
+    """
+    name = (name or os.getenv("RERANKER", "lexical")).lower()
+    if name == "none":
+        return None
+    if name == "lexical":
+        return LexicalReranker()
+    if name == "cross-encoder":
+        return CrossEncoderReranker()
+    raise ValueError(f"Unknown RERANKER: {name}. Please set RERANKER to 'lexical', 'cross-encoder' or 'none'.")
+
+def rerank(reranker, query: str, docs: list, top_k: int):
+    """
+    Orders the candidate documents with the reranker and keeps the best top_k.
+    Returns (docs, seconds spent reranking).
+    """
+    start = time.perf_counter()
+    if len(docs) > 1:
+        order = reranker.order(query, [doc.page_content for doc in docs])
+        docs = [docs[i] for i in order]
+    return docs[:top_k], time.perf_counter() - start
@@ -1,27 +1,193 @@
 import os
-from langchain_openai import OpenAIEmbeddings
+import sys
+import threading
 from langchain_chroma import Chroma
+from rag_system.embeddings import get_embeddings, check_embedding_model
+from rag_system.lexical_index import LexicalIndex
+from rag_system.collection_state import find_sources, language_forms, normalize_language, recording_timestamp
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Configure API keys
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Reciprocal rank fusion constant (60 is the value from the original RRF paper)
+RRF_K = 60
+# How many candidates each retriever contributes to the fusion, per requested result
+HYBRID_CANDIDATES_PER_RESULT = 4
+# Sources per Chroma '$in' filter: SQLite binds one variable per source (32766 at
+# most), so longer lists of matching sources are searched in chunks
+MAX_WHERE_SOURCES = 5000
 
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY is not set in environment variables.")
+_databases = {}
+_lexical_indexes = {}
+_databases_lock = threading.Lock()
 
-# Initialize OpenAI embedding model (must be the same used for indexing)
-embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY, model=os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small"))
+def get_db(collection_name: str = "transcriptions_collection"):
+    """
+    Returns the Chroma handle for a collection, opening the persist directory only once per process.
+    """
+    with _databases_lock:
+        if collection_name not in _databases:
+            # Shared embedding model with on-disk cache (must be the same used for indexing)
+            embeddings = get_embeddings()
+            db = Chroma(
+                persist_directory="chroma_db",
+                embedding_function=embeddings,
+                collection_name=collection_name,
+                collection_metadata={"embedding_model": embeddings.model}
+            )
+            check_embedding_model(db._collection, embeddings.model)
+            _databases[collection_name] = db
+        return _databases[collection_name]
+
+def get_lexical_index(collection_name: str = "transcriptions_collection"):
+    with _databases_lock:
+        if collection_name not in _lexical_indexes:
+            _lexical_indexes[collection_name] = LexicalIndex(collection_name)
+        return _lexical_indexes[collection_name]
+
+def get_retrieval_mode():
+    """Returns 'vector' (default) or 'hybrid', from RETRIEVAL_MODE."""
+    mode = os.getenv("RETRIEVAL_MODE", "vector").lower()
+    if mode not in ("vector", "hybrid"):
+        print(f"Warning: unknown RETRIEVAL_MODE '{mode}', using 'vector'.", file=sys.stderr)
+        return "vector"
+    return mode
+
+def reciprocal_rank_fusion(rankings: list, k: int = RRF_K):
+    """
+    Fuses several ranked lists of IDs: each ID scores the sum of 1 / (k + rank) over the lists.
+    Returns the IDs sorted by fused score, best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+FILTER_KEYS = ("sources", "date_from", "date_to", "language")
+
+def validate_filters(filters: dict):
+    """
+    Checks query filters coming from outside (e.g. a query server request).
+    Raises ValueError with a message for the caller on unknown keys, a
+    'sources' that is not a list of names or an invalid date.
+    """
+    if not isinstance(filters, dict):
+        raise ValueError("'filters' must be an object.")
+    unknown = set(filters).difference(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}. Valid filters: {', '.join(FILTER_KEYS)}.")
+    sources = filters.get("sources")
+    if sources is not None and (not isinstance(sources, list) or not all(isinstance(name, str) for name in sources)):
+        raise ValueError("'sources' must be a list of transcription names or glob patterns.")
+    for key in ("date_from", "date_to"):
+        if filters.get(key) is not None:
+            try:
+                recording_timestamp(filters[key])
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid {key} '{filters[key]}', expected YYYY-MM-DD.")
+    if filters.get("language") is not None and not isinstance(filters["language"], str):
+        raise ValueError("'language' must be a string.")
+
+def build_where(filters: dict, sources: list = None):
+    """
+    Translates query filters into a Chroma 'where' clause, so the search only
+    runs over matching chunks. 'filters' may hold 'sources' (names or glob
+    patterns, given here already resolved as 'sources'), 'date_from' and
+    'date_to' (inclusive YYYY-MM-DD recording dates) and 'language'.
+    Returns None if there is nothing to filter.
+    """
+    conditions = []
+    if filters.get("sources"):
+        conditions.append({"source": {"$in": list(sources)}})
+    if filters.get("date_from"):
+        conditions.append({"recording_ts": {"$gte": recording_timestamp(filters["date_from"])}})
+    if filters.get("date_to"):
+        conditions.append({"recording_ts": {"$lte": recording_timestamp(filters["date_to"])}})
+    if filters.get("language"):
+        # Also matches chunks indexed with the language name, before languages were stored as codes
+        conditions.append({"language": {"$in": language_forms(filters["language"])}})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+def build_wheres(filters: dict, sources: list = None):
+    """
+    Returns the 'where' clauses to search with (see build_where()): one, or one
+    per MAX_WHERE_SOURCES matching sources when a source filter matches more.
+    """
+    if not filters.get("sources") or len(sources) <= MAX_WHERE_SOURCES:
+        return [build_where(filters, sources)]
+    return [build_where(filters, sources[i:i + MAX_WHERE_SOURCES]) for i in range(0, len(sources), MAX_WHERE_SOURCES)]
+
+def vector_search(db, embedding: list, k: int, wheres: list = None):
+    """
+    Returns the k chunks closest to 'embedding' matching any of the 'where'
+    clauses, searching each of them and merging the results by distance.
+    """
+    if not wheres or len(wheres) == 1:
+        return db.similarity_search_by_vector(embedding, k=k, filter=wheres[0] if wheres else None)
+    scored = []
+    for where in wheres:
+        scored.extend(db.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=where))
+    # Scores are distances: lower is closer
+    return [doc for doc, _ in sorted(scored, key=lambda pair: pair[1])[:k]]
+
+def hybrid_search(query: str, collection_name: str = "transcriptions_collection", k: int = 5, embedding: list = None,
+                  wheres: list = None, sources: list = None):
+    """
+    Combines BM25 keyword search (see lexical_index.py) and vector similarity search
+    with reciprocal rank fusion, so exact names, codes and numbers are not missed.
+    'wheres' filters the vector search (see build_wheres()) and 'sources' the keyword search.
+    """
+    db = get_db(collection_name)
+    candidates = k * HYBRID_CANDIDATES_PER_RESULT
+    if embedding is None:
+        embedding = get_embeddings().embed_query(query)
+    vector_docs = vector_search(db, embedding, candidates, wheres)
+    lexical_ids = [chunk_id for chunk_id, _ in get_lexical_index(collection_name).search(query, candidates, sources=sources)]
+
+    docs_by_id = {doc.id: doc for doc in vector_docs}
+    fused_ids = reciprocal_rank_fusion([[doc.id for doc in vector_docs], lexical_ids])[:k]
+    missing = [doc_id for doc_id in fused_ids if doc_id not in docs_by_id]
+    if missing:
+        for doc in db.get_by_ids(missing):
+            docs_by_id[doc.id] = doc
+    # IDs missing from Chroma (lexical index out of date) are dropped
+    return [docs_by_id[doc_id] for doc_id in fused_ids if doc_id in docs_by_id]
 
-def query_chroma_db(query: str, collection_name: str = "transcriptions_collection", k: int = 5):
+def query_chroma_db(query: str, collection_name: str = "transcriptions_collection", k: int = 5, embedding: list = None, mode: str = None,
+                    filters: dict = None):
     """
     Queries the ChromaDB database with a given string and returns the results.
+    If the query embedding is already known, pass it as 'embedding' to skip embedding the query again.
+    'mode' is 'vector' or 'hybrid' (vector + keyword search); defaults to RETRIEVAL_MODE.
+    'filters' restricts the search to some sources or recording dates (see build_where());
+    invalid filters raise ValueError (see validate_filters()).
     """
+    if filters:
+        validate_filters(filters)
+        if filters.get("language"):
+            # 'italian', 'Italian' and 'it' are the same filter
+            filters = {**filters, "language": normalize_language(filters["language"])}
     try:
-        db = Chroma(persist_directory="chroma_db", embedding_function=embeddings, collection_name=collection_name)
-        results = db.similarity_search(query, k=k)
+        wheres = sources = None
+        if filters:
+            # The source index tells upfront which transcriptions match
+            sources = find_sources(collection_name, **filters)
+            if not sources:
+                return []
+            wheres = build_wheres(filters, sources)
+        if (mode or get_retrieval_mode()) == "hybrid":
+            return hybrid_search(query, collection_name, k, embedding=embedding, wheres=wheres, sources=sources)
+        db = get_db(collection_name)
+        if embedding is not None:
+            results = vector_search(db, embedding, k, wheres)
+        elif wheres and len(wheres) > 1:
+            results = vector_search(db, get_embeddings().embed_query(query), k, wheres)
+        else:
+            results = db.similarity_search(query, k=k, filter=wheres[0] if wheres else None)
         return results
     except Exception as e:
         print(f"Error querying ChromaDB: {e}", file=sys.stderr)
-        return []
\ No newline at end of file
+        return []
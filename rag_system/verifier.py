@@ -1,18 +1,18 @@
+import glob
 import os
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
+import sys
+import chromadb
+from rag_system.collection_state import collection_summary
+from rag_system.lexical_index import LEXICAL_INDEX_DIR
+from transcription_pipeline.utils import format_timestamp
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Configure API keys
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Reading the collection needs no embedding model: no API call is made here
 
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY is not set in environment variables.")
-
-# Initialize OpenAI embedding model (must be the same used for indexing)
-embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY, model=os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small"))
+def _get_collection(collection_name: str):
+    return chromadb.PersistentClient(path="chroma_db").get_collection(name=collection_name, embedding_function=None)
 
 def verify_chroma_db(collection_name: str = "transcriptions_collection"):
     """
@@ -21,24 +21,22 @@ def verify_chroma_db(collection_name: str = "transcriptions_collection"):
     print(f"\nLoading ChromaDB from collection: {collection_name}")
 
     try:
-        # Connects to the existing DB
-        db = Chroma(persist_directory="chroma_db", embedding_function=embeddings, collection_name=collection_name)
+        collection = _get_collection(collection_name)
 
         # Count the number of documents in the collection
-        count = db.get(include=[])['ids']
-        print(f"Found {len(count)} documents in collection '{collection_name}'.")
+        count = collection.count()
+        print(f"Found {count} documents in collection '{collection_name}'.")
 
-        if len(count) > 0:
-            print("Performing a generic similarity search to show some data:")
-            # Performs a generic similarity search with a generic query
-            # This will retrieve the most relevant documents for the query
-            results = db.similarity_search("information", k=5) # Retrieve the first 5 results
+        if count > 0:
+            print("Showing the first documents:")
+            results = collection.get(limit=5, include=["documents", "metadatas"])
 
-            for i, doc in enumerate(results):
-                indexed_at = doc.metadata.get('indexed_at', 'N/A')
+            for i, (content, metadata) in enumerate(zip(results['documents'], results['metadatas'])):
+                metadata = metadata or {}
+                indexed_at = metadata.get('indexed_at', 'N/A')
                 print(f"\n--- Document {i+1} ---")
-                print(f"Content: {doc.page_content[:200]}...") # Show the first 200 characters
-                print(f"Metadata: {doc.metadata}")
+                print(f"Content: {content[:200]}...") # Show the first 200 characters
+                print(f"Metadata: {metadata}")
                 print(f"Indexed At: {indexed_at}")
         else:
             print("The collection is empty. No documents to show.")
@@ -46,8 +44,70 @@ def verify_chroma_db(collection_name: str = "transcriptions_collection"):
     except Exception as e:
         print(f"Error verifying ChromaDB: {e}", file=sys.stderr)
 
+def _disk_usage(path: str):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def collection_stats(collection_name: str = "transcriptions_collection"):
+    """
+    Returns statistics about a collection without scanning its chunks: the
+    counts and distributions come from the source index maintained by the
+    indexers (collection_state.collection_summary), the embedding dimension and
+    index parameters from the collection configuration, and the sizes from the files.
+    """
+    collection = _get_collection(collection_name)
+    summary = collection_summary(collection_name)
+    configuration = collection.configuration_json or {}
+    lexical_path = os.path.join(LEXICAL_INDEX_DIR, f"lexical_{collection_name}.sqlite3")
+    return {
+        "collection": collection_name,
+        "chunks": collection.count(),
+        "summary": summary,
+        "embedding_model": (collection.metadata or {}).get("embedding_model"),
+        "dimension": getattr(getattr(collection, "_model", None), "dimension", None),
+        "index": configuration.get("hnsw") or configuration.get("spann") or {},
+        "disk_bytes": {
+            "total": _disk_usage("chroma_db"),
+            "metadata": sum(_disk_usage(path) for path in glob.glob(os.path.join("chroma_db", "chroma.sqlite3*"))),
+            "lexical_index": _disk_usage(lexical_path) if os.path.exists(lexical_path) else 0,
+        },
+    }
+
+def print_collection_stats(collection_name: str = "transcriptions_collection"):
+    try:
+        stats = collection_stats(collection_name)
+    except Exception as e:
+        print(f"Error reading collection statistics: {e}", file=sys.stderr)
+        return None
+
+    summary = stats["summary"]
+    per_source = summary["chunks_per_source"]
+    disk = stats["disk_bytes"]
+    print(f"\nCollection '{stats['collection']}'")
+    print(f"  Chunks: {stats['chunks']}")
+    if summary["chunks"] != stats["chunks"]:
+        print(f"    ({summary['chunks']} in the source index: chunks indexed before it existed are not counted per source)")
+    print(f"  Sources: {summary['sources']}")
+    if summary["sources"]:
+        print(f"  Chunks per source: min {per_source['min']}, median {per_source['median']}, p90 {per_source['p90']}, "
+              f"max {per_source['max']}, mean {per_source['mean']:.1f}")
+        print(f"  Indexed: oldest {summary['oldest_indexed_at']}, newest {summary['newest_indexed_at']}")
+    if summary["duration_seconds"]:
+        print(f"  Recorded audio: {format_timestamp(summary['duration_seconds'])}")
+    print(f"  Embedding model: {stats['embedding_model'] or 'unknown'}, dimension: {stats['dimension'] or 'unknown'}")
+    if stats["index"]:
+        print(f"  Index parameters: {', '.join(f'{key}={value}' for key, value in stats['index'].items())}")
+    print(f"  Disk: {disk['total'] / 1024 / 1024:.1f} MB in chroma_db (metadata {disk['metadata'] / 1024 / 1024:.1f} MB, "
+          f"keyword index {disk['lexical_index'] / 1024 / 1024:.1f} MB)")
+    return stats
+
 def main():
-    verify_chroma_db()
+    if len(sys.argv) >= 2 and sys.argv[1] == "stats":
+        if print_collection_stats(*sys.argv[2:3]) is None:
+            sys.exit(1)
+    else:
+        verify_chroma_db()
 
 if __name__ == "__main__":
     main()
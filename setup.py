@@ -15,5 +15,7 @@ setup(
         'langchain_chroma',
         'langchain_text_splitters',
         'langchain-community',
+        'numpy',
+        'httpx',
     ],
 )
\ No newline at end of file
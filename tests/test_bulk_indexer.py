@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import chromadb
+
+from rag_system.bulk_indexer import bulk_index_transcriptions
+from rag_system.embeddings import CachedEmbeddings, EmbeddingStore
+from rag_system.indexer import split_transcription
+from transcription_pipeline.telemetry import _DisabledTelemetry
+
+COLLECTION = "bulk_collection"
+MODEL = "text-embedding-3-small"
+# Chunks containing this text are rejected by the mock while 'fail_marker' is set
+FAIL_MARKER = "postponed"
+
+
+def fake_vector(text):
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [byte / 255 for byte in digest[:8]]
+
+
+def paragraph(recording, number, extra=""):
+    # About 600 characters, so that every paragraph is a chunk of its own
+    words = " ".join(f"word{recording}_{number}_{i}" for i in range(50))
+    return f"Recording {recording}, part {number}. {extra}{words}"
+
+
+class MockEmbeddingsHandler(BaseHTTPRequestHandler):
+    """Serves POST /embeddings like the OpenAI API, with optional rate limits and rejected inputs."""
+
+    def do_POST(self):
+        server = self.server
+        if self.path != "/embeddings":
+            self.send_error(404)
+            return
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        inputs = payload["input"]
+        with server.lock:
+            server.requests.append(inputs)
+            rate_limited = server.rate_limit_next > 0
+            if rate_limited:
+                server.rate_limit_next -= 1
+        if rate_limited:
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}}, {"retry-after": "0.01"})
+            return
+        if server.fail_marker and any(server.fail_marker in text for text in inputs):
+            self._send_json(400, {"error": {"message": "Invalid input", "type": "invalid_request_error"}})
+            return
+        tokens = sum(len(text.split()) for text in inputs)
+        self._send_json(200, {
+            "object": "list",
+            "model": payload["model"],
+            "data": [{"object": "embedding", "index": i, "embedding": fake_vector(text)} for i, text in enumerate(inputs)],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def _send_json(self, status, message, headers=None):
+        body = json.dumps(message).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BulkIndexerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), MockEmbeddingsHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.rate_limit_next = 0
+        self.server.fail_marker = None
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        os.makedirs("transcriptions")
+        for recording in range(3):
+            self.write_transcription(recording, [paragraph(recording, number) for number in range(3)])
+
+        embeddings = CachedEmbeddings(None, MODEL, EmbeddingStore(os.path.join(self.tmp.name, "embeddings.sqlite3")))
+        self.patches = [
+            mock.patch.dict(os.environ, {
+                "EMBEDDING_PROVIDER": "openai",
+                "OPENAI_API_KEY": "test",
+                "OPENAI_EMBEDDING_BASE_URL": f"http://127.0.0.1:{self.server.server_address[1]}",
+            }),
+            mock.patch("rag_system.bulk_indexer.get_embeddings", return_value=embeddings),
+            mock.patch("transcription_pipeline.telemetry._telemetry", _DisabledTelemetry()),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        chromadb.api.client.SharedSystemClient.clear_system_cache()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def write_transcription(self, recording, paragraphs):
+        path = os.path.join("transcriptions", f"2024-01-1{recording}_recording_{recording}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("\n\n".join(paragraphs))
+        return path
+
+    def stored_ids(self, source):
+        collection = chromadb.PersistentClient(path="chroma_db").get_collection(COLLECTION)
+        return set(collection.get(where={"source": source})["ids"])
+
+    def test_chunks_are_embedded_in_token_budgeted_batches(self):
+        expected = sum(len(split_transcription(os.path.join("transcriptions", name))[1]) for name in os.listdir("transcriptions"))
+        stats = bulk_index_transcriptions(["transcriptions"], COLLECTION, max_batch_tokens=400, max_in_flight=2)
+
+        self.assertEqual(stats["chunks_written"], expected)
+        self.assertEqual(sum(len(inputs) for inputs in self.server.requests), expected)
+        # About 200 tokens per chunk: two chunks per request at most
+        self.assertGreater(len(self.server.requests), 1)
+        self.assertTrue(all(len(inputs) <= 2 for inputs in self.server.requests))
+
+        # Nothing is embedded again on the next run
+        self.server.requests.clear()
+        stats = bulk_index_transcriptions(["transcriptions"], COLLECTION)
+        self.assertEqual(stats["chunks_written"], 0)
+        self.assertEqual(self.server.requests, [])
+
+    def test_rate_limited_requests_are_retried(self):
+        self.server.rate_limit_next = 2
+        stats = bulk_index_transcriptions(["transcriptions"], COLLECTION, max_in_flight=1)
+
+        self.assertEqual(stats["rate_limited_responses"], 2)
+        self.assertEqual(stats["failed_batches"], 0)
+        self.assertEqual(len(self.stored_ids("2024-01-10_recording_0.txt")), 3)
+
+    def test_failed_batches_keep_the_previous_chunks_until_the_next_run(self):
+        bulk_index_transcriptions(["transcriptions"], COLLECTION)
+        source = "2024-01-11_recording_1.txt"
+        previous_ids = self.stored_ids(source)
+
+        # The transcription changes, and one of its new chunks cannot be embedded
+        self.write_transcription(1, [paragraph(1, 0), paragraph(1, 1, f"The launch was {FAIL_MARKER}. "), paragraph(1, 3)])
+        self.server.fail_marker = FAIL_MARKER
+        self.server.requests.clear()
+        stats = bulk_index_transcriptions(["transcriptions"], COLLECTION, max_batch_tokens=250)
+
+        self.assertEqual(stats["failed_sources"], [source])
+        self.assertEqual(stats["failed_batches"], 1)
+        self.assertEqual(stats["chunks_removed"], 0)
+        # The stale chunks are still there, next to the new chunks that could be embedded
+        self.assertTrue(previous_ids <= self.stored_ids(source))
+
+        # The next run only embeds the chunk that failed, and completes the transcription
+        self.server.fail_marker = None
+        self.server.requests.clear()
+        stats = bulk_index_transcriptions(["transcriptions"], COLLECTION)
+
+        self.assertEqual(stats["failed_sources"], [])
+        self.assertEqual([len(inputs) for inputs in self.server.requests], [1])
+        self.assertEqual(stats["chunks_removed"], 2)
+        _, _, chunk_ids = split_transcription(os.path.join("transcriptions", source))
+        self.assertEqual(self.stored_ids(source), set(chunk_ids))
+
+
+if __name__ == "__main__":
+    unittest.main()
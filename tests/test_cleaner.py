@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import chromadb
+
+from rag_system.cleaner import count_where, iter_pages, rebuild_vector_index, recover_interrupted_rebuild
+from rag_system.collection_state import record_source
+
+COLLECTION = "cleaner_collection"
+TEMP = f"{COLLECTION}_rebuild"
+
+
+class CleanerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.client = chromadb.PersistentClient(path="chroma_db")
+        mock.patch("builtins.print").start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        chromadb.api.client.SharedSystemClient.clear_system_cache()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def fill(self, name, count, start=0):
+        collection = self.client.get_or_create_collection(name=name, embedding_function=None, metadata={"embedding_model": "test"})
+        if count:
+            ids = [f"chunk:{i}" for i in range(start, start + count)]
+            collection.add(
+                ids=ids, embeddings=[[float(i), 1.0] for i in range(start, start + count)], documents=ids,
+                metadatas=[{"source": f"source_{i % 2}.txt", "recording_ts": i} for i in range(start, start + count)],
+            )
+        return collection
+
+    def index_sources(self, collection):
+        counts = {}
+        for metadata in collection.get(include=["metadatas"])["metadatas"]:
+            counts[metadata["source"]] = counts.get(metadata["source"], 0) + 1
+        for source, count in counts.items():
+            record_source(COLLECTION, source, {}, count)
+
+    def names(self):
+        return {collection.name for collection in self.client.list_collections()}
+
+    def test_copy_left_without_its_original_replaces_it(self):
+        self.fill(TEMP, 5)
+        self.assertTrue(recover_interrupted_rebuild(COLLECTION, self.client))
+        self.assertEqual(self.names(), {COLLECTION})
+        self.assertEqual(self.client.get_collection(COLLECTION).count(), 5)
+
+    def test_copy_replaces_an_original_recreated_empty(self):
+        self.fill(TEMP, 5)
+        self.fill(COLLECTION, 0)
+        recover_interrupted_rebuild(COLLECTION, self.client)
+        self.assertEqual(self.names(), {COLLECTION})
+        self.assertEqual(self.client.get_collection(COLLECTION).count(), 5)
+
+    def test_incomplete_copy_is_dropped(self):
+        self.fill(COLLECTION, 5)
+        self.fill(TEMP, 2)
+        recover_interrupted_rebuild(COLLECTION, self.client)
+        self.assertEqual(self.names(), {COLLECTION})
+        self.assertEqual(self.client.get_collection(COLLECTION).count(), 5)
+
+    def test_rebuild_keeps_every_chunk(self):
+        self.index_sources(self.fill(COLLECTION, 7))
+        rebuild_vector_index(COLLECTION, page_size=3)
+        collection = self.client.get_collection(COLLECTION)
+        self.assertEqual(self.names(), {COLLECTION})
+        self.assertEqual(collection.count(), 7)
+        self.assertEqual(collection.metadata["embedding_model"], "test")
+
+    def test_pages_follow_the_source_index(self):
+        collection = self.client.get_or_create_collection(name=COLLECTION, embedding_function=None)
+        ids = [f"source_{i // 3}.txt:{i}" for i in range(30)]
+        collection.add(ids=ids, embeddings=[[float(i), 1.0] for i in range(30)], documents=ids,
+                       metadatas=[{"source": f"source_{i // 3}.txt"} for i in range(30)])
+        self.index_sources(collection)
+
+        seen = []
+        for page in iter_pages(collection, COLLECTION, include=(), page_size=6):
+            self.assertLessEqual(len(page["ids"]), 6)
+            if not seen:
+                # Chunks deleted during the scan do not make it skip or repeat the others
+                collection.delete(ids=ids[:3])
+            seen.extend(page["ids"])
+        self.assertEqual(sorted(seen), sorted(ids))
+
+    def test_pages_fall_back_to_offsets_without_a_source_index(self):
+        self.fill(COLLECTION, 7)
+        seen = [chunk_id for page in iter_pages(self.client.get_collection(COLLECTION), COLLECTION, include=(), page_size=3)
+                for chunk_id in page["ids"]]
+        self.assertEqual(sorted(seen), sorted(f"chunk:{i}" for i in range(7)))
+
+    def test_count_where_reads_pages(self):
+        collection = self.fill(COLLECTION, 9)
+        self.assertEqual(count_where({"recording_ts": {"$lt": 7}}, collection, page_size=2), 7)
+        self.assertEqual(count_where({"source": "source_0.txt"}, collection, page_size=5), 5)
+        self.assertEqual(count_where({"source": "missing.txt"}, collection), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import chromadb
+
+from rag_system.bulk_indexer import bulk_index_transcriptions
+from rag_system.embeddings import CachedEmbeddings, EmbeddingStore, HashingEmbeddings
+from rag_system.indexer import index_transcription
+from transcription_pipeline.telemetry import _DisabledTelemetry
+
+COLLECTION = "mismatch_collection"
+TRANSCRIPT = "The budget meeting discussed the quarterly numbers and the hiring plan for next year.\n"
+
+
+class EmbeddingModelMismatchTest(unittest.TestCase):
+    """Indexing into a collection embedded with another model must not write anything."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        os.makedirs("transcriptions")
+        self.transcription_path = os.path.join("transcriptions", "2024-01-15_budget_meeting.txt")
+        with open(self.transcription_path, 'w', encoding='utf-8') as f:
+            f.write(TRANSCRIPT)
+        embeddings = HashingEmbeddings(dim=8)
+        self.embeddings = CachedEmbeddings(embeddings, "hashing:8", EmbeddingStore(os.path.join(self.tmp.name, "embeddings.sqlite3")))
+        self.patches = [
+            mock.patch.dict(os.environ, {"EMBEDDING_PROVIDER": "hashing"}),
+            mock.patch("rag_system.indexer.get_embeddings", return_value=self.embeddings),
+            mock.patch("rag_system.bulk_indexer.get_embeddings", return_value=self.embeddings),
+            # Spans would go to the project's logs/telemetry.jsonl
+            mock.patch("transcription_pipeline.telemetry._telemetry", _DisabledTelemetry()),
+        ]
+        for patch in self.patches:
+            patch.start()
+        # A collection filled by another embedding model, with vectors of another dimension
+        self.collection = chromadb.PersistentClient(path="chroma_db").get_or_create_collection(
+            name=COLLECTION, embedding_function=None, metadata={"embedding_model": "text-embedding-3-small"}
+        )
+        self.collection.add(ids=["old:1"], embeddings=[[0.1, 0.2, 0.3]], documents=["old chunk"], metadatas=[{"source": "old.txt"}])
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        # Chroma keeps one client per path; the next test gets a new 'chroma_db'
+        chromadb.api.client.SharedSystemClient.clear_system_cache()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_index_transcription_refuses_another_model(self):
+        with self.assertRaises(ValueError):
+            index_transcription(self.transcription_path, COLLECTION)
+        self.assertEqual(self.collection.get()["ids"], ["old:1"])
+
+    def test_bulk_indexer_refuses_another_model(self):
+        with self.assertRaises(ValueError):
+            bulk_index_transcriptions(["transcriptions"], COLLECTION)
+        self.assertEqual(self.collection.get()["ids"], ["old:1"])
+
+    def test_matching_model_is_indexed(self):
+        bulk_index_transcriptions(["transcriptions"], "matching_collection")
+        collection = chromadb.PersistentClient(path="chroma_db").get_collection("matching_collection")
+        self.assertEqual(collection.count(), 1)
+        self.assertEqual(collection.metadata["embedding_model"], "hashing:8")
+
+
+if __name__ == "__main__":
+    unittest.main()
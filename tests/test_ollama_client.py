@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rag_system.ollama_client import OllamaLLM
+
+# Pieces of the answer sent by the mock, and the delay between them
+ANSWER_PIECES = ["The ", "meeting ", "was ", "on ", "Monday."]
+PIECE_DELAY = 0.05
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    """Serves /api/generate like Ollama: one JSON object, or NDJSON lines when 'stream' is true."""
+
+    def do_POST(self):
+        server = self.server
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not payload.get("prompt"):
+            # Warm-up request: only loads the model
+            self._send_json({"model": payload.get("model"), "done": True})
+            return
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            pieces = server.pieces if payload.get("stream") else ["".join(server.pieces)]
+            if not payload.get("stream"):
+                time.sleep(PIECE_DELAY * len(server.pieces))
+                self._send_json({"model": payload["model"], "response": pieces[0], "done": True, "eval_count": len(server.pieces)})
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            for piece in pieces:
+                time.sleep(PIECE_DELAY)
+                self._write_line({"model": payload["model"], "response": piece, "done": False})
+            self._write_line({"model": payload["model"], "response": "", "done": True, "eval_count": len(pieces), "eval_duration": 1000})
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client stopped reading
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send_json(self, message):
+        body = json.dumps(message).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_line(self, message):
+        self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OllamaClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), MockOllamaHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.pieces = ANSWER_PIECES
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.llm = None
+
+    def tearDown(self):
+        if self.llm is not None:
+            self.llm.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def make_llm(self, max_concurrency=2):
+        self.llm = OllamaLLM(base_url=self.base_url, model="mock", max_concurrency=max_concurrency, timeout=10)
+        return self.llm
+
+    def test_invoke_returns_the_answer(self):
+        llm = self.make_llm()
+        self.assertEqual(llm.invoke("When was the meeting?"), "".join(ANSWER_PIECES))
+
+    def test_stream_yields_pieces_and_final_stats(self):
+        llm = self.make_llm()
+        stats = {}
+        pieces = list(llm.stream("When was the meeting?", stats))
+        self.assertEqual(pieces, ANSWER_PIECES)
+        self.assertEqual(stats["eval_count"], len(ANSWER_PIECES))
+        self.assertTrue(stats["done"])
+
+    def test_concurrent_requests_are_capped(self):
+        llm = self.make_llm(max_concurrency=2)
+        answers = []
+
+        def ask():
+            answers.append(llm.invoke("When was the meeting?"))
+
+        threads = [threading.Thread(target=ask) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+        self.assertEqual(len(answers), 5)
+        self.assertEqual(self.server.max_in_flight, 2)
+
+    def test_abandoned_stream_releases_its_slot(self):
+        self.server.pieces = ["piece "] * 100  # about 5 seconds of streaming
+        llm = self.make_llm(max_concurrency=1)
+        stream = llm.stream("When was the meeting?")
+        self.assertEqual(next(stream), "piece ")
+        stream.close()
+        # With the only slot freed, the next request does not wait for the abandoned answer
+        self.server.pieces = ANSWER_PIECES
+        start = time.perf_counter()
+        self.assertEqual(llm.invoke("When was the meeting?"), "".join(ANSWER_PIECES))
+        self.assertLess(time.perf_counter() - start, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
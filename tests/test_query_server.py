@@ -0,0 +1,65 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+import unittest
+
+from rag_system.query_server import QueryServer
+
+TOKENS = 1000
+
+
+class SlowEngine:
+    """Streams TOKENS tokens, one every few milliseconds, like an LLM backend; records when it is stopped."""
+
+    def __init__(self):
+        self.produced = 0
+        self.closed = threading.Event()
+
+    def answer_stream(self, query_string, filters=None):
+        try:
+            yield {"type": "sources", "sources": []}
+            for _ in range(TOKENS):
+                time.sleep(0.005)
+                self.produced += 1
+                yield {"type": "token", "text": "word "}
+            yield {"type": "done", "answer": "word " * TOKENS, "timings": {}, "cache": None}
+        finally:
+            self.closed.set()
+
+
+class QueryServerStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = SlowEngine()
+        self.server = QueryServer(self.engine, max_workers=2)
+        self.loop = asyncio.new_event_loop()
+        self.listener = self.loop.run_until_complete(asyncio.start_server(self.server.handle, "127.0.0.1", 0))
+        self.port = self.listener.sockets[0].getsockname()[1]
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.listener.close()
+        self.loop.run_until_complete(self.listener.wait_closed())
+        self.loop.close()
+        self.server.executor.shutdown(wait=True)
+
+    def test_disconnected_client_stops_the_generation(self):
+        body = json.dumps({"query": "What was decided?", "stream": True}).encode('utf-8')
+        client = socket.create_connection(("127.0.0.1", self.port))
+        client.sendall(b"POST /query HTTP/1.1\r\nHost: localhost\r\n"
+                       + f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+        received = b""
+        while b'"token"' not in received:
+            received += client.recv(4096)
+        client.close()
+
+        self.assertTrue(self.engine.closed.wait(5))
+        self.assertLess(self.engine.produced, TOKENS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import chromadb
+
+from rag_system import retriever
+from rag_system.collection_state import find_sources, normalize_language, record_source
+from rag_system.embeddings import CachedEmbeddings, EmbeddingStore, HashingEmbeddings
+from rag_system.lexical_index import LexicalIndex
+
+COLLECTION = "filters_collection"
+
+
+class LanguageNormalizationTest(unittest.TestCase):
+    def test_codes_and_names_give_the_same_code(self):
+        for value in ("it", "italian", "Italian", " IT ", "it-IT", "it_IT"):
+            self.assertEqual(normalize_language(value), "it")
+        self.assertEqual(normalize_language("castilian"), "es")
+        self.assertEqual(normalize_language("Klingon"), "klingon")
+
+
+class RetrieverFiltersTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.embeddings = CachedEmbeddings(HashingEmbeddings(dim=256), "hashing:256",
+                                           EmbeddingStore(os.path.join(self.tmp.name, "embeddings.sqlite3")))
+        self.patches = [mock.patch("rag_system.retriever.get_embeddings", return_value=self.embeddings)]
+        for patch in self.patches:
+            patch.start()
+        self.collection = chromadb.PersistentClient(path="chroma_db").get_or_create_collection(
+            name=COLLECTION, embedding_function=None, metadata={"embedding_model": "hashing:256"}
+        )
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        retriever._databases.clear()
+        chromadb.api.client.SharedSystemClient.clear_system_cache()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def add(self, source, text, language=None):
+        metadata = {"source": source, "language": language} if language else {"source": source}
+        self.collection.add(ids=[f"{source}:0"], embeddings=[self.embeddings.embed_query(text)], documents=[text],
+                            metadatas=[metadata])
+        record_source(COLLECTION, source, {"language": language} if language else {}, 1)
+
+    def test_language_filter_matches_every_engine(self):
+        # Indexed before languages were normalized (OpenAI name), and after (code)
+        self.add("api.txt", "budget review", language="italian")
+        self.add("local.txt", "budget review", language="it")
+        self.add("english.txt", "budget review", language="en")
+
+        for language in ("it", "italian", "Italian"):
+            self.assertEqual(find_sources(COLLECTION, language=language), ["api.txt", "local.txt"])
+            docs = retriever.query_chroma_db("budget review", COLLECTION, k=5, mode="vector", filters={"language": language})
+            self.assertEqual(sorted(doc.metadata["source"] for doc in docs), ["api.txt", "local.txt"])
+
+    def test_large_source_filters_are_searched_in_chunks(self):
+        for i in range(7):
+            self.add(f"meeting_{i}.txt", f"meeting {i} about the budget" if i == 5 else f"meeting {i} about hiring")
+        self.add("other.txt", "budget budget budget")
+
+        with mock.patch("rag_system.retriever.MAX_WHERE_SOURCES", 2):
+            self.assertEqual(len(retriever.build_wheres({"sources": ["meeting_*"]}, find_sources(COLLECTION, ["meeting_*"]))), 4)
+            for mode in ("vector", "hybrid"):
+                docs = retriever.query_chroma_db("budget", COLLECTION, k=3, mode=mode, filters={"sources": ["meeting_*"]})
+                self.assertEqual(len(docs), 3)
+                self.assertEqual(docs[0].metadata["source"], "meeting_5.txt")
+                self.assertTrue(all(doc.metadata["source"].startswith("meeting_") for doc in docs))
+
+    def test_keyword_search_takes_more_sources_than_sqlite_variables(self):
+        index = LexicalIndex(COLLECTION)
+        index.add([("wanted.txt:0", "wanted.txt", "budget approved"), ("other.txt:0", "other.txt", "budget approved")])
+        sources = [f"recording_{i}.txt" for i in range(40000)] + ["wanted.txt"]
+        self.assertEqual([chunk_id for chunk_id, _ in index.search("budget", sources=sources)], ["wanted.txt:0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
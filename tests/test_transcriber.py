@@ -0,0 +1,101 @@
+import os
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from transcription_pipeline.telemetry import _DisabledTelemetry
+from transcription_pipeline.timestamps import load_timeline
+from transcription_pipeline.transcriber import OpenAITranscriptionEngine, transcribe_audio_api
+
+# verbose_json answer of the stub, in seconds of the (sped-up) audio file
+STUB_SEGMENTS = [(0.0, 4.5, " The meeting starts. "), (4.5, 9.0, " Budget approved. ")]
+STUB_TEXT = "The meeting starts. Budget approved."
+STUB_LANGUAGE = "italian"
+
+
+class StubTranscriptions:
+    """Stands in for client.audio.transcriptions: records the requests and answers like the OpenAI API."""
+
+    def __init__(self):
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self.lock:
+            self.requests.append({**kwargs, "file_name": os.path.basename(kwargs["file"].name)})
+        if kwargs.get("response_format") != "verbose_json":
+            return SimpleNamespace(text=STUB_TEXT)
+        segments = [SimpleNamespace(start=start, end=end, text=text) for start, end, text in STUB_SEGMENTS]
+        return SimpleNamespace(text=STUB_TEXT, segments=segments, language=STUB_LANGUAGE)
+
+
+class StubClient:
+    def __init__(self):
+        self.audio = SimpleNamespace(transcriptions=StubTranscriptions())
+
+
+class OpenAITranscriptionEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.audio_path = os.path.join(self.tmp.name, "meeting.ogg")
+        with open(self.audio_path, 'wb') as f:
+            f.write(b"audio")
+        self.client = StubClient()
+        self.patches = [
+            mock.patch.dict(os.environ, {"OPENAI_TRANSCRIPTION_MODEL": "whisper-1", "AUDIO_TEMPO": "2.0", "AUDIO_TRIM_SILENCE": "false"}),
+            # No ffprobe, usage log or telemetry file needed
+            mock.patch("transcription_pipeline.transcriber.get_audio_duration", return_value=9.0),
+            mock.patch("transcription_pipeline.transcriber.log_api_usage"),
+            mock.patch("transcription_pipeline.telemetry._telemetry", _DisabledTelemetry()),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        self.tmp.cleanup()
+
+    def test_timestamp_model_requests_verbose_json(self):
+        OpenAITranscriptionEngine(client=self.client).transcribe(self.audio_path, segmented=False)
+        request, = self.client.audio.transcriptions.requests
+        self.assertEqual(request["model"], "whisper-1")
+        self.assertEqual(request["response_format"], "verbose_json")
+        self.assertEqual(request["file_name"], "meeting.ogg")
+
+    def test_other_models_request_plain_text(self):
+        with mock.patch.dict(os.environ, {"OPENAI_TRANSCRIPTION_MODEL": "gpt-4o-transcribe"}):
+            text, segments, language = OpenAITranscriptionEngine(client=self.client).transcribe(self.audio_path, segmented=False)
+        request, = self.client.audio.transcriptions.requests
+        self.assertEqual(request["model"], "gpt-4o-transcribe")
+        self.assertNotIn("response_format", request)
+        self.assertEqual(text, STUB_TEXT)
+        self.assertIsNone(segments)
+        self.assertIsNone(language)
+
+    def test_verbose_json_is_parsed(self):
+        text, segments, language = OpenAITranscriptionEngine(client=self.client).transcribe(self.audio_path, segmented=False)
+        self.assertEqual(text, STUB_TEXT)
+        self.assertEqual(segments, [
+            {"start": 0.0, "end": 4.5, "text": "The meeting starts."},
+            {"start": 4.5, "end": 9.0, "text": "Budget approved."},
+        ])
+        self.assertEqual(language, STUB_LANGUAGE)
+
+    def test_timestamps_are_scaled_to_the_original_media(self):
+        media_path = os.path.join(self.tmp.name, "meeting.mp4")
+        text, temp_path = transcribe_audio_api(self.audio_path, self.tmp.name, "meeting.mp4", client=self.client,
+                                               segmented=False, media_path=media_path)
+        with open(temp_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), text)
+        timeline = load_timeline(temp_path)
+        # The audio was sped up 2x before transcription
+        self.assertEqual([(s["start"], s["end"]) for s in timeline["segments"]], [(0.0, 9.0), (9.0, 18.0)])
+        self.assertEqual(timeline["duration_seconds"], 18.0)
+        self.assertEqual(timeline["media_path"], media_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
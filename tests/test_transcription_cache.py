@@ -0,0 +1,50 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from transcription_pipeline.cache import TranscriptionCache
+from transcription_pipeline.utils import estimate_transcription_cost
+
+
+class TranscriptionCacheHitTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log = mock.patch("transcription_pipeline.cache.log_api_usage").start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        self.tmp.cleanup()
+
+    def logged_hit(self):
+        (file_name, provider, operation), kwargs = self.log.call_args
+        self.assertEqual(operation, "transcription_cache_hit")
+        return provider, kwargs["avoided_cost"]
+
+    def test_hits_are_logged_under_the_engine_that_produced_them(self):
+        cache = TranscriptionCache(self.tmp.name)
+        cache.put("openai-key", "text", 600.0, provider="OpenAI")
+        cache.put("local-key", "text", 600.0, provider="Local")
+
+        self.assertEqual(cache.get("openai-key", "a.mp4"), "text")
+        self.assertEqual(self.logged_hit(), ("OpenAI", estimate_transcription_cost(600.0)))
+        self.assertEqual(cache.get("local-key", "b.mp4"), "text")
+        self.assertEqual(self.logged_hit(), ("Local", 0.0))
+
+    def test_entries_of_older_indexes_count_as_openai(self):
+        # Index created before the provider column existed
+        with sqlite3.connect(os.path.join(self.tmp.name, "index.sqlite3")) as conn:
+            conn.execute("CREATE TABLE entries (key TEXT PRIMARY KEY, size INTEGER NOT NULL, audio_seconds REAL, "
+                         "created_at REAL NOT NULL, last_access REAL NOT NULL)")
+            conn.execute("INSERT INTO entries VALUES ('old-key', 4, 600.0, 0, 0)")
+        with open(os.path.join(self.tmp.name, "old-key.txt"), 'w', encoding='utf-8') as f:
+            f.write("text")
+
+        cache = TranscriptionCache(self.tmp.name)
+        self.assertEqual(cache.get("old-key"), "text")
+        self.assertEqual(self.logged_hit(), ("OpenAI", estimate_transcription_cost(600.0)))
+
+
+if __name__ == "__main__":
+    unittest.main()
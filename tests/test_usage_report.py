@@ -0,0 +1,58 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from transcription_pipeline.usage_report import UsageRollups, usage_report
+
+
+def write_log(path, entries):
+    with open(path, 'a', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+
+
+def usage_entry(cost, file_name="meeting.mp4"):
+    return {
+        "timestamp": "2024-01-15T10:00:00", "api_provider": "OpenAI", "operation": "transcription",
+        "file_name": file_name, "estimated_cost": cost, "latency_seconds": 2.0, "audio_seconds": 60.0,
+    }
+
+
+class UsageRollupsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.tmp.name, "api_usage.jsonl")
+        self.rollups = UsageRollups(os.path.join(self.tmp.name, "rollups.sqlite3"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_rotations_in_the_same_second_are_all_counted(self):
+        # A frozen clock second: every rotation below happens "at the same time"
+        with mock.patch("time.strftime", return_value="20240115100000"):
+            write_log(self.log_path, [usage_entry(0.01), usage_entry(0.02)])
+            self.assertEqual(self.rollups.rotate(self.log_path), 2)
+            write_log(self.log_path, [usage_entry(0.03), usage_entry(0.04), usage_entry(0.05)])
+            self.assertEqual(self.rollups.rotate(self.log_path), 3)
+
+        report = usage_report(("day",), log_path=self.log_path, rollups=self.rollups)
+        day = report["day"]["2024-01-15"]
+        self.assertEqual(day.entries, 5)
+        self.assertAlmostEqual(day.cost, 0.15)
+        self.assertEqual(os.listdir(self.tmp.name), ["rollups.sqlite3"])
+
+    def test_report_merges_rollups_and_raw_log(self):
+        write_log(self.log_path, [usage_entry(0.01)])
+        self.rollups.rotate(self.log_path)
+        write_log(self.log_path, [usage_entry(0.02, file_name="other.mp4")])
+
+        report = usage_report(("file", "day"), log_path=self.log_path, rollups=self.rollups)
+        self.assertEqual(set(report["file"]), {"meeting.mp4", "other.mp4"})
+        self.assertEqual(report["day"]["2024-01-15"].entries, 2)
+        self.assertAlmostEqual(report["day"]["2024-01-15"].audio_seconds, 120.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
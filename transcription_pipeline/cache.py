@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from .logger import log_api_usage
+from .utils import estimate_transcription_cost
+
+DEFAULT_CACHE_DIR = os.path.join(os.getcwd(), "cache", "transcriptions")
+DEFAULT_MAX_MB = 500
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """Computes the SHA-256 of a file without loading it in memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_cache_key(file_hash, ffmpeg_args, model):
+    """Builds the cache key from the media hash and everything that affects the transcription."""
+    payload = json.dumps({"media": file_hash, "ffmpeg": list(ffmpeg_args), "model": model}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TranscriptionCache:
+    """
+    Persistent, content-addressed cache of transcriptions.
+    Texts are stored as files in cache_dir, an SQLite index tracks their size
+    and last access time so the cache can be kept under max_bytes (LRU eviction).
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or os.getenv("TRANSCRIPTION_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("TRANSCRIPTION_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.index_path = os.path.join(self.cache_dir, "index.sqlite3")
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    audio_seconds REAL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    provider TEXT
+                )
+            """)
+            # Indexes created before the provider was stored (their entries all came from OpenAI)
+            if "provider" not in {row[1] for row in conn.execute("PRAGMA table_info(entries)")}:
+                conn.execute("ALTER TABLE entries ADD COLUMN provider TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS file_hashes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        return sqlite3.connect(self.index_path, timeout=30)
+
+    def _text_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def _timing_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.timing.json")
+
+    def hash_source(self, path):
+        """
+        Returns the SHA-256 of a media file, reusing the stored hash when the
+        file size and modification time have not changed.
+        """
+        stat = os.stat(path)
+        abs_path = os.path.abspath(path)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT sha256 FROM file_hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (abs_path, stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+        if row:
+            return row[0]
+        sha256 = hash_file(path)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                (abs_path, stat.st_size, stat.st_mtime_ns, sha256)
+            )
+        return sha256
+
+    def get(self, key, file_name=None):
+        """
+        Returns the cached transcription text for 'key', or None on a miss.
+        Hits are logged under the engine that produced the entry, with the
+        transcription cost they avoided (none for the local engine).
+        """
+        text_path = self._text_path(key)
+        with self._connect() as conn:
+            row = conn.execute("SELECT audio_seconds, provider FROM entries WHERE key = ?", (key,)).fetchone()
+            if row and os.path.exists(text_path):
+                conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            else:
+                row = None
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with open(text_path, "r", encoding="utf-8") as f:
+            text = f.read()
+        with self._lock:
+            self.hits += 1
+        audio_seconds, provider = row[0], row[1] or "OpenAI"
+        avoided_cost = estimate_transcription_cost(audio_seconds) if audio_seconds and provider == "OpenAI" else 0.0
+        log_api_usage(
+            file_name or key, provider, "transcription_cache_hit",
+            avoided_cost=avoided_cost, cache_stats=self.stats()
+        )
+        return text
+
+    def get_timing(self, key):
+        """Returns the timing (segment timestamps, language, duration) cached with a transcription, or None."""
+        try:
+            with open(self._timing_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Error reading cached timestamps {key}: {e}", file=sys.stderr)
+            return None
+
+    def _write_atomic(self, path, content):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def put(self, key, text, audio_seconds=None, timing=None, provider=None):
+        """
+        Stores a transcription, with its timing and the provider of the engine
+        that produced it if given, and evicts the least recently used entries
+        over the size limit.
+        """
+        text_path = self._text_path(key)
+        self._write_atomic(text_path, text)
+        size = os.path.getsize(text_path)
+        if timing:
+            self._write_atomic(self._timing_path(key), json.dumps(timing))
+            size += os.path.getsize(self._timing_path(key))
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, size, audio_seconds, created_at, last_access, provider) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, size, audio_seconds, now, now, provider)
+            )
+        self.evict()
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        with self._connect() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = conn.execute("SELECT key, size FROM entries ORDER BY last_access ASC").fetchall()
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                for path in (self._text_path(key), self._timing_path(key)):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        print(f"Error deleting cached transcription {key}: {e}", file=sys.stderr)
+                total -= size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
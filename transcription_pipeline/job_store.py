@@ -0,0 +1,119 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+
+DEFAULT_JOB_STORE_PATH = os.path.join(os.getcwd(), "jobs", "jobs.sqlite3")
+
+# Ingestion stages, in execution order
+STAGES = ("convert", "transcribe", "title", "index")
+
+
+class JobStore:
+    """
+    Local SQLite store of ingestion jobs.
+    Each job tracks one source file; the output of every completed stage is
+    recorded so an interrupted run can resume at the first incomplete stage.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.getenv("JOB_STORE_PATH", DEFAULT_JOB_STORE_PATH)
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    source_path TEXT NOT NULL,
+                    source_hash TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    failed_stage TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_source ON jobs (source_path, source_hash)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS stage_outputs (
+                    job_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    output TEXT NOT NULL,
+                    completed_at REAL NOT NULL,
+                    PRIMARY KEY (job_id, stage)
+                )
+            """)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get_or_create_job(self, source_path, source_hash):
+        """
+        Returns the latest job for this source file and content, creating a new
+        one if none exists. The returned dict has 'job_id' and 'status'.
+        """
+        abs_path = os.path.abspath(source_path)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT job_id, status FROM jobs WHERE source_path = ? AND source_hash = ? ORDER BY created_at DESC LIMIT 1",
+                (abs_path, source_hash)
+            ).fetchone()
+            if row:
+                return {"job_id": row[0], "status": row[1]}
+            return self._insert_job(conn, abs_path, source_hash)
+
+    def create_job(self, source_path, source_hash):
+        """Always starts a new job, ignoring previous runs on the same file."""
+        with self._connect() as conn:
+            return self._insert_job(conn, os.path.abspath(source_path), source_hash)
+
+    def _insert_job(self, conn, abs_path, source_hash):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn.execute(
+            "INSERT INTO jobs (job_id, source_path, source_hash, status, created_at, updated_at) VALUES (?, ?, ?, 'pending', ?, ?)",
+            (job_id, abs_path, source_hash, now, now)
+        )
+        return {"job_id": job_id, "status": "pending"}
+
+    def get_stage_outputs(self, job_id):
+        """Returns a dict mapping each completed stage to its recorded output."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT stage, output FROM stage_outputs WHERE job_id = ?", (job_id,)).fetchall()
+        return {stage: json.loads(output) for stage, output in rows}
+
+    def complete_stage(self, job_id, stage, output):
+        now = time.time()
+        status = "done" if stage == STAGES[-1] else "running"
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO stage_outputs (job_id, stage, output, completed_at) VALUES (?, ?, ?, ?)",
+                (job_id, stage, json.dumps(output), now)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = ?, failed_stage = NULL, error = NULL, updated_at = ? WHERE job_id = ?",
+                (status, now, job_id)
+            )
+
+    def invalidate_stage(self, job_id, stage):
+        """Forgets a stage output (e.g. when its artifact no longer exists on disk)."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM stage_outputs WHERE job_id = ? AND stage = ?", (job_id, stage))
+
+    def fail(self, job_id, stage, error):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', failed_stage = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (stage, str(error), time.time(), job_id)
+            )
+
+    def list_jobs(self, status=None):
+        query = "SELECT job_id, source_path, status, failed_stage, error, updated_at FROM jobs"
+        params = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY updated_at DESC", params).fetchall()
+        keys = ("job_id", "source_path", "status", "failed_stage", "error", "updated_at")
+        return [dict(zip(keys, row)) for row in rows]
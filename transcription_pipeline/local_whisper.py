@@ -0,0 +1,116 @@
+import io
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+
+from .segmenter import iter_audio_segments, merge_segment_results, remove_segments
+from .utils import bounded_map
+
+load_dotenv()
+
+DEFAULT_LOCAL_MODEL = "base"
+DEFAULT_COMPUTE_TYPE = "int8"
+# Length of the pieces handed to the workers, in seconds of the (sped-up) audio
+DEFAULT_SEGMENT_SECONDS = 60
+
+# Model loaded once in each worker process (see _load_worker_model)
+_worker_model = None
+
+
+def _load_worker_model(model_name, cpu_threads, compute_type):
+    global _worker_model
+    from faster_whisper import WhisperModel
+    _worker_model = WhisperModel(model_name, device="cpu", cpu_threads=cpu_threads, compute_type=compute_type)
+
+
+def _transcribe_local_segment(segment, language):
+    """
+    Runs in a worker process. Returns the same result dict as
+    transcriber.transcribe_segment, with times relative to the whole audio.
+    Segments are files ('path') or in-memory WAV data ('data').
+    """
+    audio = segment["path"] if "path" in segment else io.BytesIO(segment["data"])
+    pieces, info = _worker_model.transcribe(audio, language=language, vad_filter=True)
+    sub_segments = [
+        {"start": segment["start"] + piece.start, "end": segment["start"] + piece.end, "text": piece.text.strip()}
+        for piece in pieces
+    ]
+    return {
+        "index": segment["index"],
+        "start": segment["start"],
+        "end": segment["end"],
+        "text": " ".join(s["text"] for s in sub_segments if s["text"]),
+        "segments": sub_segments,
+        "language": info.language,
+    }
+
+
+class LocalWhisperEngine:
+    """
+    Transcription engine running Whisper locally on the CPU (faster-whisper).
+    The audio is cut at silences into short pieces which are fed, through a
+    bounded queue, to a pool of worker processes each holding its own model,
+    so all cores are busy and only a few pieces are on disk at any time.
+    """
+
+    provider = "Local"
+
+    def __init__(self, model_name: str = None, workers: int = None, threads_per_worker: int = None, queue_size: int = None,
+                 segment_seconds: float = None):
+        try:
+            import faster_whisper  # noqa: F401
+        except ImportError:
+            raise ImportError("faster-whisper is not installed. Please install it with 'pip install faster-whisper'")
+        self.model_name = model_name or os.getenv("TRANSCRIPTION_LOCAL_MODEL", DEFAULT_LOCAL_MODEL)
+        self.model = f"faster-whisper:{self.model_name}"
+        threads_per_worker = threads_per_worker or int(os.getenv("TRANSCRIPTION_LOCAL_THREADS", "1"))
+        self.workers = workers or int(os.getenv("TRANSCRIPTION_LOCAL_WORKERS", max(1, (os.cpu_count() or 1) // threads_per_worker)))
+        self.queue_size = queue_size or int(os.getenv("TRANSCRIPTION_LOCAL_QUEUE", 2 * self.workers))
+        self.segment_seconds = segment_seconds or float(os.getenv("TRANSCRIPTION_LOCAL_SEGMENT_SECONDS", DEFAULT_SEGMENT_SECONDS))
+        self.stream_segment_seconds = self.segment_seconds
+        self.language = os.getenv("TRANSCRIPTION_LANGUAGE") or None
+        compute_type = os.getenv("TRANSCRIPTION_LOCAL_COMPUTE_TYPE", DEFAULT_COMPUTE_TYPE)
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_load_worker_model,
+            initargs=(self.model_name, threads_per_worker, compute_type),
+        )
+
+    def estimate_cost(self, duration_seconds):
+        return 0.0
+
+    def transcribe(self, audio_path, segmented=None):
+        """
+        Transcribes an audio file. Returns (text, segments, language), as
+        transcriber.request_transcription does, with times relative to the file.
+        'segmented' is accepted for interface compatibility: the audio is always
+        split so that the workers can share it.
+        """
+        print(f"\nTranscribing '{os.path.basename(audio_path)}' locally with {self.model} ({self.workers} workers)...")
+        segments = iter_audio_segments(audio_path, os.path.dirname(audio_path), self.segment_seconds)
+        return self.transcribe_stream(segments, release=lambda segment: remove_segments([segment], keep=audio_path))
+
+    def transcribe_stream(self, segments, release=None):
+        """
+        Transcribes segments as they are produced (see streaming.PcmSegmentStream).
+        Returns (text, segments, language).
+        """
+        # Wait for a free slot before pulling the next segment: the queue of pieces waiting for a worker is bounded
+        results = bounded_map(self._pool, _transcribe_local_segment, segments, self.queue_size, self.language, release=release)
+        return merge_segment_results(results)
+
+    def close(self):
+        self._pool.shutdown(cancel_futures=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python -m transcription_pipeline.local_whisper <audio_file>", file=sys.stderr)
+        sys.exit(1)
+    engine = LocalWhisperEngine()
+    try:
+        text, _, language = engine.transcribe(sys.argv[1])
+        print(f"Language: {language}\n{text}")
+    finally:
+        engine.close()
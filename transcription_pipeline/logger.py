@@ -1,13 +1,17 @@
-import json
 import os
 from datetime import datetime
+from .telemetry import get_writer
 
 LOG_FILE = os.path.join(os.getcwd(), "logs", "api_usage.jsonl")
 
-def log_api_usage(file_name: str, api_provider: str, operation: str, input_tokens: int = 0, output_tokens: int = 0, total_tokens: int = 0, estimated_cost: float = 0.0):
+def log_api_usage(file_name: str, api_provider: str, operation: str, input_tokens: int = 0, output_tokens: int = 0, total_tokens: int = 0, estimated_cost: float = 0.0, avoided_cost: float = 0.0, cache_stats: dict = None,
+                  latency_seconds: float = None, audio_seconds: float = None):
     """
     Logs API usage data to a JSONL file.
-    Each log entry is a JSON object on a new line.
+    Each log entry is a JSON object on a new line, written in batches (see telemetry.BufferedJsonlWriter).
+    Cache hits pass the cost they avoided and the current cache hit/miss counters.
+    'latency_seconds' is the duration of the call and 'audio_seconds' the length
+    of the audio it processed; both are summarized by usage_report.py.
     """
     log_entry = {
         "timestamp": datetime.now().isoformat(),
@@ -15,18 +19,27 @@ def log_api_usage(file_name: str, api_provider: str, operation: str, input_token
         "api_provider": api_provider,
         "operation": operation,
     }
-    if api_provider == "OpenAI":
+    if api_provider in ("OpenAI", "Local"):
         log_entry["estimated_cost"] = estimated_cost
     else: # Gemini
         log_entry["input_tokens"] = input_tokens
         log_entry["output_tokens"] = output_tokens
         log_entry["total_tokens"] = total_tokens
+    if latency_seconds is not None:
+        log_entry["latency_seconds"] = round(latency_seconds, 3)
+    if audio_seconds is not None:
+        log_entry["audio_seconds"] = audio_seconds
+    if avoided_cost:
+        log_entry["avoided_cost"] = avoided_cost
+    if cache_stats is not None:
+        log_entry["cache_stats"] = cache_stats
 
-    os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
-    with open(LOG_FILE, 'a', encoding='utf-8') as f:
-        f.write(json.dumps(log_entry) + '\n')
+    # Appended by a background writer: callers never wait for the file
+    get_writer(LOG_FILE).write(log_entry)
 
-    if api_provider == "OpenAI":
+    if cache_stats is not None:
+        print(f"[LOG] Cache hit for {api_provider} - {operation} on {file_name}. Avoided Cost: ${avoided_cost:.4f} (hits={cache_stats['hits']}, misses={cache_stats['misses']})")
+    elif api_provider in ("OpenAI", "Local"):
         print(f"[LOG] API usage logged for {api_provider} - {operation} on {file_name}. Estimated Cost: ${estimated_cost:.4f}")
     else:
         print(f"[LOG] API usage logged for {api_provider} - {operation} on {file_name}. Tokens: Input={input_tokens}, Output={output_tokens}, Total={total_tokens}")
@@ -0,0 +1,170 @@
+import os
+import re
+import subprocess
+import sys
+
+from .utils import get_audio_duration
+
+SILENCE_START_RE = re.compile(r"silence_start: (-?\d+(?:\.\d+)?)")
+SILENCE_END_RE = re.compile(r"silence_end: (-?\d+(?:\.\d+)?)")
+
+
+def detect_silences(audio_path, noise_db=-35, min_silence=0.5):
+    """
+    Detects silent intervals in an audio file using FFmpeg's silencedetect filter.
+    Returns a list of (start, end) tuples in seconds.
+    """
+    command = [
+        'ffmpeg',
+        '-i', audio_path,
+        '-af', f'silencedetect=noise={noise_db}dB:d={min_silence}',
+        '-f', 'null',
+        '-'
+    ]
+    try:
+        proc = subprocess.run(command, capture_output=True, text=True)
+    except FileNotFoundError as e:
+        print(f"Error running FFmpeg silence detection: {e}", file=sys.stderr)
+        return []
+
+    silences = []
+    current_start = None
+    for line in proc.stderr.splitlines():
+        start_match = SILENCE_START_RE.search(line)
+        if start_match:
+            current_start = max(0.0, float(start_match.group(1)))
+            continue
+        end_match = SILENCE_END_RE.search(line)
+        if end_match and current_start is not None:
+            silences.append((current_start, float(end_match.group(1))))
+            current_start = None
+    return silences
+
+
+def plan_segments(duration, silences, max_segment_seconds):
+    """
+    Plans segment boundaries so that no segment exceeds max_segment_seconds.
+    Each cut is placed in the middle of the latest silence that fits in the
+    current window; if there is none, the window is cut at its hard limit.
+    """
+    if duration <= max_segment_seconds:
+        return [(0.0, duration)]
+
+    cut_points = [(start + end) / 2 for start, end in silences]
+    segments = []
+    segment_start = 0.0
+    while duration - segment_start > max_segment_seconds:
+        window_end = segment_start + max_segment_seconds
+        candidates = [p for p in cut_points if segment_start < p <= window_end]
+        # Ignore silences too close to the segment start, they would produce tiny segments
+        candidates = [p for p in candidates if p - segment_start >= max_segment_seconds / 4]
+        cut = candidates[-1] if candidates else window_end
+        segments.append((segment_start, cut))
+        segment_start = cut
+    segments.append((segment_start, duration))
+    return segments
+
+
+def split_audio_on_silence(audio_path, temp_dir, max_segment_bytes, duration=None):
+    """
+    Splits an audio file into size-bounded segments, cutting at silence boundaries.
+    Returns a list of dicts with 'index', 'path', 'start' and 'end' (seconds),
+    or None if the audio could not be split.
+    """
+    if duration is None:
+        duration = get_audio_duration(audio_path)
+    if not duration:
+        print(f"Cannot split '{audio_path}': unknown duration.", file=sys.stderr)
+        return None
+
+    file_size = os.path.getsize(audio_path)
+    if file_size <= max_segment_bytes:
+        return [{"index": 0, "path": audio_path, "start": 0.0, "end": duration}]
+
+    # Keep a 10% margin, container overhead makes segment sizes slightly uneven
+    bytes_per_second = file_size / duration
+    max_segment_seconds = (max_segment_bytes * 0.9) / bytes_per_second
+
+    silences = detect_silences(audio_path)
+    boundaries = plan_segments(duration, silences, max_segment_seconds)
+    print(f"Splitting '{os.path.basename(audio_path)}' into {len(boundaries)} segments...")
+
+    segments = []
+    for index, (start, end) in enumerate(boundaries):
+        segment = extract_segment(audio_path, temp_dir, index, start, end)
+        if segment is None:
+            remove_segments(segments)
+            return None
+        segments.append(segment)
+    return segments
+
+
+def extract_segment(audio_path, temp_dir, index, start, end):
+    """
+    Copies the audio between 'start' and 'end' (seconds) to a segment file.
+    Returns the segment dict, or None on failure.
+    """
+    base_name, ext = os.path.splitext(os.path.basename(audio_path))
+    segment_path = os.path.join(temp_dir, f"{base_name}_part{index:03d}{ext}")
+    command = [
+        'ffmpeg',
+        '-ss', f"{start:.3f}",
+        '-i', audio_path,
+        '-t', f"{end - start:.3f}",
+        '-c', 'copy',
+        '-y',
+        segment_path
+    ]
+    proc = subprocess.run(command, capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(f"Error extracting segment {index} of '{audio_path}'.", file=sys.stderr)
+        print(f"Stderr: {proc.stderr}", file=sys.stderr)
+        return None
+    return {"index": index, "path": segment_path, "start": start, "end": end}
+
+
+def iter_audio_segments(audio_path, temp_dir, max_segment_seconds, duration=None):
+    """
+    Yields segments of at most max_segment_seconds, cut at silence boundaries.
+    Each segment file is extracted only when the consumer asks for it, so a
+    bounded consumer keeps a bounded number of segment files on disk.
+    Raises RuntimeError if the audio cannot be split.
+    """
+    if duration is None:
+        duration = get_audio_duration(audio_path)
+    if not duration:
+        raise RuntimeError(f"Cannot split '{audio_path}': unknown duration.")
+    if duration <= max_segment_seconds:
+        yield {"index": 0, "path": audio_path, "start": 0.0, "end": duration}
+        return
+
+    boundaries = plan_segments(duration, detect_silences(audio_path), max_segment_seconds)
+    print(f"Splitting '{os.path.basename(audio_path)}' into {len(boundaries)} segments...")
+    for index, (start, end) in enumerate(boundaries):
+        segment = extract_segment(audio_path, temp_dir, index, start, end)
+        if segment is None:
+            raise RuntimeError(f"Cannot extract segment {index} of '{audio_path}'.")
+        yield segment
+
+
+def remove_segments(segments, keep=None):
+    """Deletes temporary segment files, except for the path given in 'keep'."""
+    for segment in segments:
+        if segment["path"] == keep:
+            continue
+        try:
+            os.remove(segment["path"])
+        except OSError as e:
+            print(f"Error deleting segment {segment['path']}: {e}", file=sys.stderr)
+
+
+def merge_segment_results(results):
+    """
+    Stitches per-segment transcription results back together in audio order.
+    Returns (text, segments, language), as transcriber.request_transcription does.
+    """
+    results = sorted(results, key=lambda r: r["index"])
+    text = "\n".join(r["text"] for r in results if r["text"])
+    segments = [s for r in results for s in r["segments"]]
+    language = next((r["language"] for r in results if r["language"]), None)
+    return text, segments or None, language
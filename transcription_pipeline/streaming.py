@@ -0,0 +1,101 @@
+import io
+import subprocess
+import tempfile
+import wave
+
+import numpy as np
+
+# Audio decoded by FFmpeg on the pipe: 16 kHz mono signed 16-bit PCM
+SAMPLE_RATE = 16000
+SAMPLE_BYTES = 2
+# Energy is measured on 20 ms frames to place the cuts
+FRAME_SAMPLES = 320
+READ_BYTES = 64 * 1024
+# Tail of the FFmpeg log quoted in the error message when decoding fails
+STDERR_TAIL_BYTES = 4096
+
+
+def pcm_to_wav(samples):
+    """Wraps raw PCM bytes in an in-memory WAV file."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(SAMPLE_BYTES)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples)
+    return buffer.getvalue()
+
+
+def quietest_cut(samples, min_samples):
+    """
+    Returns the sample index to cut a buffer at: the middle of the quietest
+    frame after 'min_samples', so that cuts fall in pauses rather than words.
+    """
+    audio = np.frombuffer(samples, dtype=np.int16)
+    tail = audio[min_samples:]
+    frames = tail[:len(tail) - len(tail) % FRAME_SAMPLES].reshape(-1, FRAME_SAMPLES).astype(np.float32)
+    if not len(frames):
+        return len(audio)
+    energy = (frames ** 2).mean(axis=1)
+    return min_samples + int(np.argmin(energy)) * FRAME_SAMPLES + FRAME_SAMPLES // 2
+
+
+class PcmSegmentStream:
+    """
+    Iterates over the audio decoded by an FFmpeg command writing 16 kHz mono
+    PCM to stdout, cut into in-memory WAV segments of at most
+    max_segment_seconds as the audio arrives. Segments are dicts with 'index',
+    'start', 'end' (seconds), 'name' and 'data' (WAV bytes).
+    Once exhausted, duration_seconds holds the duration computed from the decoded samples.
+    Raises RuntimeError if FFmpeg fails.
+    """
+
+    def __init__(self, command, max_segment_seconds):
+        self.command = command
+        self.max_samples = int(max_segment_seconds * SAMPLE_RATE)
+        self.samples = 0
+        self.duration_seconds = None
+
+    def _segment(self, index, pcm):
+        start = self.samples / SAMPLE_RATE
+        self.samples += len(pcm) // SAMPLE_BYTES
+        return {
+            "index": index,
+            "start": start,
+            "end": self.samples / SAMPLE_RATE,
+            "name": f"segment{index:03d}.wav",
+            "data": pcm_to_wav(bytes(pcm)),
+        }
+
+    def __iter__(self):
+        # The log goes to a file: a stderr pipe nobody reads would block FFmpeg once full
+        # (e.g. one line per bad packet of a corrupt recording)
+        stderr = tempfile.TemporaryFile()
+        proc = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=stderr)
+        buffer = bytearray()
+        index = 0
+        try:
+            while True:
+                chunk = proc.stdout.read(READ_BYTES)
+                if chunk:
+                    buffer.extend(chunk)
+                while len(buffer) >= self.max_samples * SAMPLE_BYTES or (not chunk and len(buffer) >= SAMPLE_BYTES):
+                    if chunk:
+                        cut = quietest_cut(buffer[:self.max_samples * SAMPLE_BYTES], self.max_samples * 3 // 4)
+                    else:
+                        cut = len(buffer) // SAMPLE_BYTES
+                    yield self._segment(index, buffer[:cut * SAMPLE_BYTES])
+                    del buffer[:cut * SAMPLE_BYTES]
+                    index += 1
+                if not chunk:
+                    break
+            if proc.wait() != 0:
+                stderr.seek(max(0, stderr.seek(0, 2) - STDERR_TAIL_BYTES))
+                raise RuntimeError(f"FFmpeg decoding failed: {stderr.read().decode('utf-8', errors='replace').strip()}")
+            self.duration_seconds = self.samples / SAMPLE_RATE
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            proc.stdout.close()
+            stderr.close()
@@ -0,0 +1,299 @@
+import atexit
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TELEMETRY_FILE = os.path.join(os.getcwd(), "logs", "telemetry.jsonl")
+DEFAULT_FLUSH_SECONDS = 2.0
+DEFAULT_BUFFER_RECORDS = 1000
+DEFAULT_METRICS_HOST = "127.0.0.1"
+# Upper bounds (seconds) of the stage duration histogram buckets
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+# Numeric span fields summed per stage in the Prometheus export
+COUNTER_FIELDS = ("bytes", "tokens", "items", "audio_seconds")
+
+# File name of the innermost span with one, inherited by nested spans that have none
+_current_file = contextvars.ContextVar("telemetry_file_name", default=None)
+
+
+class BufferedJsonlWriter:
+    """
+    Appends JSON records to a JSONL file from a background thread.
+    write() only queues the record; the file is opened once per flush, every
+    'flush_seconds' or as soon as 'max_records' are pending, and at exit.
+    """
+
+    def __init__(self, path: str, flush_seconds: float = None, max_records: int = None):
+        self.path = path
+        self.flush_seconds = flush_seconds or float(os.getenv("TELEMETRY_FLUSH_SECONDS", DEFAULT_FLUSH_SECONDS))
+        self.max_records = max_records or int(os.getenv("TELEMETRY_BUFFER_RECORDS", DEFAULT_BUFFER_RECORDS))
+        self._records = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="jsonl-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, record: dict):
+        with self._lock:
+            self._records.append(record)
+            full = len(self._records) >= self.max_records
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        # Batches are written in the order they were taken
+        with self._write_lock:
+            with self._lock:
+                records, self._records = self._records, []
+            if not records:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write("".join(json.dumps(record) + '\n' for record in records))
+            except OSError as e:
+                print(f"Error writing {self.path}: {e}", file=sys.stderr)
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(path: str):
+    """Returns the process-wide buffered writer of a JSONL file."""
+    with _writers_lock:
+        if path not in _writers:
+            _writers[path] = BufferedJsonlWriter(path)
+        return _writers[path]
+
+
+class Telemetry:
+    """
+    Records pipeline spans (stage, file, duration, bytes, tokens...).
+    Spans are aggregated in memory per stage for the Prometheus text export and,
+    with the 'jsonl' exporter, written to TELEMETRY_FILE through a buffered writer.
+    TELEMETRY_EXPORT lists the exporters ('jsonl', 'prometheus' or both, comma separated);
+    'prometheus' serves /metrics on TELEMETRY_METRICS_PORT.
+    """
+
+    def __init__(self, path: str = None, exporters: str = None):
+        exporters = {e.strip() for e in (exporters or os.getenv("TELEMETRY_EXPORT", "jsonl")).lower().split(",") if e.strip()}
+        self.writer = get_writer(path or TELEMETRY_FILE) if "jsonl" in exporters else None
+        self._stages = {}
+        self._lock = threading.Lock()
+        self.metrics_server = None
+        if "prometheus" in exporters and os.getenv("TELEMETRY_METRICS_PORT"):
+            self.metrics_server = serve_metrics(self, os.getenv("TELEMETRY_METRICS_HOST", DEFAULT_METRICS_HOST),
+                                                int(os.getenv("TELEMETRY_METRICS_PORT")))
+
+    def record(self, stage: str, seconds: float, status: str = "ok", file_name: str = None, **fields):
+        with self._lock:
+            metrics = self._stages.get(stage)
+            if metrics is None:
+                metrics = self._stages[stage] = {
+                    "count": {}, "seconds": 0.0, "buckets": [0] * len(DURATION_BUCKETS), **{f: 0 for f in COUNTER_FIELDS}
+                }
+            metrics["count"][status] = metrics["count"].get(status, 0) + 1
+            metrics["seconds"] += seconds
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    metrics["buckets"][i] += 1
+            for field in COUNTER_FIELDS:
+                if isinstance(fields.get(field), (int, float)):
+                    metrics[field] += fields[field]
+        if self.writer is not None:
+            self.writer.write({
+                "timestamp": datetime.now().isoformat(),
+                "stage": stage,
+                "file_name": file_name,
+                "seconds": round(seconds, 6),
+                "status": status,
+                **fields,
+            })
+
+    @contextmanager
+    def span(self, stage: str, file_name: str = None, **fields):
+        """
+        Times the enclosed block as one span of 'stage'. The yielded dict can be
+        filled with fields known only at the end (e.g. span["tokens"] = 120).
+        A block raising an exception, or setting span["status"] = "error", is
+        recorded with status 'error'.
+        Without a 'file_name', the span is keyed by the file of the enclosing span.
+        """
+        file_name = file_name or _current_file.get()
+        token = _current_file.set(file_name)
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield fields
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            _current_file.reset(token)
+            marked = fields.pop("status", status)
+            status = marked if status == "ok" else status
+            self.record(stage, time.perf_counter() - start, status, file_name, **fields)
+
+    def prometheus_text(self):
+        """Renders the per-stage aggregates in the Prometheus text exposition format."""
+        with self._lock:
+            stages = {stage: {**m, "count": dict(m["count"]), "buckets": list(m["buckets"])} for stage, m in self._stages.items()}
+        lines = [
+            "# HELP audio_rag_stage_seconds Duration of the pipeline stage spans.",
+            "# TYPE audio_rag_stage_seconds histogram",
+        ]
+        for stage, m in sorted(stages.items()):
+            for bound, count in zip(DURATION_BUCKETS, m["buckets"]):
+                lines.append(f'audio_rag_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            total = sum(m["count"].values())
+            lines.append(f'audio_rag_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {total}')
+            lines.append(f'audio_rag_stage_seconds_sum{{stage="{stage}"}} {m["seconds"]}')
+            lines.append(f'audio_rag_stage_seconds_count{{stage="{stage}"}} {total}')
+        lines += ["# HELP audio_rag_stage_spans_total Pipeline stage spans by status.", "# TYPE audio_rag_stage_spans_total counter"]
+        for stage, m in sorted(stages.items()):
+            for status, count in sorted(m["count"].items()):
+                lines.append(f'audio_rag_stage_spans_total{{stage="{stage}",status="{status}"}} {count}')
+        for field in COUNTER_FIELDS:
+            lines += [f"# HELP audio_rag_stage_{field}_total Total {field.replace('_', ' ')} processed by the stage.",
+                      f"# TYPE audio_rag_stage_{field}_total counter"]
+            for stage, m in sorted(stages.items()):
+                if m[field]:
+                    lines.append(f'audio_rag_stage_{field}_total{{stage="{stage}"}} {m[field]}')
+        return "\n".join(lines) + "\n"
+
+
+def serve_metrics(telemetry: Telemetry, host: str, port: int):
+    """Serves telemetry.prometheus_text() on http://host:port/metrics from a background thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = telemetry.prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"Warning: could not serve telemetry metrics on {host}:{port}: {e}", file=sys.stderr)
+        return None
+    threading.Thread(target=server.serve_forever, name="telemetry-metrics", daemon=True).start()
+    print(f"Telemetry metrics available on http://{host}:{port}/metrics")
+    return server
+
+
+class _DisabledTelemetry(Telemetry):
+    def __init__(self):
+        self.writer = None
+        self._stages = {}
+        self._lock = threading.Lock()
+        self.metrics_server = None
+
+    def record(self, *args, **kwargs):
+        pass
+
+
+_telemetry = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry():
+    """Returns the process-wide Telemetry instance (a no-op one if TELEMETRY_ENABLED is 'false')."""
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            if os.getenv("TELEMETRY_ENABLED", "true").lower() == "false":
+                _telemetry = _DisabledTelemetry()
+            else:
+                _telemetry = Telemetry()
+        return _telemetry
+
+
+def span(stage: str, file_name: str = None, **fields):
+    """Shortcut for get_telemetry().span()."""
+    return get_telemetry().span(stage, file_name, **fields)
+
+
+def current_file_name():
+    """Returns the file name of the span being run, if any."""
+    return _current_file.get()
+
+
+def summarize(path: str = None):
+    """
+    Reads a telemetry JSONL file and returns (per-stage totals, per-file slowest stage).
+    Stage totals are {"spans", "errors", "seconds", "p95_seconds"}; the slowest
+    stage of a file is the one with the most total time spent on it.
+    """
+    per_stage = {}
+    per_file = {}
+    with open(path or TELEMETRY_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            stage, seconds = event.get("stage"), event.get("seconds", 0.0)
+            totals = per_stage.setdefault(stage, {"spans": 0, "errors": 0, "seconds": 0.0, "durations": []})
+            totals["spans"] += 1
+            totals["errors"] += event.get("status") == "error"
+            totals["seconds"] += seconds
+            totals["durations"].append(seconds)
+            if event.get("file_name"):
+                stages = per_file.setdefault(event["file_name"], {})
+                stages[stage] = stages.get(stage, 0.0) + seconds
+    for totals in per_stage.values():
+        durations = sorted(totals.pop("durations"))
+        totals["p95_seconds"] = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+    slowest = {file_name: max(stages.items(), key=lambda item: item[1]) for file_name, stages in per_file.items()}
+    return per_stage, slowest
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else TELEMETRY_FILE
+    if not os.path.exists(path):
+        print(f"No telemetry found at {path}.", file=sys.stderr)
+        sys.exit(1)
+    per_stage, slowest = summarize(path)
+    print(f"{'stage':<14} {'spans':>7} {'errors':>7} {'total (s)':>10} {'mean (s)':>9} {'p95 (s)':>8}")
+    for stage, totals in sorted(per_stage.items(), key=lambda item: item[1]["seconds"], reverse=True):
+        print(f"{stage:<14} {totals['spans']:>7} {totals['errors']:>7} {totals['seconds']:>10.2f} "
+              f"{totals['seconds'] / totals['spans']:>9.3f} {totals['p95_seconds']:>8.3f}")
+    if slowest:
+        print("\nSlowest stage per file:")
+        for file_name, (stage, seconds) in sorted(slowest.items(), key=lambda item: item[1][1], reverse=True):
+            print(f"  {file_name}: {stage} ({seconds:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
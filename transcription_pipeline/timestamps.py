@@ -0,0 +1,73 @@
+import json
+import os
+import sys
+
+def timeline_path(text_path):
+    """Path of the sidecar file holding the segment timestamps of a transcription."""
+    return os.path.splitext(text_path)[0] + ".segments.json"
+
+def build_timeline(text, segments, media_path=None, language=None, duration_seconds=None):
+    """
+    Builds the timeline of a transcription from its segments, given as
+    {"start", "end", "text"} dicts with times in seconds of the original media.
+    Each segment is located in the transcription text, so any character span
+    of the text (e.g. a chunk) can be mapped back to a time range.
+    The language and duration of the recording are kept when known.
+    """
+    timeline_segments = []
+    cursor = 0
+    for segment in segments:
+        segment_text = segment["text"].strip()
+        char_start = text.find(segment_text, cursor) if segment_text else -1
+        if char_start < 0:
+            # Not found verbatim (e.g. whitespace differences): assume it follows the previous segment
+            char_start = cursor
+        char_end = char_start + len(segment_text)
+        timeline_segments.append({
+            "start": round(segment["start"], 3),
+            "end": round(segment["end"], 3),
+            "char_start": char_start,
+            "char_end": char_end,
+        })
+        cursor = char_end
+    return {
+        "media_path": os.path.abspath(media_path) if media_path else None,
+        "language": language,
+        "duration_seconds": round(duration_seconds, 3) if duration_seconds is not None else None,
+        "segments": timeline_segments,
+    }
+
+def save_timeline(text_path, timeline):
+    with open(timeline_path(text_path), "w", encoding="utf-8") as f:
+        json.dump(timeline, f)
+
+def load_timeline(text_path):
+    """Returns the timeline saved next to a transcription, or None if there is none."""
+    path = timeline_path(text_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error reading timestamps from {path}: {e}", file=sys.stderr)
+        return None
+
+def move_timeline(old_text_path, new_text_path):
+    """Moves the timeline along with its transcription, if there is one."""
+    old_path = timeline_path(old_text_path)
+    if os.path.exists(old_path):
+        os.replace(old_path, timeline_path(new_text_path))
+
+def time_range(timeline, char_start, char_end):
+    """
+    Returns the (start_seconds, end_seconds) covered by a character span of the
+    transcription, or None if no segment overlaps it.
+    """
+    overlapping = [
+        segment for segment in timeline["segments"]
+        if segment["char_start"] < char_end and segment["char_end"] > char_start
+    ]
+    if not overlapping:
+        return None
+    return min(s["start"] for s in overlapping), max(s["end"] for s in overlapping)
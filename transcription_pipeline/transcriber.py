@@ -1,7 +1,11 @@
 import subprocess
 import sys
 import os
+import math
+import random
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
 from dotenv import load_dotenv
 
@@ -9,7 +13,30 @@ load_dotenv() # Load variables from .env file
 
 import google.generativeai as genai
 from .logger import log_api_usage
-from .utils import get_audio_duration
+from .telemetry import span
+from .utils import get_audio_duration, estimate_transcription_cost, bounded_map
+from .cache import make_cache_key
+from .segmenter import split_audio_on_silence, remove_segments, merge_segment_results
+from .streaming import PcmSegmentStream, SAMPLE_RATE, SAMPLE_BYTES
+from .timestamps import build_timeline, save_timeline
+
+# OpenAI rejects uploads above 25 MB
+DEFAULT_MAX_SEGMENT_MB = 24
+# Streamed segments are uncompressed (about 1.9 MB per minute), 5 minutes stay well below the limit
+DEFAULT_STREAM_SEGMENT_SECONDS = 300
+# The audio is sped up before transcription (AUDIO_TEMPO); timestamps are scaled back by this factor
+DEFAULT_AUDIO_TEMPO = 2.0
+# FFmpeg encoding per AUDIO_PROFILE: 'speech' is 16 kHz mono Opus, 'pcm' 16 kHz mono WAV,
+# 'standard' the 44.1 kHz stereo MP3 used before profiles existed
+AUDIO_PROFILES = {
+    "speech": {"extension": "ogg", "args": ['-ar', '16000', '-ac', '1', '-c:a', 'libopus', '-b:a', '24k', '-application', 'voip']},
+    "pcm": {"extension": "wav", "args": ['-ar', '16000', '-ac', '1', '-c:a', 'pcm_s16le']},
+    "standard": {"extension": "mp3", "args": ['-ar', '44100', '-ac', '2', '-b:a', '192k']},
+}
+# Pauses longer than this are shortened when AUDIO_TRIM_SILENCE is enabled
+TRIM_SILENCE_SECONDS = 1.0
+# Models returning segment-level timestamps (response_format='verbose_json')
+TIMESTAMP_MODELS = ("whisper-1",)
 
 def select_file_applescript():
     """
@@ -51,9 +78,86 @@ def select_file():
 
 
 
-def convert_to_audio(video_path, temp_dir):
+def get_audio_tempo():
+    """Speed-up applied to the audio before transcription (AUDIO_TEMPO, 1.0 disables it)."""
+    value = os.getenv("AUDIO_TEMPO", DEFAULT_AUDIO_TEMPO)
+    try:
+        tempo = float(value)
+    except (TypeError, ValueError):
+        tempo = None
+    if tempo is None or not math.isfinite(tempo) or tempo <= 0:
+        raise ValueError(f"Invalid AUDIO_TEMPO: {value}. Please set AUDIO_TEMPO to a positive number (e.g. 1.5, or 1.0 to disable it).")
+    return tempo
+
+def get_audio_profile(profile=None):
+    """Returns the name and settings of the encoding profile selected by AUDIO_PROFILE."""
+    profile = (profile or os.getenv("AUDIO_PROFILE", "speech")).lower()
+    if profile not in AUDIO_PROFILES:
+        raise ValueError(f"Unknown AUDIO_PROFILE: {profile}. Please set AUDIO_PROFILE to one of: {', '.join(AUDIO_PROFILES)}.")
+    return profile, AUDIO_PROFILES[profile]
+
+def trim_silence_enabled():
+    return os.getenv("AUDIO_TRIM_SILENCE", "false").lower() == "true"
+
+def get_audio_filters():
+    """FFmpeg audio filter chain: tempo change, then optional pause trimming and loudness normalization."""
+    filters = []
+    tempo = get_audio_tempo()
+    # Older FFmpeg builds limit atempo to 0.5-2.0, so factors outside it are chained
+    while tempo > 2.0:
+        filters.append('atempo=2.0')
+        tempo /= 2.0
+    while tempo < 0.5:
+        filters.append('atempo=0.5')
+        tempo /= 0.5
+    if tempo != 1.0:
+        filters.append(f'atempo={tempo:g}')
+    if trim_silence_enabled():
+        filters.append(f'silenceremove=stop_periods=-1:stop_duration={TRIM_SILENCE_SECONDS}:stop_threshold=-40dB')
+    if os.getenv("AUDIO_NORMALIZE", "false").lower() == "true":
+        filters.append('loudnorm=I=-16:TP=-1.5:LRA=11')
+    return filters
+
+def get_audio_conversion_args(profile=None):
+    """
+    Returns the FFmpeg arguments used to extract audio from the source file.
+    They are also part of the transcription cache key.
+    """
+    args = []
+    # If DEV_MODE is active, process only the first 30 seconds
+    if os.getenv('DEV_MODE') == 'true':
+        args.extend(['-t', '30'])
+    args.append('-vn')
+    filters = get_audio_filters()
+    if filters:
+        args.extend(['-filter:a', ','.join(filters)])
+    args.extend(get_audio_profile(profile)[1]["args"])
+    return args
+
+def streaming_enabled():
+    """TRANSCRIPTION_STREAMING: transcribe FFmpeg's output as it is decoded, without a temporary audio file."""
+    return os.getenv("TRANSCRIPTION_STREAMING", "false").lower() == "true"
+
+def get_stream_conversion_args():
+    """
+    FFmpeg arguments of the streaming path: the same filters as get_audio_conversion_args,
+    decoded to raw 16 kHz mono PCM instead of an encoded file.
+    """
+    args = []
+    if os.getenv('DEV_MODE') == 'true':
+        args.extend(['-t', '30'])
+    args.append('-vn')
+    filters = get_audio_filters()
+    if filters:
+        args.extend(['-filter:a', ','.join(filters)])
+    args.extend(['-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE)])
+    return args
+
+def convert_to_audio(video_path, temp_dir, job_id=None, profile=None):
     """
-    Converts the video file to an MP3 audio file using FFmpeg.
+    Converts the video file to an audio file using FFmpeg, encoded with the
+    AUDIO_PROFILE settings (or 'profile').
+    If a job_id is given, it is used to name the temporary audio file.
     """
     if not video_path:
         print("No video file provided for conversion.")
@@ -61,31 +165,22 @@ def convert_to_audio(video_path, temp_dir):
     try:
         base_name = os.path.basename(video_path)
         file_name_without_ext = os.path.splitext(base_name)[0]
-        unique_id = uuid.uuid4().hex[:8]
-        output_audio_path = os.path.join(temp_dir, f"{file_name_without_ext}_{unique_id}.mp3")
+        unique_id = job_id or uuid.uuid4().hex[:8]
+        extension = get_audio_profile(profile)[1]["extension"]
+        output_audio_path = os.path.join(temp_dir, f"{file_name_without_ext}_{unique_id}.{extension}")
         print(f"\nStarting conversion of '{base_name}' to audio...")
-        # Base FFmpeg command
-        command = [
-            'ffmpeg',
-            '-i', video_path,
-        ]
-
-        # If DEV_MODE is active, process only the first 30 seconds
         if os.getenv('DEV_MODE') == 'true':
             print("\nDEV mode active: audio file will be limited to the first 30 seconds of the video.")
-            command.extend(['-t', '30'])
-
-        # Add remaining parameters for audio conversion
-        command.extend([
-            '-vn',
-            '-filter:a', 'atempo=2.0',
-            '-ar', '44100',
-            '-ac', '2',
-            '-b:a', '192k',
-            '-y',
-            output_audio_path
-        ])
-        proc = subprocess.run(command, capture_output=True, text=True)
+
+        command = ['ffmpeg', '-i', video_path]
+        command.extend(get_audio_conversion_args(profile))
+        command.extend(['-y', output_audio_path])
+        with span("ffmpeg", base_name, profile=get_audio_profile(profile)[0]) as conversion:
+            proc = subprocess.run(command, capture_output=True, text=True)
+            if proc.returncode == 0:
+                conversion["bytes"] = os.path.getsize(output_audio_path)
+            else:
+                conversion["status"] = "error"
         if proc.returncode == 0:
             print(f"Conversion completed successfully!")
             print(f"Audio file saved to: {output_audio_path}")
@@ -98,6 +193,53 @@ def convert_to_audio(video_path, temp_dir):
         print(f"An unexpected error occurred during conversion: {e}", file=sys.stderr)
         return None
 
+def get_transcription_engine_type():
+    """Returns the engine selected by TRANSCRIPTION_ENGINE: 'openai' (default) or 'local'."""
+    return os.getenv("TRANSCRIPTION_ENGINE", "openai").lower()
+
+def get_transcription_model():
+    """Identifies the configured engine and model (e.g. 'gpt-4o-transcribe' or 'faster-whisper:base')."""
+    if get_transcription_engine_type() == "local":
+        return f"faster-whisper:{os.getenv('TRANSCRIPTION_LOCAL_MODEL', 'base')}"
+    return os.getenv("OPENAI_TRANSCRIPTION_MODEL", "gpt-4o-transcribe")
+
+def transcription_cache_key(source_path, cache):
+    """Cache key of a source file: media hash + FFmpeg parameters + transcription model."""
+    conversion_args = get_stream_conversion_args() if streaming_enabled() else get_audio_conversion_args()
+    return make_cache_key(cache.hash_source(source_path), conversion_args, get_transcription_model())
+
+def load_cached_transcription(cache, cache_key, transcriptions_dir, original_file_name, job_id=None, media_path=None):
+    """
+    Looks up a transcription in the cache. On a hit the text is written to a
+    temporary file, as transcribe_audio_api does, and (text, temp_path) is returned.
+    """
+    transcribed_text = cache.get(cache_key, original_file_name)
+    if transcribed_text is None:
+        return None
+    print(f"Cached transcription found for '{original_file_name}', skipping conversion and transcription.")
+    timing = cache.get_timing(cache_key)
+    return transcribed_text, save_temp_transcription(transcribed_text, transcriptions_dir, job_id, timing=timing, media_path=media_path)
+
+def save_temp_transcription(transcribed_text, transcriptions_dir, job_id=None, timing=None, media_path=None):
+    """
+    Saves the transcribed text to a temporary file for title generation.
+    The final filename will be decided after title generation.
+    'timing' holds the segment timestamps, language and duration of the recording;
+    if given, they are saved next to the text (see timestamps.py).
+    """
+    # A unique suffix (the job ID when available) keeps concurrent runs from overwriting each other
+    unique_id = job_id or uuid.uuid4().hex[:8]
+    temp_text_path = os.path.join(transcriptions_dir, f"temp_transcription_{unique_id}.txt")
+    with open(temp_text_path, 'w', encoding='utf-8') as f:
+        f.write(transcribed_text)
+    if timing and timing.get("segments"):
+        timeline = build_timeline(
+            transcribed_text, timing["segments"], media_path,
+            language=timing.get("language"), duration_seconds=timing.get("duration_seconds")
+        )
+        save_timeline(temp_text_path, timeline)
+    return temp_text_path
+
 def generate_title_with_gemini(transcription_text, original_file_name):
     """Generates a title for the transcription using the Gemini API."""
     if not transcription_text:
@@ -119,20 +261,25 @@ Transcription:
 {transcription_text}"""
 
         print("\nRequesting title generation from Gemini...")
-        response = model.generate_content(prompt)
-        title = response.text.strip()
-
-        # Log Gemini API usage
-        input_tokens_gemini = 0
-        output_tokens_gemini = 0
-        total_tokens_gemini = 0
-
-        if hasattr(response, 'usage_metadata'):
-            usage = response.usage_metadata
-            input_tokens_gemini = usage.prompt_token_count
-            output_tokens_gemini = usage.candidates_token_count
-            total_tokens_gemini = usage.total_token_count
-        log_api_usage(original_file_name, "Gemini", "title_generation", input_tokens_gemini, output_tokens_gemini, total_tokens_gemini)
+        with span("titling", original_file_name) as titling:
+            start = time.perf_counter()
+            response = model.generate_content(prompt)
+            latency = time.perf_counter() - start
+            title = response.text.strip()
+
+            # Log Gemini API usage
+            input_tokens_gemini = 0
+            output_tokens_gemini = 0
+            total_tokens_gemini = 0
+
+            if hasattr(response, 'usage_metadata'):
+                usage = response.usage_metadata
+                input_tokens_gemini = usage.prompt_token_count
+                output_tokens_gemini = usage.candidates_token_count
+                total_tokens_gemini = usage.total_token_count
+            titling["tokens"] = total_tokens_gemini
+        log_api_usage(original_file_name, "Gemini", "title_generation", input_tokens_gemini, output_tokens_gemini, total_tokens_gemini,
+                      latency_seconds=latency)
 
         # Post-process the title to ensure snake_case
         title = title.lower() # Convert to lowercase
@@ -148,46 +295,295 @@ Transcription:
         return None
 
 
-# Modify the transcribe_audio_api function to return the transcribed text
-def transcribe_audio_api(audio_path, transcriptions_dir, original_file_name):
-    """Transcribes the audio file using the OpenAI API and saves the text."""
+def _is_retryable(error):
+    """Client errors are permanent, except for timeouts, conflicts and rate limits."""
+    status = getattr(error, "status_code", None)
+    if status is not None and 400 <= status < 500:
+        return status in (408, 409, 429)
+    return True
+
+
+def request_transcription(client, audio, model):
+    """
+    Transcribes an audio file in a single API call.
+    'audio' is a file path or an in-memory (file_name, bytes) tuple.
+    Returns (text, segments, language); segments are {"start", "end", "text"} dicts
+    with times relative to the file. Segments and language are None if the model
+    does not return them.
+    """
+    audio_file = audio if isinstance(audio, tuple) else open(audio, "rb")
+    try:
+        if model in TIMESTAMP_MODELS:
+            transcription = client.audio.transcriptions.create(model=model, file=audio_file, response_format="verbose_json")
+        else:
+            transcription = client.audio.transcriptions.create(model=model, file=audio_file)
+    finally:
+        if not isinstance(audio, tuple):
+            audio_file.close()
+    segments = getattr(transcription, "segments", None)
+    if segments:
+        segments = [{"start": s.start, "end": s.end, "text": s.text.strip()} for s in segments]
+    return transcription.text, segments or None, getattr(transcription, "language", None)
+
+
+def transcribe_segment(client, segment, model, max_retries=4, base_delay=1.0):
+    """
+    Transcribes a single audio segment, retrying transient failures with
+    exponential backoff and jitter.
+    The result includes the timestamped sub-segments returned by the model,
+    offset to the position of the segment in the audio.
+    """
+    attempt = 0
+    while True:
+        try:
+            audio = segment["path"] if "path" in segment else (segment["name"], segment["data"])
+            text, sub_segments, language = request_transcription(client, audio, model)
+            text = text.strip()
+            if sub_segments:
+                sub_segments = [
+                    {"start": segment["start"] + s["start"], "end": segment["start"] + s["end"], "text": s["text"]}
+                    for s in sub_segments
+                ]
+            else:
+                sub_segments = [{"start": segment["start"], "end": segment["end"], "text": text}]
+            return {
+                "index": segment["index"],
+                "start": segment["start"],
+                "end": segment["end"],
+                "text": text,
+                "segments": sub_segments,
+                "language": language,
+            }
+        except Exception as e:
+            if attempt >= max_retries or not _is_retryable(e):
+                raise
+            delay = base_delay * (2 ** attempt) + random.uniform(0, base_delay)
+            print(f"Segment {segment['index']} failed ({e}), retrying in {delay:.1f}s...", file=sys.stderr)
+            time.sleep(delay)
+            attempt += 1
+
+
+def transcribe_audio_segmented(audio_path, temp_dir, client=None, max_segment_bytes=None, max_workers=None):
+    """
+    Splits the audio at silence boundaries into size-bounded segments and
+    transcribes them concurrently through a bounded worker pool.
+    Returns the stitched text and the ordered list of segments with their
+    time offsets (seconds), or None on failure.
+    """
+    if client is None:
+        client = OpenAI()
+    if max_segment_bytes is None:
+        max_segment_bytes = int(float(os.getenv("TRANSCRIPTION_MAX_SEGMENT_MB", DEFAULT_MAX_SEGMENT_MB)) * 1024 * 1024)
+    if max_workers is None:
+        max_workers = int(os.getenv("TRANSCRIPTION_WORKERS", "4"))
+    model = os.getenv("OPENAI_TRANSCRIPTION_MODEL", "gpt-4o-transcribe")
+
+    segments = split_audio_on_silence(audio_path, temp_dir, max_segment_bytes)
+    if not segments:
+        return None
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            results = list(executor.map(lambda segment: transcribe_segment(client, segment, model), segments))
+    finally:
+        remove_segments(segments, keep=audio_path)
+
+    results.sort(key=lambda r: r["index"])
+    text = "\n".join(r["text"] for r in results if r["text"])
+    return text, results
+
+
+def _use_segmented_mode(audio_path):
+    """Reads TRANSCRIPTION_SEGMENTED: 'true', 'false' or 'auto' (split only files above the size limit)."""
+    mode = os.getenv("TRANSCRIPTION_SEGMENTED", "auto").lower()
+    if mode in ("true", "false"):
+        return mode == "true"
+    max_segment_bytes = float(os.getenv("TRANSCRIPTION_MAX_SEGMENT_MB", DEFAULT_MAX_SEGMENT_MB)) * 1024 * 1024
+    return os.path.getsize(audio_path) > max_segment_bytes
+
+
+class OpenAITranscriptionEngine:
+    """
+    Transcription engine using the OpenAI API. Long recordings are split and
+    transcribed in parallel (see transcribe_audio_segmented).
+    A custom client (e.g. a local stub) can be passed in place of the OpenAI one.
+    """
+
+    provider = "OpenAI"
+
+    def __init__(self, client=None):
+        if client is None:
+            if not os.getenv("OPENAI_API_KEY"):
+                raise ValueError("OPENAI_API_KEY environment variable is not set. Please set it with: export OPENAI_API_KEY='YOUR_API_KEY'")
+            client = OpenAI()
+        self.client = client
+        self.model = os.getenv("OPENAI_TRANSCRIPTION_MODEL", "gpt-4o-transcribe")
+        self.workers = int(os.getenv("TRANSCRIPTION_WORKERS", "4"))
+        self.stream_segment_seconds = float(os.getenv("TRANSCRIPTION_STREAM_SEGMENT_SECONDS", DEFAULT_STREAM_SEGMENT_SECONDS))
+
+    def estimate_cost(self, duration_seconds):
+        return estimate_transcription_cost(duration_seconds)
+
+    def transcribe(self, audio_path, segmented=None):
+        """Returns (text, segments, language), as request_transcription does."""
+        if segmented is None:
+            segmented = _use_segmented_mode(audio_path)
+        if not segmented:
+            print(f"\nSending '{os.path.basename(audio_path)}' to OpenAI API for transcription...")
+            return request_transcription(self.client, audio_path, self.model)
+
+        print(f"\nSending '{os.path.basename(audio_path)}' to OpenAI API for segmented transcription...")
+        result = transcribe_audio_segmented(audio_path, os.path.dirname(audio_path), client=self.client)
+        if result is None:
+            raise RuntimeError("Segmented transcription failed.")
+        transcribed_text, results = result
+        segments = [s for r in results for s in r["segments"]]
+        language = next((r["language"] for r in results if r["language"]), None)
+        return transcribed_text, segments, language
+
+    def transcribe_stream(self, segments):
+        """
+        Transcribes in-memory segments as they are produced (see streaming.PcmSegmentStream),
+        with at most one pending segment per worker. Returns (text, segments, language).
+        """
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            results = bounded_map(executor, lambda segment: transcribe_segment(self.client, segment, self.model), segments, max(1, self.workers))
+        return merge_segment_results(results)
+
+
+_shared_engines = {}
+
+def load_transcription_engine(engine_type: str = None):
+    """
+    Returns the transcription engine selected by TRANSCRIPTION_ENGINE ('openai' or 'local').
+    Engines provide 'provider', 'model', 'stream_segment_seconds', estimate_cost(seconds),
+    transcribe(audio_path, segmented=None) and transcribe_stream(segments), both
+    returning (text, segments, language).
+    The local engine keeps its worker processes (and loaded models) for the
+    whole run, so it is created once per process.
+    Raises ValueError if the configuration is invalid and ImportError if the
+    local backend is not installed.
+    """
+    engine_type = engine_type or get_transcription_engine_type()
+    if engine_type == "openai":
+        return OpenAITranscriptionEngine()
+    if engine_type == "local":
+        if "local" not in _shared_engines:
+            from .local_whisper import LocalWhisperEngine
+            _shared_engines["local"] = LocalWhisperEngine()
+        return _shared_engines["local"]
+    raise ValueError(f"Unknown TRANSCRIPTION_ENGINE: {engine_type}. Please set TRANSCRIPTION_ENGINE to 'openai' or 'local'.")
+
+
+def _complete_transcription(engine, transcribed_text, segments, language, audio_duration, transcriptions_dir, original_file_name,
+                            cache=None, cache_key=None, job_id=None, media_path=None, latency_seconds=None):
+    """
+    Logs the cost and latency of a transcription, converts its timestamps to the original media time,
+    stores it in the cache and saves it to a temporary file.
+    Returns (text, temp_path).
+    """
+    # Calculate estimated cost based on audio duration
+    estimated_cost = 0.0
+    if audio_duration is not None:
+        estimated_cost = engine.estimate_cost(audio_duration)
+        if segments is None:
+            segments = [{"start": 0.0, "end": audio_duration, "text": transcribed_text}]
+
+    log_api_usage(original_file_name, engine.provider, "transcription", estimated_cost=estimated_cost,
+                  latency_seconds=latency_seconds, audio_seconds=audio_duration)
+
+    # Timestamps of the sped-up audio, converted back to the original media time.
+    # Trimmed pauses make them drift from the recording, so they are dropped then.
+    tempo = get_audio_tempo()
+    if trim_silence_enabled():
+        segments = []
+    segments = [
+        {"start": s["start"] * tempo, "end": s["end"] * tempo, "text": s["text"]}
+        for s in segments or []
+    ]
+
+    timing = {
+        "segments": segments,
+        "language": language,
+        "duration_seconds": audio_duration * tempo if audio_duration is not None and not trim_silence_enabled() else None,
+    }
+
+    if cache is not None and cache_key is not None:
+        cache.put(cache_key, transcribed_text, audio_duration, timing=timing, provider=engine.provider)
+
+    temp_text_path = save_temp_transcription(transcribed_text, transcriptions_dir, job_id, timing=timing, media_path=media_path)
+
+    print(f"Transcription completed successfully! Text saved temporarily.")
+    return transcribed_text, temp_text_path # Returns the text and temporary path
+
+
+def transcribe_audio_api(audio_path, transcriptions_dir, original_file_name, client=None, segmented=None, cache=None, cache_key=None, job_id=None,
+                         media_path=None, engine=None):
+    """
+    Transcribes the audio file with the configured engine (see load_transcription_engine) and saves the text.
+    A custom OpenAI client (e.g. a local stub) or engine can be passed in place of the configured one.
+    If a cache and cache_key are given, the result is stored in the transcription cache.
+    Segment timestamps, scaled back to the time of the original media
+    ('media_path'), are saved next to the text.
+    """
     if not audio_path:
         print("No audio file provided for transcription.")
         return None
     try:
-        if not os.getenv("OPENAI_API_KEY"):
-            print("Error: OPENAI_API_KEY environment variable is not set.", file=sys.stderr)
-            print("Please set it with: export OPENAI_API_KEY='YOUR_API_KEY'", file=sys.stderr)
-            return None
-        client = OpenAI()
-        print(f"\nSending '{os.path.basename(audio_path)}' to OpenAI API for transcription...")
-        with open(audio_path, "rb") as audio_file:
-            transcription = client.audio.transcriptions.create(
-                model=os.getenv("OPENAI_TRANSCRIPTION_MODEL", "gpt-4o-transcribe"),
-                file=audio_file
-            )
-        transcribed_text = transcription.text
-
-        # Calculate estimated cost based on audio duration
-        audio_duration = get_audio_duration(audio_path)
-        estimated_cost = 0.0
-        if audio_duration is not None:
-            # OpenAI Whisper API cost: $0.006 / minute
-            estimated_cost = (audio_duration / 60) * 0.006
-
-        log_api_usage(original_file_name, "OpenAI", "transcription", estimated_cost=estimated_cost)
-        
-        # Save the transcribed text to a temporary file for title generation
-        # The final filename will be decided after title generation
-        temp_text_path = os.path.join(transcriptions_dir, "temp_transcription.txt")
-        with open(temp_text_path, 'w', encoding='utf-8') as f:
-            f.write(transcribed_text)
-
-        print(f"API transcription completed successfully! Text saved temporarily.")
-        return transcribed_text, temp_text_path # Returns the text and temporary path
+        if engine is None:
+            engine = OpenAITranscriptionEngine(client) if client is not None else load_transcription_engine()
+    except (ValueError, ImportError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return None
+    try:
+        audio_duration = get_audio_duration(audio_path, original_file_name)
+        with span("transcription", original_file_name, provider=engine.provider, bytes=os.path.getsize(audio_path),
+                  audio_seconds=audio_duration):
+            start = time.perf_counter()
+            transcribed_text, segments, language = engine.transcribe(audio_path, segmented=segmented)
+            latency = time.perf_counter() - start
+
+        return _complete_transcription(
+            engine, transcribed_text, segments, language, audio_duration, transcriptions_dir, original_file_name,
+            cache=cache, cache_key=cache_key, job_id=job_id, media_path=media_path, latency_seconds=latency
+        )
+
+    except Exception as e:
+        print(f"An unexpected error occurred during transcription: {e}", file=sys.stderr)
+        return None
+
 
+def transcribe_media_stream(media_path, transcriptions_dir, original_file_name, cache=None, cache_key=None, job_id=None, engine=None):
+    """
+    Streaming alternative to convert_to_audio + transcribe_audio_api: FFmpeg
+    decodes the media to PCM on a pipe, which is cut into in-memory WAV segments
+    handed to the engine as they are produced. No audio file is written,
+    transcription starts before decoding ends, and the duration comes from the
+    decoded sample count instead of an ffprobe call.
+    Returns (text, temp_path), or None on failure.
+    """
+    try:
+        engine = engine or load_transcription_engine()
+    except (ValueError, ImportError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return None
+    try:
+        command = ['ffmpeg', '-nostdin', '-v', 'error', '-i', media_path] + get_stream_conversion_args() + ['pipe:1']
+        stream = PcmSegmentStream(command, engine.stream_segment_seconds)
+        print(f"\nStreaming '{os.path.basename(media_path)}' to {engine.provider} ({engine.model}) for transcription...")
+        with span("transcription", original_file_name, provider=engine.provider, streaming=True) as transcription:
+            start = time.perf_counter()
+            transcribed_text, segments, language = engine.transcribe_stream(stream)
+            latency = time.perf_counter() - start
+            # Decoding overlaps transcription here, so FFmpeg gets no span of its own
+            transcription["audio_seconds"] = stream.duration_seconds
+            transcription["bytes"] = stream.samples * SAMPLE_BYTES
+        return _complete_transcription(
+            engine, transcribed_text, segments, language, stream.duration_seconds, transcriptions_dir, original_file_name,
+            cache=cache, cache_key=cache_key, job_id=job_id, media_path=media_path, latency_seconds=latency
+        )
     except Exception as e:
-        print(f"An unexpected error occurred during API transcription: {e}", file=sys.stderr)
+        print(f"An unexpected error occurred during streaming transcription: {e}", file=sys.stderr)
         return None
 
 
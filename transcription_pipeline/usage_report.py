@@ -0,0 +1,289 @@
+import argparse
+import glob
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+
+from .logger import LOG_FILE
+
+DEFAULT_ROLLUP_PATH = os.path.join(os.getcwd(), "logs", "api_usage_rollups.sqlite3")
+# Latencies are kept as histograms with logarithmic buckets (10% wide from
+# 10 ms), so percentiles can be computed from merged daily rollups
+LATENCY_MIN_SECONDS = 0.01
+LATENCY_GROWTH = 1.1
+GROUPINGS = ("day", "provider", "file")
+
+
+def latency_bucket(seconds):
+    if seconds <= LATENCY_MIN_SECONDS:
+        return 0
+    return int(math.log(seconds / LATENCY_MIN_SECONDS) / math.log(LATENCY_GROWTH)) + 1
+
+
+class UsageAggregate:
+    """Totals of a group of API usage entries: calls, cost, tokens, audio and a latency histogram."""
+
+    def __init__(self):
+        self.entries = 0
+        self.cost = 0.0
+        self.avoided_cost = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.total_tokens = 0
+        self.audio_seconds = 0.0
+        self.latencies = {}
+
+    def add_entry(self, entry: dict):
+        self.entries += 1
+        self.cost += entry.get("estimated_cost") or 0.0
+        self.avoided_cost += entry.get("avoided_cost") or 0.0
+        self.input_tokens += entry.get("input_tokens") or 0
+        self.output_tokens += entry.get("output_tokens") or 0
+        self.total_tokens += entry.get("total_tokens") or 0
+        self.audio_seconds += entry.get("audio_seconds") or 0.0
+        if entry.get("latency_seconds") is not None:
+            bucket = latency_bucket(entry["latency_seconds"])
+            self.latencies[bucket] = self.latencies.get(bucket, 0) + 1
+
+    def merge(self, other):
+        self.entries += other.entries
+        self.cost += other.cost
+        self.avoided_cost += other.avoided_cost
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.total_tokens += other.total_tokens
+        self.audio_seconds += other.audio_seconds
+        for bucket, count in other.latencies.items():
+            self.latencies[bucket] = self.latencies.get(bucket, 0) + count
+
+    def percentile(self, q):
+        """Approximate latency percentile (0 < q <= 1) in seconds, or None if no latency was logged."""
+        total = sum(self.latencies.values())
+        if not total:
+            return None
+        seen = 0
+        for bucket in sorted(self.latencies):
+            seen += self.latencies[bucket]
+            if seen >= q * total:
+                break
+        # Geometric middle of the bucket
+        return LATENCY_MIN_SECONDS * LATENCY_GROWTH ** max(bucket - 0.5, 0)
+
+    def to_row(self):
+        return (self.entries, self.cost, self.avoided_cost, self.input_tokens, self.output_tokens, self.total_tokens,
+                self.audio_seconds, json.dumps(self.latencies))
+
+    @classmethod
+    def from_row(cls, row):
+        aggregate = cls()
+        (aggregate.entries, aggregate.cost, aggregate.avoided_cost, aggregate.input_tokens, aggregate.output_tokens,
+         aggregate.total_tokens, aggregate.audio_seconds, latencies) = row
+        aggregate.latencies = {int(bucket): count for bucket, count in json.loads(latencies).items()}
+        return aggregate
+
+
+def entry_key(entry: dict):
+    """Rollup key of a log entry: (day, provider, operation, file_name)."""
+    return (entry.get("timestamp", "")[:10], entry.get("api_provider") or "", entry.get("operation") or "", entry.get("file_name") or "")
+
+
+def iter_log_entries(log_path: str):
+    """Streams the entries of a JSONL usage log, skipping malformed lines."""
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+class UsageRollups:
+    """
+    SQLite store of daily API usage rollups, one row per day, provider,
+    operation and file. rotate() moves the raw JSONL log into it.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.getenv("USAGE_ROLLUP_PATH", DEFAULT_ROLLUP_PATH)
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rollups (
+                    day TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    operation TEXT NOT NULL,
+                    file_name TEXT NOT NULL,
+                    entries INTEGER NOT NULL,
+                    cost REAL NOT NULL,
+                    avoided_cost REAL NOT NULL,
+                    input_tokens INTEGER NOT NULL,
+                    output_tokens INTEGER NOT NULL,
+                    total_tokens INTEGER NOT NULL,
+                    audio_seconds REAL NOT NULL,
+                    latencies TEXT NOT NULL,
+                    PRIMARY KEY (day, provider, operation, file_name)
+                )
+            """)
+            # Log segments already rolled up, so a rotation interrupted before deleting one does not count it twice
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rolled_segments (
+                    name TEXT PRIMARY KEY,
+                    entries INTEGER NOT NULL,
+                    rolled_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def iter_rows(self, since: str = None, until: str = None):
+        """Yields ((day, provider, operation, file_name), UsageAggregate) for the rollups between the given days."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "SELECT day, provider, operation, file_name, entries, cost, avoided_cost, input_tokens, output_tokens, "
+                "total_tokens, audio_seconds, latencies FROM rollups WHERE day >= ? AND day <= ?",
+                (since or "", until or "9999-99-99")
+            )
+            for row in cursor:
+                yield tuple(row[:4]), UsageAggregate.from_row(row[4:])
+
+    def add_segment(self, segment_path: str):
+        """
+        Rolls up a log segment and records it in a single transaction.
+        Returns the number of entries rolled up (0 if the segment was already rolled up).
+        """
+        name = os.path.basename(segment_path)
+        groups = {}
+        entries = 0
+        for entry in iter_log_entries(segment_path):
+            groups.setdefault(entry_key(entry), UsageAggregate()).add_entry(entry)
+            entries += 1
+        with self._connect() as conn:
+            if conn.execute("SELECT 1 FROM rolled_segments WHERE name = ?", (name,)).fetchone():
+                return 0
+            for key, aggregate in groups.items():
+                row = conn.execute(
+                    "SELECT entries, cost, avoided_cost, input_tokens, output_tokens, total_tokens, audio_seconds, latencies "
+                    "FROM rollups WHERE day = ? AND provider = ? AND operation = ? AND file_name = ?", key
+                ).fetchone()
+                if row:
+                    existing = UsageAggregate.from_row(row)
+                    existing.merge(aggregate)
+                    aggregate = existing
+                conn.execute("INSERT OR REPLACE INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", key + aggregate.to_row())
+            conn.execute("INSERT INTO rolled_segments VALUES (?, ?, ?)", (name, entries, time.time()))
+        return entries
+
+    def rotate(self, log_path: str = None):
+        """
+        Moves the current usage log aside and compacts it into the daily rollups,
+        then deletes it. New entries go to a fresh log meanwhile.
+        Segments left over by an interrupted rotation are rolled up first.
+        Returns the number of entries rolled up.
+        """
+        log_path = log_path or LOG_FILE
+        if os.path.exists(log_path) and os.path.getsize(log_path) > 0:
+            # Segments are recorded by name once rolled up, so each rotation needs a name of its own
+            os.replace(log_path, f"{log_path}.{time.time_ns()}.rolling")
+        entries = 0
+        for segment_path in sorted(glob.glob(f"{log_path}.*.rolling")):
+            entries += self.add_segment(segment_path)
+            os.remove(segment_path)
+        return entries
+
+
+def group_key(grouping: str, key: tuple):
+    day, provider, operation, file_name = key
+    if grouping == "day":
+        return day
+    if grouping == "provider":
+        return f"{provider} {operation}"
+    return file_name
+
+
+def usage_report(groupings=GROUPINGS, since: str = None, until: str = None, log_path: str = None, rollups: UsageRollups = None):
+    """
+    Aggregates API usage by 'day', 'provider' (provider and operation) and/or 'file',
+    from the daily rollups and the entries still in the raw log, which is
+    streamed once for all groupings. 'since' and 'until' are inclusive YYYY-MM-DD days.
+    Returns {grouping: {group: UsageAggregate}}.
+    """
+    log_path = log_path or LOG_FILE
+    rollups = rollups or UsageRollups()
+    report = {grouping: {} for grouping in groupings}
+
+    def add(key, aggregate=None, entry=None):
+        for grouping, groups in report.items():
+            group = groups.setdefault(group_key(grouping, key), UsageAggregate())
+            if entry is not None:
+                group.add_entry(entry)
+            else:
+                group.merge(aggregate)
+
+    for key, aggregate in rollups.iter_rows(since, until):
+        add(key, aggregate=aggregate)
+    if os.path.exists(log_path):
+        for entry in iter_log_entries(log_path):
+            key = entry_key(entry)
+            if (since and key[0] < since) or (until and key[0] > until):
+                continue
+            add(key, entry=entry)
+    return report
+
+
+def _format_seconds(seconds):
+    return f"{seconds:.2f}" if seconds is not None else "-"
+
+
+def print_usage_report(grouping: str, groups: dict, limit: int = None):
+    if grouping == "day":
+        ordered = sorted(groups.items())
+    else:
+        # Most expensive first
+        ordered = sorted(groups.items(), key=lambda item: (item[1].cost, item[1].total_tokens, item[1].audio_seconds), reverse=True)
+    shown = ordered[:limit] if limit else ordered
+    width = min(max([len(grouping)] + [len(str(key)) for key, _ in shown]), 48)
+    print(f"\nUsage by {grouping}")
+    print(f"{grouping:<{width}} {'calls':>7} {'cost ($)':>9} {'avoided ($)':>11} {'tokens':>9} {'audio min':>9} {'p50 (s)':>8} {'p95 (s)':>8}")
+    for key, aggregate in shown:
+        print(f"{str(key)[:width]:<{width}} {aggregate.entries:>7} {aggregate.cost:>9.4f} {aggregate.avoided_cost:>11.4f} "
+              f"{aggregate.total_tokens:>9} {aggregate.audio_seconds / 60:>9.1f} "
+              f"{_format_seconds(aggregate.percentile(0.5)):>8} {_format_seconds(aggregate.percentile(0.95)):>8}")
+    if len(ordered) > len(shown):
+        print(f"... {len(ordered) - len(shown)} more (use --limit 0 to show all)")
+    total = UsageAggregate()
+    for aggregate in groups.values():
+        total.merge(aggregate)
+    print(f"{'total':<{width}} {total.entries:>7} {total.cost:>9.4f} {total.avoided_cost:>11.4f} {total.total_tokens:>9} "
+          f"{total.audio_seconds / 60:>9.1f} {_format_seconds(total.percentile(0.5)):>8} {_format_seconds(total.percentile(0.95)):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report API cost, tokens, latency and audio processed, from logs/api_usage.jsonl and its daily rollups.")
+    parser.add_argument("command", nargs="?", choices=("report", "rotate"), default="report",
+                        help="'report' (default) prints the aggregates; 'rotate' compacts the log into the daily rollups.")
+    parser.add_argument("--by", choices=GROUPINGS, action="append", help="Grouping to print (repeatable; defaults to all).")
+    parser.add_argument("--since", help="First day to include (YYYY-MM-DD).")
+    parser.add_argument("--until", help="Last day to include (YYYY-MM-DD).")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum rows per provider/file table (0 for all).")
+    parser.add_argument("--log", default=LOG_FILE, help="Path of the usage log.")
+    args = parser.parse_args()
+
+    rollups = UsageRollups()
+    if args.command == "rotate":
+        entries = rollups.rotate(args.log)
+        print(f"Rolled up {entries} log entries into {rollups.db_path}.")
+        return
+    report = usage_report(args.by or GROUPINGS, args.since, args.until, args.log, rollups)
+    if not any(report.values()):
+        print("No API usage logged.", file=sys.stderr)
+        return
+    for grouping, groups in report.items():
+        print_usage_report(grouping, groups, None if grouping == "day" else args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,22 @@
 import os
 import subprocess
+import sys
 import json
+from concurrent.futures import FIRST_COMPLETED, wait
+from .telemetry import span, current_file_name
 
+# OpenAI transcription cost: $0.006 / minute
+TRANSCRIPTION_COST_PER_MINUTE = 0.006
 
+def estimate_transcription_cost(duration_seconds):
+    """Estimates the OpenAI transcription cost for an audio duration in seconds."""
+    return (duration_seconds / 60) * TRANSCRIPTION_COST_PER_MINUTE
 
-def get_audio_duration(audio_path):
+def get_audio_duration(audio_path, file_name=None):
     """
     Gets the duration of an audio file in seconds using ffprobe.
+    'file_name' keys the telemetry span (e.g. the original media of a converted file);
+    it defaults to the file of the enclosing span, then to the audio file name.
     """
     try:
         command = [
@@ -16,9 +26,75 @@ def get_audio_duration(audio_path):
             '-of', 'default=noprint_wrappers=1:nokey=1',
             audio_path
         ]
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        duration = float(result.stdout.strip())
+        with span("ffprobe", file_name or current_file_name() or os.path.basename(audio_path)) as probe:
+            result = subprocess.run(command, capture_output=True, text=True, check=True)
+            duration = float(result.stdout.strip())
+            probe["audio_seconds"] = duration
         return duration
     except (subprocess.CalledProcessError, FileNotFoundError) as e:
         print(f"Error getting audio duration with ffprobe: {e}", file=sys.stderr)
         return None
+
+def format_timestamp(seconds):
+    """Formats seconds as HH:MM:SS."""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def extract_audio_span(media_path, start_seconds, end_seconds, output_path):
+    """
+    Extracts the audio between two timestamps of a media file, without
+    reprocessing the rest of it. Returns output_path, or None on failure.
+    """
+    command = [
+        'ffmpeg',
+        '-ss', f"{start_seconds:.3f}",
+        '-i', media_path,
+        '-t', f"{max(0.0, end_seconds - start_seconds):.3f}",
+        '-vn',
+        '-y', output_path
+    ]
+    try:
+        proc = subprocess.run(command, capture_output=True, text=True)
+    except FileNotFoundError as e:
+        print(f"Error running FFmpeg: {e}", file=sys.stderr)
+        return None
+    if proc.returncode != 0:
+        print(f"Error extracting audio span from {media_path}: {proc.stderr}", file=sys.stderr)
+        return None
+    return output_path
+
+def bounded_map(executor, func, items, max_pending, *args, release=None):
+    """
+    Runs func(item, *args) on the executor for each item, with at most
+    'max_pending' items submitted and not finished: items are only pulled from
+    'items' (e.g. a lazy segment generator) as workers free up.
+    'release(item)' is called once an item is done or cancelled (e.g. to delete its file).
+    Returns the results in completion order.
+    """
+    results = []
+    pending = {}
+
+    def collect():
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            item = pending.pop(future)
+            if release is not None:
+                release(item)
+            results.append(future.result())
+
+    try:
+        for item in items:
+            while len(pending) >= max_pending:
+                collect()
+            pending[executor.submit(func, item, *args)] = item
+        while pending:
+            collect()
+    finally:
+        for future in pending:
+            future.cancel()
+        if pending:
+            wait(pending)
+            if release is not None:
+                for item in pending.values():
+                    release(item)
+    return results